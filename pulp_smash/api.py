@@ -7,18 +7,45 @@ handling of href paths and HTTP 202 status codes. This module provides a
 customizable client that makes it easier to work with the API in a safe and
 concise manner.
 """
+import collections
+import threading
+import time
 import warnings
-from time import sleep
+from concurrent.futures import Future, ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 
 import requests
 
-from pulp_smash import exceptions
+from pulp_smash import cassette, exceptions
+from pulp_smash.constants import TASKS_SEARCH_PATH
 
 
 _SENTINEL = object()
 _TASK_END_STATES = ('canceled', 'error', 'finished', 'skipped', 'timed out')
 
+# A dict mapping session keys to ``requests.Session`` objects. Used by
+# `get_session`.
+#
+# Each key is a (hostname, scheme, verify, auth) tuple. All clients targeting
+# the same Pulp system share one session, and therefore one connection pool.
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+# The number of connections kept open per host, and whether connections are
+# kept open between requests. Both may be overridden per system with the
+# ``pool_size`` and ``keep_alive`` options of the ``api`` role.
+_POOL_SIZE = 10
+_KEEP_ALIVE = True
+
+# The maximum number of tasks polled at once by `poll_task` and
+# `poll_spawned_tasks`.
+_POLL_WORKERS = 16
+
+# A dict mapping session keys to `_TaskBatcher` objects. Used by
+# `_get_task_batcher`.
+_TASK_BATCHERS = {}
+_TASK_BATCHERS_LOCK = threading.Lock()
+
 
 def _check_http_202_content_type(response):
     """Issue a warning if the content-type is not application/json."""
@@ -84,6 +111,92 @@ def _handle_202(server_config, response):
         _check_tasks(tasks)
 
 
+def _get_session_key(server_config, pulp_system):
+    """Return a hashable key identifying the session for ``pulp_system``."""
+    api_role = pulp_system.roles['api']
+    return (
+        pulp_system.hostname,
+        api_role.get('scheme', 'https'),
+        api_role.get('verify'),
+        tuple(server_config.pulp_auth),
+    )
+
+
+def get_session(server_config, pulp_system=None):
+    """Return the ``requests.Session`` shared by clients of ``pulp_system``.
+
+    Sessions are created on demand and cached, so every
+    :class:`pulp_smash.api.Client` targeting the same system shares one pool of
+    persistent connections. The pool size and whether connections are kept
+    alive may be set with the ``pool_size`` and ``keep_alive`` options of the
+    system's ``api`` role. If a cassette is in use, requests are recorded or
+    replayed. See :mod:`pulp_smash.cassette`.
+
+    :param server_config: A :class:`pulp_smash.config.PulpSmashConfig` object.
+    :param pulp_system: The system the session talks to. If ``None`` is
+        provided then the first system found with api role will be used.
+    :returns: A ``requests.Session`` object.
+    """
+    if not pulp_system:
+        pulp_system = server_config.get_systems('api')[0]
+    key = _get_session_key(server_config, pulp_system)
+    with _SESSIONS_LOCK:
+        try:
+            return _SESSIONS[key]
+        except KeyError:
+            pass
+        api_role = pulp_system.roles['api']
+        pool_size = api_role.get('pool_size', _POOL_SIZE)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not api_role.get('keep_alive', _KEEP_ALIVE):
+            session.headers['Connection'] = 'close'
+        cassette.mount(session)
+        _SESSIONS[key] = session
+        return session
+
+
+def close_sessions():
+    """Close all cached sessions and their pooled connections."""
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
+def get_connection_stats(server_config, pulp_system=None):
+    """Tell how many connections the session for ``pulp_system`` has opened.
+
+    :param server_config: A :class:`pulp_smash.config.PulpSmashConfig` object.
+    :param pulp_system: The system whose session should be inspected. If
+        ``None`` is provided then the first system found with api role will be
+        used.
+    :returns: A dict with the keys ``connections`` (new connections opened),
+        ``requests`` (requests sent) and ``reused`` (requests sent over an
+        already-open connection).
+    """
+    session = get_session(server_config, pulp_system)
+    pools = set()
+    for adapter in session.adapters.values():
+        if not hasattr(adapter, 'poolmanager'):
+            continue  # A cassette is in use.
+        container = adapter.poolmanager.pools
+        pools.update(container.get(key) for key in container.keys())
+    pools.discard(None)
+    connections = sum(pool.num_connections for pool in pools)
+    requests_ = sum(pool.num_requests for pool in pools)
+    return {
+        'connections': connections,
+        'requests': requests_,
+        'reused': requests_ - connections,
+    }
+
+
 def echo_handler(server_config, response):  # pylint:disable=unused-argument
     """Immediately return ``response``."""
     return response
@@ -228,6 +341,11 @@ class Client(object):
     This allows one to easily use the hrefs returned by Pulp in constructing
     new requests.
 
+    Requests are sent through ``session``, a ``requests.Session`` returned by
+    :func:`pulp_smash.api.get_session`. All clients targeting the same Pulp
+    system share that session, so TCP and TLS connections are reused across
+    clients rather than being re-established for every request.
+
     The remainder of this docstring contains design notes. They are useful to
     advanced users and developers.
 
@@ -275,6 +393,7 @@ class Client(object):
             self.response_handler = safe_handler
         else:
             self.response_handler = response_handler
+        self.session = get_session(self._cfg, pulp_system)
 
     def delete(self, url, **kwargs):
         """Send an HTTP DELETE request."""
@@ -318,7 +437,7 @@ class Client(object):
         """
         # The `self.request_kwargs` dict should *always* have a "url" argument.
         # This is enforced by `self.__init__`. This allows us to call the
-        # `requests.request` function and satisfy its signature:
+        # `requests.Session.request` method and satisfy its signature:
         #
         #     request(method, url, **kwargs)
         #
@@ -339,21 +458,105 @@ class Client(object):
             )
         return self.response_handler(
             self._cfg,
-            requests.request(method, **request_kwargs),
+            self.session.request(method, **request_kwargs),
         )
 
 
-def poll_spawned_tasks(server_config, call_report, pulp_system=None):
-    """Recursively wait for spawned tasks to complete. Yield response bodies.
+class PollSchedule(object):
+    """An exponential backoff schedule for polling tasks.
+
+    Iterating over this object yields the number of seconds to wait before each
+    successive poll. The first delay is ``initial`` seconds, and each delay is
+    ``factor`` times longer than the last, up to a cap of ``maximum`` seconds.
+    Iteration stops once ``timeout`` seconds have passed since iteration began.
+    For example:
 
-    Recursively wait for each of the spawned tasks listed in the given `call
-    report`_ to complete. For each task that completes, yield a response body
-    representing that task's final state.
+    >>> from pulp_smash.api import PollSchedule
+    >>> from itertools import islice
+    >>> list(islice(PollSchedule(initial=1, factor=2, maximum=5), 5))
+    [1, 2, 4, 5, 5]
+
+    Each iteration is independent, so one schedule may be used to poll many
+    tasks at once. :func:`poll_task` and :func:`poll_spawned_tasks` accept any
+    iterable of delays, so other polling strategies are easy to provide. For
+    example, ``itertools.repeat(5, 360)`` polls every five seconds, up to 360
+    times.
+
+    The default schedule is built from the ``task_polling`` section of the
+    Pulp Smash configuration file. See :func:`get_poll_schedule`.
+
+    :param initial: The number of seconds to wait before the second poll.
+    :param factor: The multiplier applied to each successive delay.
+    :param maximum: The longest delay between polls, in seconds.
+    :param timeout: How long to poll a task before giving up, in seconds.
+    """
+
+    # pylint:disable=too-few-public-methods
+
+    def __init__(self, initial=0.05, factor=2, maximum=5, timeout=1800):
+        """Initialize this object with needed instance attributes."""
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.timeout = timeout
+
+    def __iter__(self):
+        """Yield delays until ``timeout`` seconds have passed."""
+        deadline = time.monotonic() + self.timeout
+        delay = self.initial
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            yield min(delay, self.maximum, remaining)
+            delay *= self.factor
+
+    def __repr__(self):  # noqa
+        str_kwargs = ', '.join(
+            '{}={!r}'.format(key, value)
+            for key, value in sorted(vars(self).items())
+        )
+        return '{}({})'.format(type(self).__name__, str_kwargs)
+
+
+def get_poll_schedule(server_config):
+    """Return the default task polling schedule for ``server_config``.
+
+    :param server_config: A :class:`pulp_smash.config.PulpSmashConfig` object.
+    :returns: A :class:`pulp_smash.api.PollSchedule` built from
+        ``server_config.task_polling``. If a cassette is being replayed, the
+        schedule doesn't wait between polls.
+    """
+    kwargs = server_config.task_polling.copy()
+    kwargs.pop('batch', None)
+    if cassette.get_mode() == 'replay':
+        kwargs['initial'] = kwargs['maximum'] = 0
+    return PollSchedule(**kwargs)
+
+
+def poll_spawned_tasks(
+        server_config,
+        call_report,
+        pulp_system=None,
+        schedule=None,
+        batch=None):
+    """Wait for spawned tasks to complete. Yield response bodies.
+
+    Wait for each of the spawned tasks listed in the given `call report`_, and
+    their children, to complete. For each task that completes, yield a response
+    body representing that task's final state.
+
+    All tasks are polled concurrently, so the time spent waiting is roughly
+    that of the slowest task, not the sum of all tasks. Response bodies are
+    yielded in the same order as :func:`poll_task` would yield them if called
+    on each spawned task in turn.
 
     :param server_config: A :class:`pulp_smash.config.PulpSmashConfig` object.
     :param call_report: A dict-like object with a `call report`_ structure.
     :param pulp_system: The system from where to pool the task. If ``None`` is
         provided then the first system found with api role will be used.
+    :param schedule: Same as :meth:`poll_task`.
+    :param batch: Same as :meth:`poll_task`.
     :returns: A generator yielding task bodies.
     :raises: Same as :meth:`poll_task`.
 
@@ -362,52 +565,361 @@ def poll_spawned_tasks(server_config, call_report, pulp_system=None):
     """
     if not pulp_system:
         pulp_system = server_config.get_systems('api')[0]
-    hrefs = (task['_href'] for task in call_report['spawned_tasks'])
-    for href in hrefs:
-        for final_task_state in poll_task(server_config, href, pulp_system):
-            yield final_task_state
-
-
-def poll_task(server_config, href, pulp_system=None):
+    hrefs = [task['_href'] for task in call_report['spawned_tasks']]
+    if schedule is None:
+        schedule = get_poll_schedule(server_config)
+    if batch is None:
+        batch = server_config.task_polling.get('batch', False)
+    yield from _poll_tasks(server_config, hrefs, pulp_system, schedule, batch)
+
+
+def poll_task(
+        server_config,
+        href,
+        pulp_system=None,
+        schedule=None,
+        batch=None):
     """Wait for a task and its children to complete. Yield response bodies.
 
     Poll the task at ``href``, waiting for the task to complete. When a
     response is received indicating that the task is complete, yield that
-    response body and recursively poll each child task.
+    response body and then those of each child task. Child tasks are polled
+    concurrently, as soon as their parent task completes.
 
     :param server_config: A :class:`pulp_smash.config.PulpSmashConfig` object.
     :param href: The path to a task you'd like to monitor recursively.
     :param pulp_system: The system from where to pool the task. If ``None`` is
         provided then the first system found with api role will be used.
+    :param schedule: An iterable of delays, in seconds, to wait between polls
+        of a task. A task is considered to have timed out when the iterable is
+        exhausted. Defaults to the schedule returned by
+        :func:`get_poll_schedule`.
+    :param batch: Whether to look up task states in batches. If true, the
+        states of all tasks being polled by this process are fetched with one
+        request to Pulp's task search API, instead of one request per task.
+        Defaults to the ``batch`` option of the ``task_polling`` section of the
+        Pulp Smash configuration file, or ``False``.
     :returns: An generator yielding response bodies.
     :raises pulp_smash.exceptions.TaskTimedOutError: If a task takes too
         long to complete.
     """
     if not pulp_system:
         pulp_system = server_config.get_systems('api')[0]
-    # 360 * 5s == 1800s == 30m
-    # NOTE: The timeout counter is synchronous. We query Pulp, then count down,
-    # then query pulp, then count down, etc. This is… dumb.
-    poll_limit = 360
-    poll_counter = 0
+    if schedule is None:
+        schedule = get_poll_schedule(server_config)
+    if batch is None:
+        batch = server_config.task_polling.get('batch', False)
+    yield from _poll_tasks(server_config, [href], pulp_system, schedule, batch)
+
+
+def submit_or_call(executor, func, *args):
+    """Call ``func(*args)`` in ``executor``. Return a future.
+
+    Once the interpreter has started to shut down, for example in an
+    ``atexit`` handler, thread pools refuse new work. ``func`` is then called
+    in the calling thread, and a future that is already done is returned.
+
+    :param executor: A ``concurrent.futures.Executor``.
+    :param func: The callable to call.
+    :param args: Arguments for ``func``.
+    :returns: A ``concurrent.futures.Future``.
+    """
+    try:
+        return executor.submit(func, *args)
+    except RuntimeError:
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as err:  # pylint:disable=broad-except
+            future.set_exception(err)
+        return future
+
+
+def _poll_tasks(server_config, hrefs, pulp_system, schedule, batch):
+    """Concurrently poll tasks and their children. Yield response bodies.
+
+    Each task is polled by a worker thread or, if ``batch`` is true, by the
+    process-wide :class:`_TaskBatcher` for ``pulp_system``. When a task
+    completes, polling of its children starts immediately. Meanwhile, this
+    generator yields final task states in depth-first order: a task, then its
+    children, then its next sibling. Closing this generator stops polling.
+    Tasks are polled in the calling thread if the interpreter is shutting
+    down. See :func:`submit_or_call`.
+    """
+    stop = threading.Event()
+    executor = batcher = None
+    if batch:
+        batcher = _get_task_batcher(server_config, pulp_system)
+    else:
+        executor = ThreadPoolExecutor(max_workers=_POLL_WORKERS)
+
+    def submit(href):
+        """Start polling ``href``. Return a future."""
+        if executor is not None:
+            return submit_or_call(executor, poll_and_submit_children, href)
+        future = Future()
+        batcher.submit(href, schedule, stop).add_done_callback(
+            lambda inner: submit_children(future, inner)
+        )
+        return future
+
+    def poll_and_submit_children(href):
+        """Poll ``href``, then start polling its children."""
+        attrs = _poll_one_task(
+            server_config, href, pulp_system, schedule, stop)
+        if stop.is_set():
+            return attrs, []
+        children = [task['_href'] for task in attrs['spawned_tasks']]
+        return attrs, [submit(child) for child in children]
+
+    def submit_children(future, inner):
+        """Start polling the children of the task polled by ``inner``."""
+        try:
+            attrs = inner.result()
+        except Exception as err:  # pylint:disable=broad-except
+            future.set_exception(err)
+            return
+        children = [task['_href'] for task in attrs['spawned_tasks']]
+        future.set_result((attrs, [submit(child) for child in children]))
+
+    if executor is not None:
+        pending = collections.deque(submit(href) for href in hrefs)
+    else:
+        with batcher.lock:
+            pending = collections.deque(submit(href) for href in hrefs)
+    try:
+        while pending:
+            attrs, children = pending.popleft().result()
+            yield attrs
+            pending.extendleft(reversed(children))
+    finally:
+        stop.set()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def _poll_one_task(server_config, href, pulp_system, schedule, stop):
+    """Wait for the task at ``href`` to complete. Return its final state.
+
+    Wait between polls according to ``schedule``. Return early, with ``None``,
+    if ``stop`` is set.
+
+    :raises pulp_smash.exceptions.TaskTimedOutError: If ``schedule`` is
+        exhausted before the task completes.
+    """
+    start = time.monotonic()
+    delays = iter(schedule)
     while True:
-        response = requests.get(
+        response = get_session(server_config, pulp_system).get(
             urljoin(server_config.get_base_url(pulp_system), href),
             **server_config.get_requests_kwargs(pulp_system)
         )
         response.raise_for_status()
         attrs = response.json()
         if attrs['state'] in _TASK_END_STATES:
-            # This task has completed. Yield its final state, then iterate
-            # through each of its children and yield their final states.
-            yield attrs
-            for href_ in (task['_href'] for task in attrs['spawned_tasks']):
-                for final_task_state in poll_task(server_config, href_):
-                    yield final_task_state
-            break
-        poll_counter += 1
-        if poll_counter > poll_limit:
+            return attrs
+        try:
+            delay = next(delays)
+        except StopIteration:
             raise exceptions.TaskTimedOutError(
-                'Task {} is ongoing after {} polls.'.format(href, poll_limit)
+                'Task {} is ongoing after {:.1f}s.'
+                .format(href, time.monotonic() - start)
             )
-        sleep(5)
+        if stop.wait(delay):
+            return None
+
+
+def _get_task_batcher(server_config, pulp_system):
+    """Return the :class:`_TaskBatcher` for ``pulp_system``."""
+    key = _get_session_key(server_config, pulp_system)
+    with _TASK_BATCHERS_LOCK:
+        try:
+            return _TASK_BATCHERS[key]
+        except KeyError:
+            pass
+        batcher = _TaskBatcher(server_config, pulp_system)
+        _TASK_BATCHERS[key] = batcher
+        return batcher
+
+
+class _TaskBatcher(object):
+    """Poll many tasks with one request per tick to Pulp's task search API.
+
+    Callers register tasks with :meth:`submit` and receive a future. A
+    background thread repeatedly searches for every registered task that is
+    due to be polled, and resolves each future with the final state of its
+    task. The thread exits when no tasks are registered, and is restarted on
+    demand.
+
+    Each registered task has its own schedule of delays, which only advances
+    when that task is polled because it is due. A task is therefore polled as
+    many times, and for as long, as it would be on its own. A task whose
+    schedule is exhausted fails with a ``TaskTimedOutError``, and a task
+    missing from the search results fails with a ``TaskNotFoundError``. If a
+    search fails, each task is looked up on its own instead, and only the tasks
+    that can't be looked up fail.
+    """
+
+    def __init__(self, server_config, pulp_system):
+        """Initialize this object with needed instance attributes."""
+        self._cfg = server_config
+        self._pulp_system = pulp_system
+        # Hold this lock to register several tasks before the next search.
+        self.lock = threading.RLock()
+        self._cond = threading.Condition(self.lock)
+        self._thread = None
+        # A dict mapping task IDs to lists of `_TaskWaiter` objects.
+        self._waiters = {}
+
+    def submit(self, href, schedule, stop):
+        """Start polling the task at ``href``. Return a future.
+
+        The future's result is the task's final state. Polling is abandoned,
+        and the future is never resolved, once ``stop`` is set.
+        """
+        waiter = _TaskWaiter(href, schedule, stop)
+        task_id = href.rstrip('/').rsplit('/', 1)[-1]
+        with self._cond:
+            self._waiters.setdefault(task_id, []).append(waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return waiter.future
+
+    def _run(self):
+        """Poll registered tasks until there are none left."""
+        while True:
+            with self._cond:
+                self._discard_stopped()
+                if not self._waiters:
+                    self._thread = None
+                    return
+                now = time.monotonic()
+                due = [
+                    (task_id, waiter)
+                    for task_id, waiters in self._waiters.items()
+                    for waiter in waiters if waiter.due <= now
+                ]
+                hrefs = {task_id: waiter.href for task_id, waiter in due}
+            if hrefs:
+                tasks, errors = self._look_up(hrefs)
+                with self._cond:
+                    for task in tasks:
+                        if task['state'] in _TASK_END_STATES:
+                            self._resolve(task['task_id'], result=task)
+                    for task_id, err in errors.items():
+                        self._resolve(task_id, exception=err)
+                    self._fail_missing(set(hrefs) - set(errors) - {
+                        task['task_id'] for task in tasks
+                    })
+                    self._advance_schedules(due)
+            with self._cond:
+                delay = min(
+                    (waiter.due for waiters in self._waiters.values()
+                     for waiter in waiters),
+                    default=time.monotonic(),
+                ) - time.monotonic()
+                # New tasks wake us up, so they are polled without delay.
+                if delay > 0:
+                    self._cond.wait(delay)
+
+    def _look_up(self, hrefs):
+        """Return the current state of each task, and the errors raised.
+
+        :param hrefs: A dict mapping task IDs to task hrefs.
+        :returns: A ``(tasks, errors)`` tuple. ``tasks`` is a list of task
+            states, and ``errors`` is a dict mapping the IDs of the tasks that
+            couldn't be looked up to the exceptions raised.
+        """
+        try:
+            return self._search(list(hrefs)), {}
+        except Exception:  # pylint:disable=broad-except
+            pass
+        tasks = []
+        errors = {}
+        for task_id, href in hrefs.items():
+            try:
+                response = get_session(self._cfg, self._pulp_system).get(
+                    urljoin(self._cfg.get_base_url(self._pulp_system), href),
+                    **self._cfg.get_requests_kwargs(self._pulp_system)
+                )
+                response.raise_for_status()
+                tasks.append(response.json())
+            except Exception as err:  # pylint:disable=broad-except
+                errors[task_id] = err
+        return tasks, errors
+
+    def _search(self, task_ids):
+        """Return the current state of each of the tasks in ``task_ids``."""
+        response = get_session(self._cfg, self._pulp_system).post(
+            urljoin(self._cfg.get_base_url(self._pulp_system),
+                    TASKS_SEARCH_PATH),
+            json={'criteria': {'filters': {'task_id': {'$in': task_ids}}}},
+            **self._cfg.get_requests_kwargs(self._pulp_system)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _resolve(self, task_id, result=None, exception=None):
+        """Resolve the waiters for a task with a result or an exception."""
+        for waiter in self._waiters.pop(task_id, ()):
+            if exception is None:
+                waiter.future.set_result(result)
+            else:
+                waiter.future.set_exception(exception)
+
+    def _fail_missing(self, task_ids):
+        """Fail the waiters for tasks that a search didn't find."""
+        for task_id in task_ids:
+            for waiter in self._waiters.pop(task_id, ()):
+                waiter.future.set_exception(exceptions.TaskNotFoundError(
+                    'Task {} was not found by a search for it.'
+                    .format(waiter.href)
+                ))
+
+    def _discard_stopped(self):
+        """Forget about waiters whose ``stop`` event is set."""
+        for task_id, waiters in tuple(self._waiters.items()):
+            waiters[:] = [
+                waiter for waiter in waiters if not waiter.stop.is_set()
+            ]
+            if not waiters:
+                del self._waiters[task_id]
+
+    def _advance_schedules(self, due):
+        """Schedule the next poll of each waiter that was due.
+
+        Time out the waiters whose schedules are exhausted.
+
+        :param due: An iterable of ``(task_id, waiter)`` tuples.
+        """
+        now = time.monotonic()
+        for task_id, waiter in due:
+            if waiter.future.done() or waiter.stop.is_set():
+                continue
+            try:
+                waiter.due = now + next(waiter.delays)
+            except StopIteration:
+                waiters = self._waiters[task_id]
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[task_id]
+                waiter.future.set_exception(exceptions.TaskTimedOutError(
+                    'Task {} is ongoing after {:.1f}s.'
+                    .format(waiter.href, now - waiter.start)
+                ))
+
+
+class _TaskWaiter(object):  # pylint:disable=too-few-public-methods
+    """A request, made to a :class:`_TaskBatcher`, to poll one task."""
+
+    def __init__(self, href, schedule, stop):
+        """Initialize this object with needed instance attributes."""
+        self.href = href
+        self.future = Future()
+        self.delays = iter(schedule)
+        self.start = time.monotonic()
+        # The time at which the task should next be polled.
+        self.due = self.start
+        self.stop = stop
@@ -0,0 +1,277 @@
+# coding=utf-8
+"""A client for working with Pulp's API from `asyncio`_ coroutines.
+
+This module requires Python 3.6 or newer, whereas the rest of Pulp Smash runs
+on Python 3.4 and newer. It is therefore not imported by any other module of
+Pulp Smash. Import it explicitly to use it:
+
+>>> from pulp_smash import async_api
+
+.. _asyncio: https://docs.python.org/3/library/asyncio.html
+"""
+import asyncio
+import collections
+import functools
+import inspect
+import time
+from urllib.parse import urljoin
+
+from pulp_smash import api, exceptions
+
+# This module extends pulp_smash.api, and shares its helpers.
+# pylint:disable=protected-access
+
+_SENTINEL = object()
+
+# asyncio.get_running_loop() was added in Python 3.7. Before then,
+# asyncio.get_event_loop() returns the running loop when called from a
+# coroutine.
+_get_running_loop = getattr(  # pylint:disable=invalid-name
+    asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+async def _handle_202(server_config, response):
+    """Like ``pulp_smash.api._handle_202``, but wait without blocking."""
+    if response.status_code == 202:  # "Accepted"
+        api._check_http_202_content_type(response)
+        call_report = response.json()
+        tasks = [
+            task async for task
+            in poll_spawned_tasks(server_config, call_report)
+        ]
+        api._check_call_report(call_report)
+        api._check_tasks(tasks)
+
+
+async def safe_handler(server_config, response):
+    """Like :func:`pulp_smash.api.safe_handler`, but a coroutine.
+
+    Use with :class:`pulp_smash.async_api.Client`.
+    """
+    response.raise_for_status()
+    await _handle_202(server_config, response)
+    return response
+
+
+async def json_handler(server_config, response):
+    """Like :func:`pulp_smash.api.json_handler`, but a coroutine.
+
+    Use with :class:`pulp_smash.async_api.Client`.
+    """
+    response.raise_for_status()
+    await _handle_202(server_config, response)
+    return response.json()
+
+
+class Client(object):
+    """Like :class:`pulp_smash.api.Client`, but for use with `asyncio`_.
+
+    Each of the HTTP methods, such as :meth:`get` and :meth:`post`, is a
+    coroutine. Many requests may be in flight at once, from a single thread:
+
+    >>> import asyncio
+    >>> from pulp_smash import async_api
+    >>> from pulp_smash.config import get_config
+    >>> async def create_users(logins):
+    ...     client = async_api.Client(get_config())
+    ...     return await asyncio.gather(*(
+    ...         client.post('/pulp/api/v2/users/', {'login': login})
+    ...         for login in logins
+    ...     ))
+    >>> loop = asyncio.get_event_loop()
+    >>> responses = loop.run_until_complete(create_users(['Alice', 'Bob']))
+
+    Response handlers have the same signature as those used by
+    :class:`pulp_smash.api.Client`. A handler may be a plain function, like
+    :func:`pulp_smash.api.echo_handler` or :func:`pulp_smash.api.code_handler`,
+    or a coroutine function. :func:`pulp_smash.api.safe_handler` and
+    :func:`pulp_smash.api.json_handler` block while waiting for tasks, so
+    :func:`pulp_smash.async_api.safe_handler` and
+    :func:`pulp_smash.async_api.json_handler` should be used in their place.
+    The default handler is :func:`pulp_smash.async_api.safe_handler`.
+
+    Requests are prepared and sent by a :class:`pulp_smash.api.Client`, so they
+    go through the same shared, pooled session, and ``request_kwargs`` work as
+    they do there. Because `Requests`_ is a blocking library, each request runs
+    in ``executor`` while the event loop carries on. Waiting for tasks, which
+    takes up most of the time spent talking to Pulp, does not occupy the
+    executor.
+
+    :param executor: A ``concurrent.futures.Executor`` in which to send
+        requests. Defaults to the event loop's default executor. Pass a larger
+        executor to send more requests at once.
+
+    All other parameters are the same as for :class:`pulp_smash.api.Client`.
+
+    .. _asyncio: https://docs.python.org/3/library/asyncio.html
+    .. _Requests: http://docs.python-requests.org/en/latest/
+    """
+
+    def __init__(
+            self,
+            server_config,
+            response_handler=None,
+            request_kwargs=None,
+            pulp_system=None,
+            executor=None,
+    ):
+        """Initialize this object with needed instance attributes."""
+        self._cfg = server_config
+        self._client = api.Client(
+            server_config,
+            api.echo_handler,
+            request_kwargs,
+            pulp_system,
+        )
+        if response_handler is None:
+            self.response_handler = safe_handler
+        else:
+            self.response_handler = response_handler
+        self.executor = executor
+
+    @property
+    def pulp_system(self):
+        """Return the system targeted by this client."""
+        return self._client.pulp_system
+
+    @property
+    def request_kwargs(self):
+        """Return the default arguments sent with each request."""
+        return self._client.request_kwargs
+
+    async def delete(self, url, **kwargs):
+        """Send an HTTP DELETE request."""
+        return await self.request('DELETE', url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        """Send an HTTP GET request."""
+        return await self.request('GET', url, **kwargs)
+
+    async def head(self, url, **kwargs):
+        """Send an HTTP HEAD request."""
+        return await self.request('HEAD', url, **kwargs)
+
+    async def options(self, url, **kwargs):
+        """Send an HTTP OPTIONS request."""
+        return await self.request('OPTIONS', url, **kwargs)
+
+    async def patch(self, url, json=_SENTINEL, **kwargs):
+        """Send an HTTP PATCH request."""
+        if json is not _SENTINEL:
+            kwargs['json'] = json
+        return await self.request('PATCH', url, **kwargs)
+
+    async def post(self, url, json=_SENTINEL, **kwargs):
+        """Send an HTTP POST request."""
+        if json is not _SENTINEL:
+            kwargs['json'] = json
+        return await self.request('POST', url, **kwargs)
+
+    async def put(self, url, json=_SENTINEL, **kwargs):
+        """Send an HTTP PUT request."""
+        if json is not _SENTINEL:
+            kwargs['json'] = json
+        return await self.request('PUT', url, **kwargs)
+
+    async def request(self, method, url, **kwargs):
+        """Send an HTTP request.
+
+        Arguments passed directly in to this method override (but do not
+        overwrite!) arguments specified in ``self.request_kwargs``.
+        """
+        response = await _get_running_loop().run_in_executor(
+            self.executor,
+            functools.partial(self._client.request, method, url, **kwargs),
+        )
+        result = self.response_handler(self._cfg, response)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+
+async def poll_spawned_tasks(
+        server_config,
+        call_report,
+        pulp_system=None,
+        schedule=None):
+    """Like :func:`pulp_smash.api.poll_spawned_tasks`, but asynchronous.
+
+    All tasks are polled concurrently on the running event loop, and waiting
+    between polls does not block. For example:
+
+    >>> async def get_tasks(server_config, call_report):
+    ...     return [
+    ...         task async for task
+    ...         in poll_spawned_tasks(server_config, call_report)
+    ...     ]
+
+    Each HTTP request is sent in the event loop's default executor.
+
+    :param server_config: A :class:`pulp_smash.config.PulpSmashConfig` object.
+    :param call_report: A dict-like object with a `call report`_ structure.
+    :param pulp_system: The system from where to pool the task. If ``None`` is
+        provided then the first system found with api role will be used.
+    :param schedule: Same as :func:`pulp_smash.api.poll_task`.
+    :returns: An asynchronous generator yielding task bodies.
+    :raises: Same as :func:`pulp_smash.api.poll_task`.
+
+    .. _call report:
+        http://docs.pulpproject.org/en/latest/dev-guide/conventions/sync-v-async.html#call-report
+    """
+    if not pulp_system:
+        pulp_system = server_config.get_systems('api')[0]
+    if schedule is None:
+        schedule = api.get_poll_schedule(server_config)
+    loop = _get_running_loop()
+    started = []
+
+    def start(href):
+        """Start polling ``href``. Return an ``asyncio.Task``."""
+        started.append(loop.create_task(poll(href)))
+        return started[-1]
+
+    async def poll(href):
+        """Poll ``href``, then start polling its children."""
+        attrs = await _poll_one_task(
+            server_config, href, pulp_system, schedule)
+        children = [task['_href'] for task in attrs['spawned_tasks']]
+        return attrs, [start(child) for child in children]
+
+    pending = collections.deque(
+        start(task['_href']) for task in call_report['spawned_tasks']
+    )
+    try:
+        while pending:
+            attrs, children = await pending.popleft()
+            yield attrs
+            pending.extendleft(reversed(children))
+    finally:
+        for task in started:
+            task.cancel()
+
+
+async def _poll_one_task(server_config, href, pulp_system, schedule):
+    """Like ``pulp_smash.api._poll_one_task``, but a coroutine."""
+    loop = _get_running_loop()
+    session = api.get_session(server_config, pulp_system)
+    url = urljoin(server_config.get_base_url(pulp_system), href)
+    kwargs = server_config.get_requests_kwargs(pulp_system)
+    start = time.monotonic()
+    delays = iter(schedule)
+    while True:
+        response = await loop.run_in_executor(
+            None,
+            functools.partial(session.get, url, **kwargs),
+        )
+        response.raise_for_status()
+        attrs = response.json()
+        if attrs['state'] in api._TASK_END_STATES:
+            return attrs
+        try:
+            delay = next(delays)
+        except StopIteration:
+            raise exceptions.TaskTimedOutError(
+                'Task {} is ongoing after {:.1f}s.'
+                .format(href, time.monotonic() - start)
+            ) from None
+        await asyncio.sleep(delay)
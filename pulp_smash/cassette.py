@@ -0,0 +1,300 @@
+# coding=utf-8
+r"""Record HTTP interactions with Pulp, and replay them without Pulp.
+
+When recording, every request sent through :mod:`pulp_smash.api` and
+:func:`pulp_smash.utils.http_get` is sent as usual, and each request and its
+response is saved to a cassette file. When replaying, no request leaves the
+process: each is answered with a recorded response, with no network latency.
+This allows test logic to be re-run, and client-side overhead benchmarked, on
+systems that can't reach Pulp.
+
+Set the ``PULP_SMASH_CASSETTE`` environment variable to the path of a cassette
+file, and ``PULP_SMASH_CASSETTE_MODE`` to either ``record`` or ``replay``::
+
+    PULP_SMASH_CASSETTE=sync.cassette PULP_SMASH_CASSETTE_MODE=record \\
+        python3 -m unittest pulp_smash.tests.rpm.api_v2.test_sync_publish
+    PULP_SMASH_CASSETTE=sync.cassette PULP_SMASH_CASSETTE_MODE=replay \\
+        python3 -m unittest pulp_smash.tests.rpm.api_v2.test_sync_publish
+
+A recording is saved when the process exits. Cassettes are kept small:
+
+* They are gzipped JSON documents.
+* Request bodies aren't saved, only their checksums.
+* When a task is polled several times, only its final state is saved. When
+  replaying, tasks are therefore complete the first time they are polled, and
+  :func:`pulp_smash.api.get_poll_schedule` doesn't wait between polls, so
+  that poll loops take no time at all.
+
+Requests are matched with recorded responses by method, URL and body. If one
+request is sent many times, the recorded responses are replayed in order,
+and the last one is repeated as needed. For IDs to match, those made by
+:func:`uuid4` are reproducible while recording or replaying. Tests that rely on
+other sources of randomness, or on the order of requests sent from several
+threads at once, may not replay. Record with one process at a time.
+"""
+import atexit
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import uuid
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+_MODES = ('record', 'replay')
+
+# The adapter returned by get_adapter(), and whether it has been looked up.
+_ADAPTER = None
+_ADAPTER_LOADED = False
+_ADAPTER_LOCK = threading.Lock()
+
+
+def _get_body_checksum(body):
+    """Return a checksum of a request body, or ``None`` if there is none."""
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    elif not isinstance(body, bytes):
+        # A file-like object or a generator. It can't be read twice.
+        return None
+    return hashlib.sha256(body).hexdigest()
+
+
+def _get_key(method, url, body):
+    """Return a key identifying similar requests."""
+    return '{} {} {}'.format(method, url, _get_body_checksum(body))
+
+
+def _is_task(content):
+    """Tell whether ``content`` is the JSON representation of a task."""
+    try:
+        attrs = json.loads(content.decode('utf-8'))
+    except ValueError:
+        return False
+    return isinstance(attrs, dict) and 'task_id' in attrs and 'state' in attrs
+
+
+class CassetteAdapter(BaseAdapter):
+    """A transport adapter which records or replays HTTP interactions.
+
+    Mount it on a ``requests.Session``, as with any other transport adapter:
+
+    >>> adapter = CassetteAdapter('sync.cassette', 'record')
+    >>> session = requests.Session()
+    >>> session.mount('http://', adapter)
+    >>> session.mount('https://', adapter)
+
+    :param path: The path to the cassette file.
+    :param mode: Either "record" or "replay". When replaying, the cassette file
+        is read immediately.
+    :raises: ``ValueError`` if ``mode`` is unknown.
+    """
+
+    def __init__(self, path, mode):
+        """Initialize a new object."""
+        if mode not in _MODES:
+            raise ValueError(
+                'Unknown cassette mode {!r}. Use "record" or "replay".'
+                .format(mode)
+            )
+        super().__init__()
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        # A list of recorded interactions, as dicts.
+        self.interactions = []
+        # A dict mapping keys to the index in `interactions` of the last
+        # interaction with that key, if it recorded a task's state.
+        self._tasks = {}
+        # A dict mapping keys to deques of interactions not yet replayed.
+        self._pending = collections.defaultdict(collections.deque)
+        if mode == 'record':
+            self._adapter = HTTPAdapter()
+        else:
+            self._adapter = None
+            self.load()
+
+    def load(self):
+        """Read the interactions recorded in the cassette file."""
+        with gzip.open(self.path, 'rt', encoding='utf-8') as handle:
+            interactions = json.load(handle)['interactions']
+        with self._lock:
+            self.interactions = interactions
+            self._pending.clear()
+            for interaction in interactions:
+                self._pending[interaction['key']].append(interaction)
+
+    def save(self):
+        """Atomically write the recorded interactions to the cassette file."""
+        with self._lock:
+            interactions = [
+                interaction for interaction in self.interactions
+                if interaction is not None
+            ]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(dir=directory)
+        os.close(handle)
+        try:
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as handle:
+                json.dump({'interactions': interactions}, handle)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def send(self, request, **kwargs):  # pylint:disable=arguments-differ
+        """Send ``request``, or replay a response to it."""
+        key = _get_key(request.method, request.url, request.body)
+        if self.mode == 'replay':
+            return self._replay(key, request)
+        response = self._adapter.send(request, **kwargs)
+        self._record(key, response)
+        return response
+
+    def _record(self, key, response):
+        """Record ``response``. Drop the earlier state of a polled task."""
+        content = response.content
+        try:
+            text, encoding = content.decode('utf-8'), None
+        except UnicodeDecodeError:
+            text = base64.b64encode(content).decode('ascii')
+            encoding = 'base64'
+        interaction = {
+            'content': text,
+            'encoding': encoding,
+            'headers': dict(response.headers),
+            'key': key,
+            'reason': response.reason,
+            'status_code': response.status_code,
+        }
+        is_task = key.startswith('GET ') and _is_task(content)
+        with self._lock:
+            index = self._tasks.pop(key, None)
+            if is_task:
+                if index is not None:
+                    self.interactions[index] = None
+                self._tasks[key] = len(self.interactions)
+            self.interactions.append(interaction)
+
+    def _replay(self, key, request):
+        """Return the next response recorded for ``key``."""
+        with self._lock:
+            pending = self._pending.get(key)
+            if not pending:
+                raise requests.exceptions.ConnectionError(
+                    'No response to {} {} is recorded in {}.'
+                    .format(request.method, request.url, self.path),
+                    request=request,
+                )
+            interaction = pending[0]
+            if len(pending) > 1:
+                pending.popleft()
+        content = interaction['content']
+        if interaction['encoding'] == 'base64':
+            content = base64.b64decode(content)
+        else:
+            content = content.encode('utf-8')
+        response = requests.Response()
+        response.status_code = interaction['status_code']
+        response.reason = interaction['reason']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        # Content encodings, such as gzip, were undone when recording.
+        response.headers.pop('Content-Encoding', None)
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response._content = content  # pylint:disable=protected-access
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        """Close the connections opened while recording."""
+        if self._adapter is not None:
+            self._adapter.close()
+
+
+def get_mode():
+    """Return "record" or "replay" if a cassette is in use, or ``None``."""
+    adapter = get_adapter()
+    return None if adapter is None else adapter.mode
+
+
+def get_adapter():
+    """Return the :class:`CassetteAdapter` used by this process, if any.
+
+    The adapter is made from the ``PULP_SMASH_CASSETTE`` and
+    ``PULP_SMASH_CASSETTE_MODE`` environment variables the first time this
+    function is called. The mode defaults to "replay".
+
+    :returns: A :class:`CassetteAdapter`, or ``None`` if
+        ``PULP_SMASH_CASSETTE`` isn't set.
+    """
+    global _ADAPTER, _ADAPTER_LOADED  # pylint:disable=global-statement
+    with _ADAPTER_LOCK:
+        if not _ADAPTER_LOADED:
+            path = os.environ.get('PULP_SMASH_CASSETTE')
+            if path:
+                mode = os.environ.get('PULP_SMASH_CASSETTE_MODE', 'replay')
+                _ADAPTER = CassetteAdapter(path, mode)
+            _ADAPTER_LOADED = True
+        return _ADAPTER
+
+
+def mount(session):
+    """Mount the adapter returned by :func:`get_adapter` on ``session``.
+
+    Do nothing if no cassette is in use.
+
+    :param session: A ``requests.Session``.
+    :returns: ``session``.
+    """
+    adapter = get_adapter()
+    if adapter is not None:
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+
+def close():
+    """Save the recording, if any, and forget the adapter in use.
+
+    The next call to :func:`get_adapter` reads the environment again.
+    """
+    global _ADAPTER, _ADAPTER_LOADED  # pylint:disable=global-statement
+    with _ADAPTER_LOCK:
+        adapter = _ADAPTER
+        _ADAPTER = None
+        _ADAPTER_LOADED = False
+    if adapter is not None and adapter.mode == 'record':
+        adapter.save()
+    with _RANDOM_LOCK:
+        _RANDOM.seed(0)
+
+
+atexit.register(close)
+
+
+# Used by uuid4() while recording or replaying.
+_RANDOM = random.Random(0)
+_RANDOM_LOCK = threading.Lock()
+
+
+def uuid4():
+    """Return a random UUID, as a string.
+
+    While recording or replaying, the same sequence of UUIDs is returned each
+    time the tests are run, so that requests made with them can be matched.
+    """
+    if get_adapter() is None:
+        return str(uuid.uuid4())
+    with _RANDOM_LOCK:
+        return str(uuid.UUID(int=_RANDOM.getrandbits(128), version=4))
@@ -1,9 +1,13 @@
 # coding=utf-8
 """A client for working with Pulp systems via their CLI."""
+import atexit
 import contextlib
 import os
 import socket
+import threading
+import time
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlparse
 
 import plumbum
@@ -21,6 +25,28 @@ _SERVICE_MANAGERS = {}
 # For example: {'old.example.com': 'yum', 'new.example.com', 'yum'}
 _PACKAGE_MANAGERS = {}
 
+# The number of seconds an SSH machine may sit unused in the pool before it is
+# closed. See `SshMachinePool`.
+_SSH_IDLE_TIMEOUT = 600
+
+SERVICE_STAGES = (
+    frozenset(('mongod',)),
+    frozenset(('qpidd', 'rabbitmq')),
+    frozenset((
+        'httpd',
+        'pulp_celerybeat',
+        'pulp_resource_manager',
+        'squid',
+    )),
+    frozenset(('pulp_workers',)),
+)
+"""The order in which :class:`GlobalServiceManager` starts services.
+
+Used when several systems are managed at once. Each stage finishes before the
+next one begins. Services not listed here belong to the last stage. Services
+are stopped in the reverse order.
+"""
+
 
 def _get_hostname(urlstring):
     """Get the hostname from a URL string.
@@ -70,6 +96,158 @@ def _is_root(cfg, pulp_system=None):
     return False
 
 
+class SshMachinePool(object):
+    """A thread-safe pool of ``plumbum.machines.SshMachine`` objects.
+
+    Each SSH machine costs a connection to its target system, and Pulp Smash
+    creates many short-lived :class:`Client` objects. This pool lets all of
+    those clients share one machine per ``(hostname, user)`` pair:
+
+    >>> pool = SshMachinePool()
+    >>> machine = pool.get('pulp.example.com')
+    >>> machine is pool.get('pulp.example.com')
+    True
+    >>> pool.close()
+
+    Machines that have sat unused for more than ``idle_timeout`` seconds are
+    closed and dropped the next time the pool is used. A machine is in use
+    while it is checked out with :meth:`checkout`, however long that takes, so
+    run commands inside a ``checkout`` block:
+
+    >>> with pool.checkout('pulp.example.com') as machine:
+    ...     machine['sleep']('3600')
+
+    A machine returned by :meth:`get` counts as unused as soon as it is handed
+    out.
+
+    :param idle_timeout: The number of seconds a machine may sit unused before
+        it is evicted. If ``None``, machines are never evicted.
+    """
+
+    def __init__(self, idle_timeout=_SSH_IDLE_TIMEOUT):
+        """Initialize a new object."""
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # A dict mapping (hostname, user) to [machine, last time handed out or
+        # returned, number of checkouts].
+        self._machines = {}
+
+    def __len__(self):
+        """Return the number of machines in the pool."""
+        with self._lock:
+            return len(self._machines)
+
+    def __contains__(self, machine):
+        """Tell whether ``machine`` is currently held by the pool."""
+        with self._lock:
+            return any(
+                entry[0] is machine for entry in self._machines.values()
+            )
+
+    def get(self, hostname, user=None):
+        """Return an SSH machine for ``hostname``, creating it if needed.
+
+        :param hostname: The host to connect to.
+        :param user: The user to connect as. If ``None``, let ``ssh`` pick,
+            e.g. according to ``~/.ssh/config``.
+        :returns: A ``plumbum.machines.SshMachine``.
+        """
+        return self._get((hostname, user), 0)
+
+    @contextlib.contextmanager
+    def checkout(self, hostname, user=None):
+        """Lend out an SSH machine for ``hostname`` until the block exits.
+
+        The machine isn't evicted while it is checked out. Its idle time starts
+        once the last checkout of it ends.
+
+        :param hostname: The host to connect to.
+        :param user: The user to connect as. If ``None``, let ``ssh`` pick,
+            e.g. according to ``~/.ssh/config``.
+        :returns: A context manager yielding a ``plumbum.machines.SshMachine``.
+        """
+        key = (hostname, user)
+        machine = self._get(key, 1)
+        try:
+            yield machine
+        finally:
+            with self._lock:
+                entry = self._machines.get(key)
+                if entry is not None and entry[0] is machine:
+                    entry[1] = time.monotonic()
+                    entry[2] -= 1
+
+    def _get(self, key, checkouts):
+        """Return the machine for ``key``, and add to its checkouts."""
+        with self._lock:
+            self._evict_idle()
+            entry = self._machines.get(key)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                entry[2] += checkouts
+                return entry[0]
+
+        # Connecting may take a while. Don't block other hosts meanwhile.
+        hostname, user = key
+        kwargs = {} if user is None else {'user': user}
+        machine = plumbum.machines.SshMachine(hostname, **kwargs)
+        with self._lock:
+            entry = self._machines.setdefault(key, [machine, None, 0])
+            entry[1] = time.monotonic()
+            entry[2] += checkouts
+        if entry[0] is not machine:  # Another thread won the race.
+            machine.close()
+        return entry[0]
+
+    def evict_idle(self):
+        """Close and drop the machines that have been unused for too long.
+
+        Machines that are checked out are never evicted.
+
+        :returns: The number of machines evicted.
+        """
+        with self._lock:
+            return self._evict_idle()
+
+    def close(self):
+        """Close and drop every machine in the pool."""
+        with self._lock:
+            machines = [entry[0] for entry in self._machines.values()]
+            self._machines.clear()
+        for machine in machines:
+            machine.close()
+
+    def _evict_idle(self):
+        """Like :meth:`evict_idle`, but the caller must hold the lock."""
+        if self.idle_timeout is None:
+            return 0
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [
+            key for key, (_, last_used, checkouts) in self._machines.items()
+            if not checkouts and last_used < deadline
+        ]
+        for key in idle:
+            self._machines.pop(key)[0].close()
+        return len(idle)
+
+
+_SSH_MACHINE_POOL = SshMachinePool()
+atexit.register(_SSH_MACHINE_POOL.close)
+
+
+def get_ssh_machine_pool():
+    """Return the :class:`SshMachinePool` shared by :class:`Client` objects."""
+    return _SSH_MACHINE_POOL
+
+
+def close_ssh_machines():
+    """Close every SSH machine shared by :class:`Client` objects.
+
+    Clients created afterwards reconnect as needed.
+    """
+    _SSH_MACHINE_POOL.close()
+
+
 def echo_handler(completed_proc):
     """Immediately return ``completed_proc``."""
     return completed_proc
@@ -203,6 +381,11 @@ class Client(object):  # pylint:disable=too-few-public-methods
     If they match, ``machine`` is set to execute commands locally; and vice
     versa.
 
+    SSH machines are drawn from a process-wide :class:`SshMachinePool`, keyed
+    by hostname and ``pulp_system.roles['shell']['user']``, so that creating
+    many clients for one system costs a single SSH connection. Pass
+    ``pooled=False`` to get a private machine instead.
+
     :param pulp_smash.config.PulpSmashConfig server_config: Information about
         the system on which commands will be executed.
     :param response_handler: A callback function. Defaults to
@@ -210,28 +393,40 @@ class Client(object):  # pylint:disable=too-few-public-methods
     :param pulp_system: A :class:`pulp_smash.config.PulpSystem` object that
         should be targeted instead of choosing the first system found with the
         ``pulp cli`` role.
+    :param pooled: Whether to draw SSH machines from the shared pool.
 
     .. _Plumbum: http://plumbum.readthedocs.io/en/latest/index.html
     """
 
-    def __init__(self, server_config, response_handler=None, pulp_system=None):
+    def __init__(
+            self,
+            server_config,
+            response_handler=None,
+            pulp_system=None,
+            pooled=True):
         """Initialize this object with needed instance attributes."""
         # How do we make requests?
         if not pulp_system:
             pulp_system = server_config.get_systems('pulp cli')[0]
         self.pulp_system = pulp_system
         hostname = pulp_system.hostname
-        transport = pulp_system.roles.get('shell', {}).get('transport')
+        shell_role = pulp_system.roles.get('shell', {})
+        transport = shell_role.get('transport')
         if transport is None:
             transport = 'local' if hostname == socket.getfqdn() else 'ssh'
+        self._ssh_key = None
         if transport == 'local':
             self.machine = plumbum.machines.local
+        elif pooled:  # transport == 'ssh'
+            self._ssh_key = (hostname, shell_role.get('user'))
+            self.machine = _SSH_MACHINE_POOL.get(*self._ssh_key)
         else:  # transport == 'ssh'
             # The SshMachine is a wrapper around the system's "ssh" binary.
             # Thus, it uses ~/.ssh/config, ~/.ssh/known_hosts, etc.
-            self.machine = (
-                plumbum.machines.SshMachine(hostname)
-            )
+            user = shell_role.get('user')
+            kwargs = {} if user is None else {'user': user}
+            self.machine = plumbum.machines.SshMachine(hostname, **kwargs)
+        self._pooled_machine = self.machine
 
         # How do we handle responses?
         if response_handler is None:
@@ -256,7 +451,18 @@ class Client(object):  # pylint:disable=too-few-public-methods
         # https://plumbum.readthedocs.io/en/latest/api/commands.html#plumbum.commands.base.BaseCommand.run
         kwargs.setdefault('retcode')
 
-        code, stdout, stderr = self.machine[args[0]].run(args[1:], **kwargs)
+        # Unless the user swapped in a machine of their own, check a machine
+        # out of the pool, so that it isn't evicted while the command runs. The
+        # pool may have evicted our machine while we sat idle, so it may differ
+        # from the last one.
+        if self._ssh_key is not None and self.machine is self._pooled_machine:
+            with _SSH_MACHINE_POOL.checkout(*self._ssh_key) as machine:
+                self.machine = self._pooled_machine = machine
+                code, stdout, stderr = machine[args[0]].run(
+                    args[1:], **kwargs)
+        else:
+            code, stdout, stderr = self.machine[args[0]].run(
+                args[1:], **kwargs)
         completed_process = CompletedProcess(args, code, stdout, stderr)
         return self.response_handler(completed_process)
 
@@ -415,17 +621,36 @@ class GlobalServiceManager(BaseServiceManager):
     Also, the :class:`GlobalServiceManager` object will try to cache as much
     information as possible to avoid doing many connections.
 
+    By default, systems are managed one after another. If ``max_workers`` is
+    greater than one, up to that many systems are managed at the same time.
+    Services are then split into ``stages``, which run one after another: on
+    a clustered deployment, the database and message broker are started on
+    their systems before the Pulp services are started on theirs. Stages run
+    in reverse order when stopping services. Either way, each system is only
+    asked to manage the services its roles provide.
+
+    After each call to :meth:`start`, :meth:`stop` or :meth:`restart`, the
+    ``timings`` attribute maps the affected systems' hostnames to the number
+    of seconds spent managing services on them.
+
     :param pulp_smash.config.PulpSmashConfig cfg: Information about the Pulp
         deployment.
+    :param max_workers: The maximum number of systems to manage at the same
+        time.
+    :param stages: An ordered iterable of sets of service names. Defaults to
+        :data:`SERVICE_STAGES`.
     :raises pulp_smash.exceptions.NoKnownServiceManagerError: If unable to find
         any service manager on one of the target systems.
     """
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, max_workers=1, stages=SERVICE_STAGES):
         """Initialize a GlobalServiceManager object."""
         super().__init__()
         self._cfg = cfg
         self._is_root_cache = {}
+        self._max_workers = max_workers
+        self._stages = tuple(frozenset(stage) for stage in stages)
+        self.timings = {}
 
     def _check_root(self, pulp_system):
         """Tell if we are root on the target system.
@@ -448,28 +673,7 @@ class GlobalServiceManager(BaseServiceManager):
         :return: A dict mapping the affected systems' hostnames with a list of
             :class:`pulp_smash.cli.CompletedProcess` objects.
         """
-        services = set(services)
-        result = {}
-        for system in self._cfg.systems:
-            intersection = services.intersection(
-                self._cfg.services_for_roles(system.roles))
-            if intersection:
-                client = Client(self._cfg, pulp_system=system)
-                svc_mgr = self._get_service_manager(self._cfg, system)
-                sudo = not self._check_root(system)
-                if svc_mgr == 'sysv':
-                    with self._disable_selinux(client, sudo):
-                        result[system.hostname] = self._start_sysv(
-                            client, sudo, services)
-                elif svc_mgr == 'systemd':
-                    result[system.hostname] = self._start_systemd(
-                        client, sudo, services)
-                else:
-                    raise NotImplementedError(
-                        'Service manager "{}" not supported on "{}"'.format(
-                            svc_mgr, system.hostname)
-                    )
-        return result
+        return self._manage('start', services)
 
     def stop(self, services):
         """Stop the services on every system that has the services.
@@ -478,57 +682,99 @@ class GlobalServiceManager(BaseServiceManager):
         :return: A dict mapping the affected systems' hostnames with a list of
             :class:`pulp_smash.cli.CompletedProcess` objects.
         """
-        services = set(services)
-        result = {}
-        for system in self._cfg.systems:
-            intersection = services.intersection(
-                self._cfg.services_for_roles(system.roles))
-            if intersection:
-                client = Client(self._cfg, pulp_system=system)
-                svc_mgr = self._get_service_manager(self._cfg, system)
-                sudo = not self._check_root(system)
-                if svc_mgr == 'sysv':
-                    with self._disable_selinux(client, sudo):
-                        result[system.hostname] = self._stop_sysv(
-                            client, sudo, services)
-                elif svc_mgr == 'systemd':
-                    result[system.hostname] = self._stop_systemd(
-                        client, sudo, services)
-                else:
-                    raise NotImplementedError(
-                        'Service manager not supported: {}'.format(svc_mgr)
-                    )
-        return result
+        return self._manage('stop', services)
 
     def restart(self, services):
         """Restart the services on every system that has the services.
 
+        :param services: An iterable of service names.
+        :return: A dict mapping the affected systems' hostnames with a list of
+            :class:`pulp_smash.cli.CompletedProcess` objects.
+        """
+        return self._manage('restart', services)
+
+    def _manage(self, action, services):
+        """Start, stop or restart ``services`` on every system that has them.
+
+        :param action: Either "start", "stop" or "restart".
         :param services: An iterable of service names.
         :return: A dict mapping the affected systems' hostnames with a list of
             :class:`pulp_smash.cli.CompletedProcess` objects.
         """
         services = set(services)
+        self.timings = {}
+        if self._max_workers <= 1:
+            result = {}
+            for system in self._cfg.systems:
+                system_services = services.intersection(
+                    self._cfg.services_for_roles(system.roles))
+                if system_services:
+                    result[system.hostname] = self._manage_system(
+                        action, system, system_services)
+            return result
+
+        stages = self._get_stages(services)
+        if action == 'stop':
+            stages.reverse()
         result = {}
-        for system in self._cfg.systems:
-            intersection = services.intersection(
-                self._cfg.services_for_roles(system.roles))
-            if intersection:
-                client = Client(self._cfg, pulp_system=system)
-                svc_mgr = self._get_service_manager(self._cfg, system)
-                sudo = not self._check_root(system)
-                if svc_mgr == 'sysv':
-                    with self._disable_selinux(client, sudo):
-                        result[system.hostname] = self._restart_sysv(
-                            client, sudo, services)
-                elif svc_mgr == 'systemd':
-                    result[system.hostname] = self._restart_systemd(
-                        client, sudo, services)
-                else:
-                    raise NotImplementedError(
-                        'Service manager not supported: {}'.format(svc_mgr)
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            for stage in stages:
+                futures = {}
+                for system in self._cfg.systems:
+                    system_services = stage.intersection(
+                        self._cfg.services_for_roles(system.roles))
+                    if system_services:
+                        futures[system.hostname] = executor.submit(
+                            self._manage_system,
+                            action,
+                            system,
+                            system_services,
+                        )
+                # Let the whole stage finish, even if one system fails.
+                wait(futures.values())
+                for hostname, future in futures.items():
+                    result[hostname] = (
+                        result.get(hostname, ()) + tuple(future.result())
                     )
         return result
 
+    def _get_stages(self, services):
+        """Split ``services`` into a list of non-empty sets, one per stage."""
+        stages = [services.intersection(stage) for stage in self._stages]
+        leftovers = services.difference(*self._stages)
+        if stages:
+            stages[-1] |= leftovers
+        else:
+            stages.append(leftovers)
+        return [stage for stage in stages if stage]
+
+    def _manage_system(self, action, pulp_system, services):
+        """Start, stop or restart ``services`` on ``pulp_system``.
+
+        Add the time spent to ``self.timings``.
+        """
+        start_time = time.monotonic()
+        try:
+            client = Client(self._cfg, pulp_system=pulp_system)
+            svc_mgr = self._get_service_manager(self._cfg, pulp_system)
+            sudo = not self._check_root(pulp_system)
+            if svc_mgr == 'sysv':
+                with self._disable_selinux(client, sudo):
+                    return getattr(self, '_{}_sysv'.format(action))(
+                        client, sudo, services)
+            elif svc_mgr == 'systemd':
+                return getattr(self, '_{}_systemd'.format(action))(
+                    client, sudo, services)
+            else:
+                raise NotImplementedError(
+                    'Service manager "{}" not supported on "{}"'.format(
+                        svc_mgr, pulp_system.hostname)
+                )
+        finally:
+            elapsed = time.monotonic() - start_time
+            hostname = pulp_system.hostname
+            self.timings[hostname] = self.timings.get(hostname, 0) + elapsed
+
 
 class ServiceManager(BaseServiceManager):
     """A service manager on a system.
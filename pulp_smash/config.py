@@ -13,6 +13,7 @@ import json
 import os
 import warnings
 from copy import deepcopy
+from types import MappingProxyType
 from urllib.parse import urlparse
 
 import jsonschema
@@ -27,6 +28,10 @@ from pulp_smash import exceptions
 # avoid a config file by fetching values from the UI.
 _CONFIG = None
 
+# `_get_validator` uses this as a cache. Compiling a validator, and checking
+# CONFIG_JSON_SCHEMA itself, need only be done once per process.
+_VALIDATOR = None
+
 REQUIRED_ROLES = {
     'amqp broker',
     'api',
@@ -69,7 +74,18 @@ CONFIG_JSON_SCHEMA = {
             'type': 'array',
             'minItems': 1,
             'items': {'$ref': '#/definitions/system'},
-        }
+        },
+        'task_polling': {
+            'additionalProperties': False,
+            'type': 'object',
+            'properties': {
+                'initial': {'type': 'number', 'minimum': 0},
+                'factor': {'type': 'number', 'minimum': 1},
+                'maximum': {'type': 'number', 'minimum': 0},
+                'timeout': {'type': 'number', 'minimum': 0},
+                'batch': {'type': 'boolean'},
+            }
+        },
     },
     'definitions': {
         'system': {
@@ -107,6 +123,13 @@ CONFIG_JSON_SCHEMA = {
                                 'verify': {
                                     'type': ['boolean', 'string'],
                                 },
+                                'pool_size': {
+                                    'minimum': 1,
+                                    'type': 'integer',
+                                },
+                                'keep_alive': {
+                                    'type': 'boolean',
+                                },
                             }
                         },
                         'mongod': {
@@ -130,7 +153,10 @@ CONFIG_JSON_SCHEMA = {
                                 'transport': {
                                     'enum': ['local', 'ssh'],
                                     'type': 'string',
-                                }
+                                },
+                                'user': {
+                                    'type': 'string',
+                                },
                             }
                         },
                         'squid': {
@@ -152,20 +178,56 @@ def _public_attrs(obj):
     }
 
 
+def _freeze(obj):
+    """Return a read-only version of ``obj``.
+
+    Dicts become read-only mappings, and lists and tuples become tuples, all
+    recursively. ``PulpSystem`` objects are rebuilt with read-only roles. Other
+    objects are returned as-is.
+    """
+    if isinstance(obj, PulpSystem):
+        return PulpSystem(obj.hostname, _freeze(obj.roles))
+    if isinstance(obj, (dict, MappingProxyType)):
+        return MappingProxyType({
+            key: _freeze(val) for key, val in obj.items()
+        })
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(val) for val in obj)
+    return obj
+
+
+def _thaw(obj):
+    """Return a mutable deep copy of ``obj``. The inverse of ``_freeze``."""
+    if isinstance(obj, PulpSystem):
+        return PulpSystem(obj.hostname, _thaw(obj.roles))
+    if isinstance(obj, (dict, MappingProxyType)):
+        return {key: _thaw(val) for key, val in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_thaw(val) for val in obj]
+    return deepcopy(obj)
+
+
 def get_config():
-    """Return a copy of the global ``PulpSmashConfig`` object.
+    """Return the global ``PulpSmashConfig`` object.
 
     This method makes use of a cache. If the cache is empty, the configuration
-    file is parsed and the cache is populated. Otherwise, a copy of the cached
+    file is parsed and the cache is populated. Otherwise, the cached
     configuration object is returned.
 
-    :returns: A copy of the global server configuration object.
+    The returned object is shared by all callers, and is therefore read-only.
+    (See :meth:`pulp_smash.config.PulpSmashConfig.freeze`.) Callers that need
+    to make changes should work on a copy:
+
+    >>> cfg = get_config().copy()
+    >>> cfg.pulp_auth = ['alice', 'hunter2']
+
+    :returns: The global server configuration object.
     :rtype: pulp_smash.config.PulpSmashConfig
     """
     global _CONFIG  # pylint:disable=global-statement
     if _CONFIG is None:
-        _CONFIG = PulpSmashConfig().read()
-    return deepcopy(_CONFIG)
+        _CONFIG = PulpSmashConfig().read().freeze()
+    return _CONFIG
 
 
 def convert_old_config(config_dict):
@@ -209,6 +271,22 @@ def convert_old_config(config_dict):
     return converted
 
 
+def _get_validator():
+    """Return a validator for ``CONFIG_JSON_SCHEMA``.
+
+    The validator is built, and the schema checked, on the first call only.
+    """
+    global _VALIDATOR  # pylint:disable=global-statement
+    if _VALIDATOR is None:
+        validator_cls = jsonschema.validators.validator_for(CONFIG_JSON_SCHEMA)
+        validator_cls.check_schema(CONFIG_JSON_SCHEMA)
+        _VALIDATOR = validator_cls(
+            schema=CONFIG_JSON_SCHEMA,
+            format_checker=jsonschema.FormatChecker(),
+        )
+    return _VALIDATOR
+
+
 def validate_config(config_dict):
     """Validate the config file schema.
 
@@ -217,10 +295,7 @@ def validate_config(config_dict):
     :raises pulp_smash.exceptions.ConfigValidationError: If the any validation
         error is found.
     """
-    validator_cls = jsonschema.validators.validator_for(CONFIG_JSON_SCHEMA)
-    validator = validator_cls(
-        schema=CONFIG_JSON_SCHEMA, format_checker=jsonschema.FormatChecker())
-    validator.check_schema(CONFIG_JSON_SCHEMA)
+    validator = _get_validator()
     messages = []
 
     if not validator.is_valid(config_dict):
@@ -256,6 +331,39 @@ def validate_config(config_dict):
         ])
 
 
+def validate_configs(paths):
+    """Validate many config files.
+
+    Each file is read and validated with :func:`validate_config`. Validation
+    problems are collected, rather than raised, so that every file is checked.
+
+    :param paths: An iterable of paths to config files.
+    :returns: A dict mapping each path to a list of error messages. The list
+        is empty if the file is valid.
+    """
+    results = {}
+    for path in paths:
+        try:
+            with open(path) as handle:
+                config_dict = json.load(handle)
+        except (OSError, ValueError) as err:
+            results[path] = ['Failed to read config because {}.'.format(err)]
+            continue
+        if 'systems' not in config_dict and 'pulp' in config_dict:
+            results[path] = [
+                'The config follows the old configuration file format. Run '
+                '`pulp-smash settings validate` on it to see how to update it.'
+            ]
+            continue
+        try:
+            validate_config(config_dict)
+        except exceptions.ConfigValidationError as err:
+            results[path] = err.error_messages
+        else:
+            results[path] = []
+    return results
+
+
 # Representation of a system and its roles."""
 PulpSystem = collections.namedtuple('PulpSystem', 'hostname roles')
 
@@ -314,31 +422,89 @@ class PulpSmashConfig(object):
         library's ``packaging.version.Version`` class.
     :param systems: A list of `pulp_smash.config.PulpSystem`. Mapping every
         system on a given Pulp deployment.
+    :param task_polling: A dict of keyword arguments for
+        :class:`pulp_smash.api.PollSchedule`, such as ``{'initial': 0.05,
+        'maximum': 5}``. It controls how often tasks are polled, and for how
+        long. It may also contain a ``batch`` key, telling whether task states
+        should be looked up in batches. (See :func:`pulp_smash.api.poll_task`.)
+        Defaults to an empty dict.
 
     .. _packaging: https://packaging.pypa.io/en/latest/
     """
 
-    def __init__(self, pulp_auth=None, pulp_version=None, systems=None):
+    def __init__(
+            self,
+            pulp_auth=None,
+            pulp_version=None,
+            systems=None,
+            task_polling=None):
         """Initialize this object with needed instance attributes."""
         self.pulp_auth = pulp_auth
         self.pulp_version = pulp_version
         self.systems = systems
         if self.systems is None:
             self.systems = []
+        self.task_polling = task_polling
+        if self.task_polling is None:
+            self.task_polling = {}
         self._xdg_config_file = os.environ.get(
             'PULP_SMASH_CONFIG_FILE',
             'settings.json'
         )
         self._xdg_config_dir = 'pulp_smash'
+        self._frozen = False
+
+    def __setattr__(self, name, value):  # noqa
+        if getattr(self, '_frozen', False):
+            raise AttributeError(
+                'This {} object is read-only, and attribute {} cannot be set. '
+                'Call copy() to get a modifiable copy.'
+                .format(type(self).__name__, name)
+            )
+        super().__setattr__(name, value)
+
+    def __deepcopy__(self, memo):  # noqa
+        return self.copy()
 
     def __repr__(self):  # noqa
-        attrs = _public_attrs(self)
+        attrs = _thaw(_public_attrs(self))
         attrs['pulp_version'] = type('')(attrs['pulp_version'])
         str_kwargs = ', '.join(
             '{}={}'.format(key, repr(value)) for key, value in attrs.items()
         )
         return '{}({})'.format(type(self).__name__, str_kwargs)
 
+    def freeze(self):
+        """Make this object read-only, and return it.
+
+        Public attributes can no longer be set, and the containers they hold,
+        such as ``systems`` and each system's ``roles``, are replaced with
+        read-only equivalents. A frozen object can be shared safely, without
+        copying. This is how :func:`pulp_smash.config.get_config` avoids
+        copying the global configuration object on every call.
+
+        :returns: This object.
+        :rtype: PulpSmashConfig
+        """
+        if not self._frozen:
+            for key, value in _public_attrs(self).items():
+                setattr(self, key, _freeze(value))
+            self._frozen = True
+        return self
+
+    def copy(self):
+        """Return a modifiable deep copy of this object.
+
+        The copy is never read-only, even if this object is.
+
+        :rtype: PulpSmashConfig
+        """
+        cfg = PulpSmashConfig(**_thaw(_public_attrs(self)))
+        # pylint:disable=protected-access
+        cfg._xdg_config_file = self._xdg_config_file
+        cfg._xdg_config_dir = self._xdg_config_dir
+        return cfg
+
     @property
     def default_config_file_path(self):
         """Build the default config file path."""
@@ -401,7 +567,8 @@ class PulpSmashConfig(object):
         systems = [
             PulpSystem(**system) for system in config_file.get('systems', [])
         ]
-        return PulpSmashConfig(pulp_auth, pulp_version, systems)
+        task_polling = config_file.get('task_polling', {})
+        return PulpSmashConfig(pulp_auth, pulp_version, systems, task_polling)
 
     def get_systems(self, role):
         """Return a list of systems fulfilling the given role.
@@ -501,9 +668,10 @@ class PulpSmashConfig(object):
         """
         if not pulp_system:
             pulp_system = self.get_systems('api')[0]
-        kwargs = deepcopy(pulp_system.roles['api'])
+        kwargs = _thaw(pulp_system.roles['api'])
         kwargs['auth'] = tuple(self.pulp_auth)
-        kwargs.pop('scheme', None)
+        for key in ('scheme', 'pool_size', 'keep_alive'):
+            kwargs.pop(key, None)
         return kwargs
 
 
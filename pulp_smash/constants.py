@@ -1,11 +1,19 @@
 # coding=utf-8
 """Values usable by multiple test modules."""
+import os
 from urllib.parse import quote_plus, urljoin
 from types import MappingProxyType  # used to form an immutable dictionary
 
-PULP_FIXTURES_BASE_URL = 'https://repos.fedorapeople.org/pulp/pulp/fixtures/'
+PULP_FIXTURES_BASE_URL = os.environ.get(
+    'PULP_SMASH_FIXTURES_BASE_URL',
+    'https://repos.fedorapeople.org/pulp/pulp/fixtures/',
+)
 """A URL at which generated `pulp fixtures`_ are hosted.
 
+Every fixture URL in this module is relative to this one. To use a local
+mirror of the fixtures, set the ``PULP_SMASH_FIXTURES_BASE_URL`` environment
+variable. See :mod:`pulp_smash.fixtures`.
+
 .. _pulp fixtures: https://github.com/PulpQE/pulp-fixtures/
 """
 
@@ -492,10 +500,7 @@ repository which feed is :data:`pulp_smash.constants.RPM_SIGNED_FEED_URL`.
 RPM_ERRATUM_RPM_NAME = 'gorilla'
 """The name of the RPM named by :data:`pulp_smash.constants.RPM_ERRATUM_ID`."""
 
-RPM_ERRATUM_URL = (
-    'https://repos.fedorapeople.org'
-    '/repos/pulp/pulp/fixtures/rpm-erratum/erratum.json'
-)
+RPM_ERRATUM_URL = urljoin(PULP_FIXTURES_BASE_URL, 'rpm-erratum/erratum.json')
 """The URL to an JSON erratum file for an RPM repository.
 
 .. NOTE:: This erratum is also used by several of the RPM repositories
@@ -561,8 +566,8 @@ metadata/rpm
     Used by ``repodata/repomd.xml``.
 """
 
-RPM_PKGLISTS_UPDATEINFO_FEED_URL = (
-    'https://repos.fedorapeople.org/pulp/pulp/fixtures/'
+RPM_PKGLISTS_UPDATEINFO_FEED_URL = urljoin(
+    PULP_FIXTURES_BASE_URL,
     'rpm-pkglists-updateinfo/'
 )
 """A repository whose updateinfo file has multiple ``<pkglist>`` sections."""
@@ -640,6 +645,20 @@ SRPM_UNSIGNED_URL = urljoin(SRPM_UNSIGNED_FEED_URL, SRPM)
 Built from :data:`SRPM_UNSIGNED_FEED_URL` and :data:`SRPM`.
 """
 
+TASKS_PATH = '/pulp/api/v2/tasks/'
+"""See: `Task Management`_.
+
+.. _Task Management:
+    https://docs.pulpproject.org/en/latest/dev-guide/integration/rest-api/tasks.html
+"""
+
+TASKS_SEARCH_PATH = urljoin(TASKS_PATH, 'search/')
+"""See: `Task Management`_.
+
+.. _Task Management:
+    https://docs.pulpproject.org/en/latest/dev-guide/integration/rest-api/tasks.html
+"""
+
 USER_PATH = '/pulp/api/v2/users/'
 """See: `User APIs`_.
 
@@ -102,6 +102,14 @@ class NoKnownServiceManagerError(Exception):
     """
 
 
+class TaskNotFoundError(Exception):
+    """We polled a task, but Pulp has no record of it.
+
+    See :func:`pulp_smash.api.poll_task` for more information on how task
+    polling is handled.
+    """
+
+
 class TaskReportError(Exception):
     """A task contains an error.
 
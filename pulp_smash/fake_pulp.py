@@ -0,0 +1,873 @@
+# coding=utf-8
+"""A fake Pulp 2 server, for developing and benchmarking Pulp Smash itself.
+
+The server keeps its state in memory, and implements the subset of Pulp's v2
+API used by Pulp Smash: repositories, importers, distributors, call reports
+and tasks, content uploads, unit searches, users, consumers and orphans. It
+can't sync or publish anything for real. Instead, syncs and publishes spawn
+tasks which do nothing, and units are only added to repositories by upload.
+
+It may be started in a thread, and targeted by :class:`pulp_smash.api.Client`:
+
+>>> import threading
+>>> from pulp_smash import api, config, fake_pulp
+>>> server = fake_pulp.FakePulpServer('127.0.0.1', 0, task_latency=0.5)
+>>> threading.Thread(target=server.serve_forever, daemon=True).start()
+>>> cfg = config.PulpSmashConfig(
+...     pulp_auth=['admin', 'admin'],
+...     systems=[config.PulpSystem(
+...         hostname=server.hostname,
+...         roles={'api': {'scheme': 'http'}},
+...     )],
+... )
+>>> api.Client(cfg).post('/pulp/api/v2/repositories/', {'id': 'foo'})
+
+Tasks take ``task_latency`` seconds to finish, so that pollers have something
+to wait for. To exercise error handling, a share of the tasks fail, as named
+by ``task_failure_rate``, and a share of the requests get an HTTP 500
+response, as named by ``request_failure_rate``. Both are chosen with a random
+number generator seeded with ``seed``, so failures are reproducible.
+
+Like Pulp's task reaper, the server forgets tasks ``task_retention`` seconds
+after they finish, so that a long benchmark doesn't use ever more memory.
+
+The same can be done with the ``pulp-smash fake-pulp`` command.
+"""
+import collections
+import copy
+import hashlib
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+from pulp_smash.constants import (
+    CONSUMERS_PATH,
+    CONTENT_UPLOAD_PATH,
+    LOGIN_PATH,
+    ORPHANS_PATH,
+    REPOSITORY_PATH,
+    TASKS_PATH,
+    TASKS_SEARCH_PATH,
+    USER_PATH,
+)
+
+
+class _HTTPError(Exception):
+    """An error to be reported to the client with an HTTP status code."""
+
+    def __init__(self, status, message):
+        """Initialize a new object."""
+        super().__init__(message)
+        self.status = status
+
+
+def _now():
+    """Return the current time, formatted like Pulp's timestamps."""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def _new_id():
+    """Return a new ID for a unit, upload or task."""
+    return str(uuid.uuid4())
+
+
+class FakePulp(object):
+    """The state of a fake Pulp deployment, and the operations on it.
+
+    Each public method implements one API endpoint, and returns a ``(status,
+    body)`` tuple, where ``body`` is JSON-serializable. Methods are
+    thread-safe. See :class:`FakePulpServer` for the meaning of the
+    parameters.
+    """
+
+    # pylint:disable=too-many-public-methods
+
+    def __init__(
+            self,
+            task_latency=0,
+            task_failure_rate=0,
+            request_failure_rate=0,
+            seed=None,
+            task_retention=600):
+        """Initialize a new object."""
+        self.task_latency = task_latency
+        self.task_retention = task_retention
+        self.task_failure_rate = task_failure_rate
+        self.request_failure_rate = request_failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.repos = {}
+        # A dict mapping repository IDs to sets of unit IDs.
+        self.associations = {}
+        # A dict mapping unit IDs to units, and unit keys to unit IDs.
+        self.units = {}
+        self._unit_ids = {}
+        # A dict mapping upload IDs to bytearrays.
+        self.uploads = {}
+        # Ordered by when tasks were spawned, which is roughly when they end.
+        self.tasks = collections.OrderedDict()
+        self.users = {}
+        self.consumers = {}
+
+    # Failure injection and tasks.
+
+    def should_fail_request(self):
+        """Tell whether the current request should get an HTTP 500."""
+        with self._lock:
+            return self._random.random() < self.request_failure_rate
+
+    def _spawn(self, tags, effect=None):
+        """Spawn a task. Hold ``_lock``. Return a call report.
+
+        Unless the task is to fail, ``effect`` is called at once. The task
+        finishes ``task_latency`` seconds later.
+        """
+        self._prune_tasks()
+        task_id = _new_id()
+        failed = self._random.random() < self.task_failure_rate
+        if not failed and effect is not None:
+            effect()
+        self.tasks[task_id] = {
+            '_href': '{}{}/'.format(TASKS_PATH, task_id),
+            'deadline': time.monotonic() + self.task_latency,
+            'failed': failed,
+            'start_time': _now(),
+            'tags': tags,
+            'task_id': task_id,
+        }
+        return 202, {
+            'error': None,
+            'result': None,
+            'spawned_tasks': [{
+                '_href': self.tasks[task_id]['_href'],
+                'task_id': task_id,
+            }],
+        }
+
+    def _prune_tasks(self):
+        """Forget tasks that finished ``task_retention`` seconds ago.
+
+        Hold ``_lock``. Tasks are checked in the order they were spawned, and
+        pruning stops at the first task to be kept.
+        """
+        expiry = time.monotonic() - self.task_retention
+        while self.tasks:
+            task_id, task = next(iter(self.tasks.items()))
+            if task['deadline'] >= expiry:
+                break
+            del self.tasks[task_id]
+
+    def _get_task(self, task_id):
+        """Return the public representation of a task. Hold ``_lock``."""
+        try:
+            task = self.tasks[task_id]
+        except KeyError:
+            raise _HTTPError(404, 'Missing resource(s): task_id={}'.format(
+                task_id)) from None
+        error = None
+        if time.monotonic() < task['deadline']:
+            state = 'running'
+        elif task['failed']:
+            state = 'error'
+            error = {'code': 'PLP0000', 'description': 'Injected failure.'}
+        else:
+            state = 'finished'
+        return {
+            '_href': task['_href'],
+            'error': error,
+            'exception': None,
+            'progress_report': {},
+            'result': None,
+            'spawned_tasks': [],
+            'start_time': task['start_time'],
+            'state': state,
+            'tags': task['tags'],
+            'task_id': task['task_id'],
+            'traceback': None,
+        }
+
+    def get_task(self, task_id):
+        """Return a task."""
+        with self._lock:
+            return 200, self._get_task(task_id)
+
+    def list_tasks(self):
+        """Return every task."""
+        with self._lock:
+            return 200, [self._get_task(task_id) for task_id in self.tasks]
+
+    def search_tasks(self, body):
+        """Return the tasks whose IDs are named by the search criteria.
+
+        Only ``{'filters': {'task_id': {'$in': [...]}}}`` is understood.
+        """
+        task_ids = (
+            body.get('criteria', {}).get('filters', {})
+            .get('task_id', {}).get('$in')
+        )
+        with self._lock:
+            if task_ids is None:
+                task_ids = list(self.tasks)
+            return 200, [
+                self._get_task(task_id) for task_id in task_ids
+                if task_id in self.tasks
+            ]
+
+    # Repositories.
+
+    def _find_repo(self, repo_id):
+        """Return the stored repository. Hold ``_lock``."""
+        try:
+            return self.repos[repo_id]
+        except KeyError:
+            raise _HTTPError(404, 'Missing resource(s): repository={}'.format(
+                repo_id)) from None
+
+    def _get_repo(self, repo_id):
+        """Return the public representation of a repository. Hold ``_lock``."""
+        repo = copy.deepcopy(self._find_repo(repo_id))
+        counts = {}
+        for unit_id in self.associations[repo_id]:
+            type_id = self.units[unit_id]['_content_type_id']
+            counts[type_id] = counts.get(type_id, 0) + 1
+        repo['content_unit_counts'] = counts
+        repo['total_repository_units'] = sum(counts.values())
+        return repo
+
+    def list_repos(self):
+        """Return every repository."""
+        with self._lock:
+            return 200, [self._get_repo(repo_id) for repo_id in self.repos]
+
+    def create_repo(self, body):
+        """Create a repository, its importer and its distributors."""
+        repo_id = body.get('id')
+        if not repo_id:
+            raise _HTTPError(400, 'Invalid properties: id')
+        href = '{}{}/'.format(REPOSITORY_PATH, repo_id)
+        repo = {
+            '_href': href,
+            '_ns': 'repos',
+            'description': body.get('description'),
+            'display_name': body.get('display_name', repo_id),
+            'distributors': [],
+            'id': repo_id,
+            'importers': [],
+            'last_unit_added': None,
+            'last_unit_removed': None,
+            'notes': body.get('notes') or {},
+            'scratchpad': {},
+        }
+        importer_type_id = body.get('importer_type_id')
+        if importer_type_id:
+            repo['importers'].append({
+                '_href': '{}importers/{}/'.format(href, importer_type_id),
+                'config': body.get('importer_config') or {},
+                'id': importer_type_id,
+                'importer_type_id': importer_type_id,
+                'last_sync': None,
+                'repo_id': repo_id,
+            })
+        for distributor in body.get('distributors') or ():
+            repo['distributors'].append(self._new_distributor(
+                repo_id, distributor))
+        with self._lock:
+            if repo_id in self.repos:
+                raise _HTTPError(409, 'Duplicate resource: {}'.format(
+                    repo_id))
+            self.repos[repo_id] = repo
+            self.associations[repo_id] = set()
+            return 201, self._get_repo(repo_id)
+
+    def get_repo(self, repo_id):
+        """Return a repository."""
+        with self._lock:
+            return 200, self._get_repo(repo_id)
+
+    def update_repo(self, repo_id, body):
+        """Update a repository, its importer and its distributors."""
+        with self._lock:
+            repo = self._find_repo(repo_id)
+            for key, value in (body.get('delta') or {}).items():
+                if key == 'notes':
+                    for note, note_value in value.items():
+                        if note_value is None:
+                            repo['notes'].pop(note, None)
+                        else:
+                            repo['notes'][note] = note_value
+                else:
+                    repo[key] = value
+            for importer in repo['importers']:
+                importer['config'].update(body.get('importer_config') or {})
+            distributor_configs = body.get('distributor_configs') or {}
+            for distributor in repo['distributors']:
+                distributor['config'].update(
+                    distributor_configs.get(distributor['id'], {}))
+            return 200, {
+                'error': None,
+                'result': self._get_repo(repo_id),
+                'spawned_tasks': [],
+            }
+
+    def delete_repo(self, repo_id):
+        """Delete a repository. Its units may become orphans."""
+        def effect():
+            """Delete the repository."""
+            del self.repos[repo_id]
+            del self.associations[repo_id]
+
+        with self._lock:
+            self._find_repo(repo_id)
+            return self._spawn(self._get_tags(repo_id, 'delete'), effect)
+
+    @staticmethod
+    def _get_tags(repo_id, action):
+        """Return the tags of a task acting on a repository."""
+        return [
+            'pulp:repository:{}'.format(repo_id),
+            'pulp:action:{}'.format(action),
+        ]
+
+    def sync_repo(self, repo_id, body):  # pylint:disable=unused-argument
+        """Pretend to sync a repository."""
+        with self._lock:
+            repo = self._find_repo(repo_id)
+            if not repo['importers']:
+                raise _HTTPError(404, 'Missing resource(s): importer')
+
+            def effect():
+                """Record the time of the sync."""
+                repo['importers'][0]['last_sync'] = _now()
+
+            return self._spawn(self._get_tags(repo_id, 'sync'), effect)
+
+    def publish_repo(self, repo_id, body):
+        """Pretend to publish a repository with the distributor in ``body``."""
+        with self._lock:
+            repo = self._find_repo(repo_id)
+            distributor = self._find_distributor(repo, (body or {}).get('id'))
+
+            def effect():
+                """Record the time of the publish."""
+                distributor['last_publish'] = _now()
+
+            return self._spawn(self._get_tags(repo_id, 'publish'), effect)
+
+    # Importers and distributors.
+
+    @staticmethod
+    def _new_distributor(repo_id, body):
+        """Return a new distributor, as described by ``body``."""
+        distributor_id = body.get('distributor_id') or _new_id()
+        return {
+            '_href': '{}{}/distributors/{}/'.format(
+                REPOSITORY_PATH, repo_id, distributor_id),
+            'auto_publish': body.get('auto_publish', False),
+            'config': body.get('distributor_config') or {},
+            'distributor_type_id': body.get('distributor_type_id'),
+            'id': distributor_id,
+            'last_publish': None,
+            'repo_id': repo_id,
+        }
+
+    @staticmethod
+    def _find_distributor(repo, distributor_id):
+        """Return the distributor of ``repo`` named ``distributor_id``."""
+        for distributor in repo['distributors']:
+            if distributor['id'] == distributor_id:
+                return distributor
+        raise _HTTPError(404, 'Missing resource(s): distributor={}'.format(
+            distributor_id))
+
+    def list_importers(self, repo_id):
+        """Return the importers of a repository."""
+        with self._lock:
+            return 200, self._get_repo(repo_id)['importers']
+
+    def list_distributors(self, repo_id):
+        """Return the distributors of a repository."""
+        with self._lock:
+            return 200, self._get_repo(repo_id)['distributors']
+
+    def add_distributor(self, repo_id, body):
+        """Add a distributor to a repository."""
+        with self._lock:
+            repo = self._find_repo(repo_id)
+            distributor = self._new_distributor(repo_id, body)
+            repo['distributors'].append(distributor)
+            return 201, copy.deepcopy(distributor)
+
+    def get_distributor(self, repo_id, distributor_id):
+        """Return a distributor of a repository."""
+        with self._lock:
+            repo = self._get_repo(repo_id)
+            return 200, self._find_distributor(repo, distributor_id)
+
+    # Content.
+
+    def create_upload(self):
+        """Start an upload."""
+        upload_id = _new_id()
+        with self._lock:
+            self.uploads[upload_id] = bytearray()
+        return 201, {
+            '_href': '{}{}/'.format(CONTENT_UPLOAD_PATH, upload_id),
+            'upload_id': upload_id,
+        }
+
+    def _get_upload(self, upload_id):
+        """Return the data uploaded so far. Hold ``_lock``."""
+        try:
+            return self.uploads[upload_id]
+        except KeyError:
+            raise _HTTPError(404, 'Missing resource(s): upload_request={}'
+                             .format(upload_id)) from None
+
+    def upload_chunk(self, upload_id, offset, data):
+        """Write ``data`` at ``offset`` in an upload."""
+        offset = int(offset)
+        with self._lock:
+            upload = self._get_upload(upload_id)
+            if len(upload) < offset + len(data):
+                upload.extend(bytes(offset + len(data) - len(upload)))
+            upload[offset:offset + len(data)] = data
+        return 200, None
+
+    def delete_upload(self, upload_id):
+        """Forget an upload."""
+        with self._lock:
+            self._get_upload(upload_id)
+            del self.uploads[upload_id]
+        return 200, None
+
+    def import_upload(self, repo_id, body):
+        """Import an upload into a repository, as a new or existing unit."""
+        type_id = body.get('unit_type_id')
+        unit_key = body.get('unit_key') or {}
+        with self._lock:
+            self._find_repo(repo_id)
+            data = bytes(self._get_upload(body.get('upload_id')))
+            if not unit_key:
+                unit_key = {'checksum': hashlib.sha256(data).hexdigest()}
+
+            def effect():
+                """Create the unit if needed, and add it to the repository."""
+                key = json.dumps([type_id, unit_key], sort_keys=True)
+                if key not in self._unit_ids:
+                    unit = dict(body.get('unit_metadata') or {})
+                    unit.update(unit_key)
+                    unit.update({
+                        '_content_type_id': type_id,
+                        '_id': _new_id(),
+                        'size': len(data),
+                    })
+                    self.units[unit['_id']] = unit
+                    self._unit_ids[key] = unit['_id']
+                self.associations[repo_id].add(self._unit_ids[key])
+                self.repos[repo_id]['last_unit_added'] = _now()
+
+            return self._spawn(
+                self._get_tags(repo_id, 'import_upload'), effect)
+
+    def _find_units(self, repo_id, criteria):
+        """Return the IDs of the units in a repository matching ``criteria``.
+
+        Only the ``type_ids`` and ``limit`` criteria are understood. Hold
+        ``_lock``.
+        """
+        self._find_repo(repo_id)
+        unit_ids = sorted(self.associations[repo_id])
+        type_ids = criteria.get('type_ids')
+        if type_ids is not None:
+            unit_ids = [
+                unit_id for unit_id in unit_ids
+                if self.units[unit_id]['_content_type_id'] in type_ids
+            ]
+        if criteria.get('limit') is not None:
+            unit_ids = unit_ids[:criteria['limit']]
+        return unit_ids
+
+    def search_units(self, repo_id, body):
+        """Return the units in a repository matching the criteria."""
+        criteria = (body or {}).get('criteria') or {}
+        with self._lock:
+            results = []
+            for unit_id in self._find_units(repo_id, criteria):
+                unit = copy.deepcopy(self.units[unit_id])
+                results.append({
+                    'metadata': unit,
+                    'repo_id': repo_id,
+                    'unit_id': unit_id,
+                    'unit_type_id': unit['_content_type_id'],
+                })
+            return 200, results
+
+    def associate_units(self, repo_id, body):
+        """Copy units matching the criteria from the source repository."""
+        source_id = body.get('source_repo_id')
+        with self._lock:
+            self._find_repo(repo_id)
+            unit_ids = self._find_units(source_id, body.get('criteria') or {})
+
+            def effect():
+                """Add the units to the repository."""
+                self.associations[repo_id].update(unit_ids)
+                self.repos[repo_id]['last_unit_added'] = _now()
+
+            return self._spawn(self._get_tags(repo_id, 'associate'), effect)
+
+    def unassociate_units(self, repo_id, body):
+        """Remove units matching the criteria from a repository."""
+        with self._lock:
+            unit_ids = self._find_units(repo_id, body.get('criteria') or {})
+
+            def effect():
+                """Remove the units from the repository."""
+                self.associations[repo_id].difference_update(unit_ids)
+                self.repos[repo_id]['last_unit_removed'] = _now()
+
+            return self._spawn(
+                self._get_tags(repo_id, 'unassociate'), effect)
+
+    def _get_orphan_ids(self):
+        """Return the IDs of units not in any repository. Hold ``_lock``."""
+        associated = set()
+        for unit_ids in self.associations.values():
+            associated.update(unit_ids)
+        return set(self.units) - associated
+
+    def count_orphans(self):
+        """Return the number of orphans of each content type."""
+        with self._lock:
+            counts = {}
+            for unit_id in self._get_orphan_ids():
+                type_id = self.units[unit_id]['_content_type_id']
+                counts.setdefault(type_id, {
+                    '_href': '{}{}/'.format(ORPHANS_PATH, type_id),
+                    'count': 0,
+                })
+                counts[type_id]['count'] += 1
+            return 200, counts
+
+    def delete_orphans(self):
+        """Delete every orphan."""
+        def effect():
+            """Delete the orphans."""
+            orphan_ids = self._get_orphan_ids()
+            for unit_id in orphan_ids:
+                del self.units[unit_id]
+            for key, unit_id in tuple(self._unit_ids.items()):
+                if unit_id in orphan_ids:
+                    del self._unit_ids[key]
+
+        with self._lock:
+            return self._spawn(['pulp:action:delete_orphans'], effect)
+
+    # Users, consumers and logins.
+
+    def list_users(self):
+        """Return every user."""
+        with self._lock:
+            return 200, [copy.deepcopy(user) for user in self.users.values()]
+
+    def create_user(self, body):
+        """Create a user."""
+        login = body.get('login')
+        if not login:
+            raise _HTTPError(400, 'Invalid properties: login')
+        user = {
+            '_href': '{}{}/'.format(USER_PATH, login),
+            '_id': {'$oid': _new_id()},
+            'id': _new_id(),
+            'login': login,
+            'name': body.get('name', login),
+            'roles': body.get('roles') or [],
+        }
+        with self._lock:
+            if login in self.users:
+                raise _HTTPError(409, 'Duplicate resource: {}'.format(login))
+            self.users[login] = user
+            return 201, copy.deepcopy(user)
+
+    def _get_user(self, login):
+        """Return a user. Hold ``_lock``."""
+        try:
+            return self.users[login]
+        except KeyError:
+            raise _HTTPError(404, 'Missing resource(s): user={}'.format(
+                login)) from None
+
+    def get_user(self, login):
+        """Return a user."""
+        with self._lock:
+            return 200, copy.deepcopy(self._get_user(login))
+
+    def update_user(self, login, body):
+        """Update a user's name or roles."""
+        with self._lock:
+            user = self._get_user(login)
+            delta = (body or {}).get('delta') or {}
+            for key in ('name', 'roles'):
+                if key in delta:
+                    user[key] = delta[key]
+            return 200, copy.deepcopy(user)
+
+    def delete_user(self, login):
+        """Delete a user."""
+        with self._lock:
+            self._get_user(login)
+            del self.users[login]
+        return 200, None
+
+    def list_consumers(self):
+        """Return every consumer."""
+        with self._lock:
+            return 200, [
+                copy.deepcopy(consumer)
+                for consumer in self.consumers.values()
+            ]
+
+    def create_consumer(self, body):
+        """Register a consumer."""
+        consumer_id = body.get('id')
+        if not consumer_id:
+            raise _HTTPError(400, 'Invalid properties: id')
+        consumer = {
+            '_href': '{}{}/'.format(CONSUMERS_PATH, consumer_id),
+            'description': body.get('description'),
+            'display_name': body.get('display_name', consumer_id),
+            'id': consumer_id,
+            'notes': body.get('notes') or {},
+        }
+        with self._lock:
+            if consumer_id in self.consumers:
+                raise _HTTPError(409, 'Duplicate resource: {}'.format(
+                    consumer_id))
+            self.consumers[consumer_id] = consumer
+            return 201, {
+                'certificate': 'FAKE CERTIFICATE',
+                'consumer': copy.deepcopy(consumer),
+            }
+
+    def _get_consumer(self, consumer_id):
+        """Return a consumer. Hold ``_lock``."""
+        try:
+            return self.consumers[consumer_id]
+        except KeyError:
+            raise _HTTPError(404, 'Missing resource(s): consumer={}'.format(
+                consumer_id)) from None
+
+    def get_consumer(self, consumer_id):
+        """Return a consumer."""
+        with self._lock:
+            return 200, copy.deepcopy(self._get_consumer(consumer_id))
+
+    def delete_consumer(self, consumer_id):
+        """Unregister a consumer."""
+        with self._lock:
+            self._get_consumer(consumer_id)
+            del self.consumers[consumer_id]
+        return 200, None
+
+    @staticmethod
+    def login():
+        """Return a fake key and certificate."""
+        return 200, {'certificate': 'FAKE CERTIFICATE', 'key': 'FAKE KEY'}
+
+
+def _route(method, path, name, body_kind='none'):
+    """Return a route, as used by ``_FakePulpRequestHandler``.
+
+    :param method: An HTTP method.
+    :param path: A regular expression matching request paths. Groups are
+        passed to the handler.
+    :param name: The name of a :class:`FakePulp` method handling requests.
+    :param body_kind: Whether the request body is passed to the handler as
+        "json", "bytes", or not at all ("none").
+    """
+    return (method, re.compile(path + '$'), name, body_kind)
+
+
+_ID = '([^/]+)'
+_REPO = REPOSITORY_PATH + _ID + '/'
+_ROUTES = (
+    _route('POST', LOGIN_PATH, 'login'),
+    _route('GET', REPOSITORY_PATH, 'list_repos'),
+    _route('POST', REPOSITORY_PATH, 'create_repo', 'json'),
+    _route('GET', _REPO, 'get_repo'),
+    _route('PUT', _REPO, 'update_repo', 'json'),
+    _route('DELETE', _REPO, 'delete_repo'),
+    _route('POST', _REPO + 'actions/sync/', 'sync_repo', 'json'),
+    _route('POST', _REPO + 'actions/publish/', 'publish_repo', 'json'),
+    _route('POST', _REPO + 'actions/associate/', 'associate_units', 'json'),
+    _route(
+        'POST', _REPO + 'actions/unassociate/', 'unassociate_units', 'json'),
+    _route('POST', _REPO + 'actions/import_upload/', 'import_upload', 'json'),
+    _route('POST', _REPO + 'search/units/', 'search_units', 'json'),
+    _route('GET', _REPO + 'importers/', 'list_importers'),
+    _route('GET', _REPO + 'distributors/', 'list_distributors'),
+    _route('POST', _REPO + 'distributors/', 'add_distributor', 'json'),
+    _route('GET', _REPO + 'distributors/' + _ID + '/', 'get_distributor'),
+    _route('POST', CONTENT_UPLOAD_PATH, 'create_upload'),
+    _route(
+        'PUT', CONTENT_UPLOAD_PATH + _ID + '/([0-9]+)/', 'upload_chunk',
+        'bytes'),
+    _route('DELETE', CONTENT_UPLOAD_PATH + _ID + '/', 'delete_upload'),
+    _route('GET', '/' + ORPHANS_PATH, 'count_orphans'),
+    _route('DELETE', '/' + ORPHANS_PATH, 'delete_orphans'),
+    _route('GET', TASKS_PATH, 'list_tasks'),
+    _route('POST', TASKS_SEARCH_PATH, 'search_tasks', 'json'),
+    _route('GET', TASKS_PATH + _ID + '/', 'get_task'),
+    _route('GET', USER_PATH, 'list_users'),
+    _route('POST', USER_PATH, 'create_user', 'json'),
+    _route('GET', USER_PATH + _ID + '/', 'get_user'),
+    _route('PUT', USER_PATH + _ID + '/', 'update_user', 'json'),
+    _route('DELETE', USER_PATH + _ID + '/', 'delete_user'),
+    _route('GET', CONSUMERS_PATH, 'list_consumers'),
+    _route('POST', CONSUMERS_PATH, 'create_consumer', 'json'),
+    _route('GET', CONSUMERS_PATH + _ID + '/', 'get_consumer'),
+    _route('DELETE', CONSUMERS_PATH + _ID + '/', 'delete_consumer'),
+)
+
+
+class _FakePulpRequestHandler(BaseHTTPRequestHandler):
+    """Answer requests with the :class:`FakePulp` at ``self.server.pulp``."""
+
+    # Keep connections open, as Pulp Smash's sessions expect.
+    protocol_version = 'HTTP/1.1'
+    # Don't let small responses wait for the client's delayed ACKs.
+    disable_nagle_algorithm = True
+
+    def do_DELETE(self):  # pylint:disable=invalid-name
+        """Handle a DELETE request."""
+        self.handle_request()
+
+    def do_GET(self):  # pylint:disable=invalid-name
+        """Handle a GET request."""
+        self.handle_request()
+
+    def do_POST(self):  # pylint:disable=invalid-name
+        """Handle a POST request."""
+        self.handle_request()
+
+    def do_PUT(self):  # pylint:disable=invalid-name
+        """Handle a PUT request."""
+        self.handle_request()
+
+    def handle_request(self):
+        """Route the request to the fake Pulp, and send its response."""
+        path = urlsplit(self.path).path
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length)
+        try:
+            if self.server.pulp.should_fail_request():
+                raise _HTTPError(500, 'Injected failure.')
+            for method, pattern, name, body_kind in _ROUTES:
+                match = pattern.match(path)
+                if method != self.command or not match:
+                    continue
+                args = list(match.groups())
+                if body_kind == 'json':
+                    try:
+                        args.append(json.loads(data.decode('utf-8') or '{}'))
+                    except ValueError:
+                        raise _HTTPError(
+                            400, 'Invalid JSON document.') from None
+                elif body_kind == 'bytes':
+                    args.append(data)
+                status, body = getattr(self.server.pulp, name)(*args)
+                break
+            else:
+                raise _HTTPError(404, 'Unknown path: {}'.format(path))
+        except _HTTPError as err:
+            status, body = err.status, {
+                'error_message': str(err),
+                'exception': None,
+                'href': path,
+                'http_request_method': self.command,
+                'http_status': err.status,
+                'traceback': None,
+            }
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+        """Only log requests if the server is verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FakePulpServer(socketserver.ThreadingMixIn, HTTPServer):
+    """An HTTP server that pretends to be Pulp 2.
+
+    Each request is handled in its own thread. The fake deployment is
+    available as :attr:`pulp`, a :class:`FakePulp`.
+
+    :param host: The address to listen on.
+    :param port: The port to listen on. If 0, pick a free port.
+    :param task_latency: How long tasks take to finish, in seconds.
+    :param task_failure_rate: The share of tasks which fail, from 0 to 1.
+    :param request_failure_rate: The share of requests which get an HTTP 500
+        response, from 0 to 1.
+    :param seed: A seed for choosing which tasks and requests fail.
+    :param task_retention: How long finished tasks are kept, in seconds.
+    :param verbose: Whether to log each request to stderr.
+    """
+
+    daemon_threads = True
+
+    def __init__(  # pylint:disable=too-many-arguments
+            self,
+            host='127.0.0.1',
+            port=8000,
+            task_latency=0,
+            task_failure_rate=0,
+            request_failure_rate=0,
+            seed=None,
+            task_retention=600,
+            verbose=False):
+        """Initialize a new object."""
+        self.pulp = FakePulp(
+            task_latency,
+            task_failure_rate,
+            request_failure_rate,
+            seed,
+            task_retention,
+        )
+        self.verbose = verbose
+        super().__init__((host, port), _FakePulpRequestHandler)
+
+    @property
+    def hostname(self):
+        """Return the host and port, for use as a system's ``hostname``."""
+        host, port = self.server_address[:2]
+        if host in ('0.0.0.0', '::'):
+            host = self.server_name
+        return '{}:{}'.format(host, port)
+
+    @property
+    def base_url(self):
+        """Return the URL of this server."""
+        return 'http://{}/'.format(self.hostname)
+
+
+def serve(host='127.0.0.1', port=8000, **kwargs):
+    """Run a fake Pulp until interrupted.
+
+    See :class:`FakePulpServer`.
+    """
+    server = FakePulpServer(host, port, **kwargs)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,240 @@
+# coding=utf-8
+"""Tools for mirroring and serving `pulp fixtures`_ locally.
+
+By default, Pulp Smash tells Pulp to sync from fixtures hosted at
+:data:`pulp_smash.constants.PULP_FIXTURES_BASE_URL`, somewhere on the internet.
+Syncs are then slowed by WAN latency, and fail when that host is unreachable.
+This module can download the fixtures once, and serve them from a local HTTP
+server:
+
+>>> from pulp_smash import fixtures
+>>> fixtures.mirror('/srv/fixtures')
+>>> fixtures.serve('/srv/fixtures', port=8000)
+
+Then, point Pulp Smash at the mirror by setting the
+``PULP_SMASH_FIXTURES_BASE_URL`` environment variable before running the
+tests::
+
+    PULP_SMASH_FIXTURES_BASE_URL=http://mirror.example.com:8000/
+
+The same can be done with the ``pulp-smash fixtures`` command.
+
+.. _pulp fixtures: https://github.com/PulpQE/pulp-fixtures/
+"""
+import os
+import posixpath
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import unquote, urljoin, urlparse
+
+import requests
+
+from pulp_smash.constants import PULP_FIXTURES_BASE_URL
+
+# The number of bytes written to disk at a time when downloading fixtures.
+_CHUNK_SIZE = 1024 * 1024
+
+# The number of seconds to wait for a fixture host to connect or to send more
+# data, so that a stalled host can't hang a mirror.
+_TIMEOUT = 60
+
+
+class _LinkParser(HTMLParser):
+    """Collect the targets of the links in an HTML document."""
+
+    def __init__(self):
+        """Initialize a new object."""
+        super().__init__()
+        self.links = []
+
+    def error(self, message):  # pragma: no cover
+        """Ignore malformed HTML. Required by Python < 3.10."""
+
+    def handle_starttag(self, tag, attrs):
+        """Record the ``href`` of each ``<a>`` tag."""
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+
+def parse_index(base_url, html):
+    """Parse an auto-generated directory listing, like those from Apache.
+
+    Links that leave the directory, such as links to the parent directory, and
+    links that re-sort the listing, are ignored.
+
+    :param base_url: The URL of the directory. It should end with a slash.
+    :param html: The directory listing, as a string.
+    :returns: A sorted list of absolute URLs. URLs ending in a slash are
+        subdirectories.
+    """
+    parser = _LinkParser()
+    parser.feed(html)
+    parser.close()
+    urls = set()
+    for link in parser.links:
+        url = urljoin(base_url, link)
+        parts = urlparse(url)
+        if parts.query or parts.fragment:
+            continue
+        url = parts.geturl()
+        if url != base_url and url.startswith(base_url):
+            urls.add(url)
+    return sorted(urls)
+
+
+def crawl(base_url=PULP_FIXTURES_BASE_URL, paths=None, session=None):
+    """Find every file below ``base_url``, by following directory listings.
+
+    :param base_url: The URL of a directory. It should end with a slash.
+    :param paths: An iterable of paths relative to ``base_url``, such as
+        ``('rpm-signed/', 'file/')``. If given, only those subdirectories and
+        files are crawled.
+    :param session: A ``requests.Session`` with which to fetch directory
+        listings. If not given, ``requests.get`` is used.
+    :returns: A generator of absolute file URLs.
+    """
+    get = requests.get if session is None else session.get
+    if paths is None:
+        pending = [base_url]
+    else:
+        pending = [urljoin(base_url, path) for path in paths]
+    while pending:
+        url = pending.pop(0)
+        if not url.endswith('/'):
+            yield url
+            continue
+        response = get(url, timeout=_TIMEOUT)
+        response.raise_for_status()
+        pending.extend(parse_index(url, response.text))
+
+
+def _get_local_path(destination, base_url, url):
+    """Return the path at which the file at ``url`` should be saved."""
+    relative = unquote(url[len(base_url):])
+    parts = [
+        part for part in posixpath.normpath(relative).split('/')
+        if part not in ('', '.', '..')
+    ]
+    return os.path.join(destination, *parts)
+
+
+def _download(session, url, path, refresh):
+    """Download the file at ``url`` to ``path``.
+
+    Skip the download if the file exists, unless ``refresh`` is true. Write
+    the file atomically, so that an interrupted mirror leaves no partial files.
+
+    :returns: Whether the file was downloaded.
+    """
+    if os.path.exists(path) and not refresh:
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = path + '.part'
+    with session.get(url, stream=True, timeout=_TIMEOUT) as response:
+        response.raise_for_status()
+        with open(partial_path, 'wb') as handle:
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                handle.write(chunk)
+    os.replace(partial_path, path)
+    return True
+
+
+def mirror(
+        destination,
+        base_url=PULP_FIXTURES_BASE_URL,
+        paths=None,
+        refresh=False,
+        max_workers=8):
+    """Download the fixtures at ``base_url`` into directory ``destination``.
+
+    The directory tree below ``base_url`` is recreated in ``destination``.
+    Files that have already been downloaded are skipped, so an interrupted
+    mirror can be resumed.
+
+    :param destination: A local directory path.
+    :param base_url: The URL of the fixtures. It should end with a slash.
+    :param paths: An iterable of paths relative to ``base_url``, such as
+        ``('rpm-signed/', 'file/')``. If given, only those are mirrored.
+    :param refresh: Whether to download files that already exist locally.
+    :param max_workers: The maximum number of files to download at the same
+        time.
+    :returns: A list of the paths of the files downloaded.
+    """
+    with requests.Session() as session:
+        # Keep a connection open for each worker, not just the default ten.
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=max_workers,
+            pool_maxsize=max_workers,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for url in crawl(base_url, paths, session):
+                path = _get_local_path(destination, base_url, url)
+                futures[path] = executor.submit(
+                    _download, session, url, path, refresh)
+    return sorted(path for path, future in futures.items() if future.result())
+
+
+class _FixturesRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from the directory named by ``self.server.directory``."""
+
+    def translate_path(self, path):
+        """Translate a URL path into a path below the served directory."""
+        path = os.path.relpath(super().translate_path(path), os.getcwd())
+        return os.path.join(self.server.directory, path)
+
+    def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+        """Only log requests if the server is verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FixturesServer(socketserver.ThreadingMixIn, HTTPServer):
+    """An HTTP server that serves a directory of fixtures.
+
+    Each request is handled in its own thread, so that Pulp may download many
+    files at once.
+
+    :param directory: The directory to serve.
+    :param host: The address to listen on. Listen on every interface by
+        default, as the Pulp system must be able to reach this server.
+    :param port: The port to listen on. If 0, pick a free port.
+    :param verbose: Whether to log each request to stderr.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, directory, host='0.0.0.0', port=8000, verbose=False):
+        """Initialize a new object."""
+        self.directory = os.path.abspath(directory)
+        self.verbose = verbose
+        super().__init__((host, port), _FixturesRequestHandler)
+
+    @property
+    def base_url(self):
+        """Return a URL at which other hosts can reach this server.
+
+        Use it as the value of ``PULP_SMASH_FIXTURES_BASE_URL``.
+        """
+        host, port = self.server_address[:2]
+        if host in ('0.0.0.0', '::'):
+            host = self.server_name
+        return 'http://{}:{}/'.format(host, port)
+
+
+def serve(directory, host='0.0.0.0', port=8000, verbose=True):
+    """Serve ``directory`` over HTTP until interrupted.
+
+    See :class:`FixturesServer`.
+    """
+    server = FixturesServer(directory, host, port, verbose)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -3,9 +3,13 @@
 import json
 
 import click
+import requests
 
-from pulp_smash import config, exceptions
+from pulp_smash import config, exceptions, selectors
 from pulp_smash.config import PulpSmashConfig
+from pulp_smash.constants import PULP_FIXTURES_BASE_URL
+from pulp_smash.fake_pulp import FakePulpServer
+from pulp_smash.fixtures import FixturesServer, mirror
 
 
 def _raise_settings_not_found():
@@ -150,9 +154,13 @@ def settings_show(ctx):
 
 
 @settings.command('validate')
+@click.argument('paths', nargs=-1, type=click.Path(dir_okay=False))
 @click.pass_context
-def settings_validate(ctx):
-    """Validate the settings file."""
+def settings_validate(ctx, paths):
+    """Validate the settings file, or the settings files at PATHS."""
+    if paths:
+        _validate_settings_files(paths)
+        return
     path = ctx.obj['cfg_path']
     if not path:
         _raise_settings_not_found()
@@ -183,5 +191,198 @@ def settings_validate(ctx):
         raise result
 
 
+def _validate_settings_files(paths):
+    """Validate each of the settings files at ``paths``, and report results.
+
+    Print one line per file. Raise ``click.ClickException`` if any file is
+    invalid.
+    """
+    results = config.validate_configs(paths)
+    invalid = 0
+    for path in paths:
+        error_messages = results[path]
+        if not error_messages:
+            click.echo('{}: valid'.format(path))
+            continue
+        invalid += 1
+        click.echo('{}: invalid'.format(path))
+        for error_message in error_messages:
+            click.echo('  ' + error_message)
+    if invalid:
+        result = click.ClickException(
+            '{} of {} settings files are invalid'.format(invalid, len(paths))
+        )
+        result.exit_code = -1
+        raise result
+
+
+@pulp_smash.group()
+def bugs():
+    """Manage the bug cache."""
+
+
+@bugs.command('refresh')
+@click.argument('bug_ids', nargs=-1, type=int)
+def bugs_refresh(bug_ids):
+    """Fetch bugs from the bug tracker, and cache them.
+
+    Refresh the bugs with the given BUG_IDS, or every cached bug.
+    """
+    try:
+        refreshed = selectors.refresh_bug_cache(bug_ids or None)
+    except requests.exceptions.RequestException as err:
+        result = click.ClickException(
+            'unable to refresh the bug cache: {}'.format(err)
+        )
+        result.exit_code = -1
+        raise result
+    for bug_id, bug in sorted(refreshed.items()):
+        click.echo('{}: {}'.format(bug_id, bug.status))
+
+
+@pulp_smash.group()
+def fixtures():
+    """Mirror and serve Pulp Fixtures locally."""
+
+
+@fixtures.command('mirror')
+@click.argument('destination', type=click.Path(file_okay=False))
+@click.option(
+    '--base-url',
+    default=PULP_FIXTURES_BASE_URL,
+    show_default=True,
+    help='The URL of the fixtures to mirror.',
+)
+@click.option(
+    '--path',
+    'paths',
+    multiple=True,
+    help='A path relative to the base URL, such as "rpm-signed/". Only '
+    'mirror these paths. May be given many times.',
+)
+@click.option(
+    '--refresh',
+    is_flag=True,
+    help='Download files even if they have already been mirrored.',
+)
+def fixtures_mirror(destination, base_url, paths, refresh):
+    """Download the fixtures into DESTINATION."""
+    try:
+        downloaded = mirror(destination, base_url, paths or None, refresh)
+    except requests.exceptions.RequestException as err:
+        result = click.ClickException(
+            'unable to mirror the fixtures: {}'.format(err)
+        )
+        result.exit_code = -1
+        raise result
+    click.echo('Downloaded {} files into {}.'.format(
+        len(downloaded), destination))
+
+
+@fixtures.command('serve')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option(
+    '--host',
+    default='0.0.0.0',
+    show_default=True,
+    help='The address to listen on.',
+)
+@click.option(
+    '--port',
+    default=8000,
+    show_default=True,
+    type=int,
+    help='The port to listen on.',
+)
+def fixtures_serve(directory, host, port):
+    """Serve the fixtures in DIRECTORY over HTTP."""
+    server = FixturesServer(directory, host, port, verbose=True)
+    click.echo(
+        'Serving {} at {}. Point Pulp Smash at it with:\n\n'
+        '  export PULP_SMASH_FIXTURES_BASE_URL={}\n'
+        .format(directory, server.base_url, server.base_url)
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@pulp_smash.command('fake-pulp')
+@click.option(
+    '--host',
+    default='127.0.0.1',
+    show_default=True,
+    help='The address to listen on.',
+)
+@click.option(
+    '--port',
+    default=8000,
+    show_default=True,
+    type=int,
+    help='The port to listen on.',
+)
+@click.option(
+    '--task-latency',
+    default=0.0,
+    show_default=True,
+    type=float,
+    help='How long tasks take to finish, in seconds.',
+)
+@click.option(
+    '--task-failure-rate',
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help='The share of tasks which fail.',
+)
+@click.option(
+    '--request-failure-rate',
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help='The share of requests which get an HTTP 500 response.',
+)
+@click.option(
+    '--seed',
+    type=int,
+    help='A seed for choosing which tasks and requests fail.',
+)
+@click.option(
+    '--task-retention',
+    default=600.0,
+    show_default=True,
+    type=float,
+    help='How long finished tasks are kept, in seconds.',
+)
+def fake_pulp(  # pylint:disable=too-many-arguments
+        host, port, task_latency, task_failure_rate, request_failure_rate,
+        seed, task_retention):
+    """Run a fake Pulp 2 server, which keeps its state in memory."""
+    server = FakePulpServer(
+        host,
+        port,
+        task_latency,
+        task_failure_rate,
+        request_failure_rate,
+        seed,
+        task_retention,
+        verbose=True,
+    )
+    click.echo(
+        'Serving a fake Pulp at {}. Point Pulp Smash at it with a system '
+        'whose hostname is "{}", and whose api role has the "http" scheme.'
+        .format(server.base_url, server.hostname)
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 if __name__ == '__main__':
     pulp_smash()  # pragma: no cover
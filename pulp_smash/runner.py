@@ -0,0 +1,839 @@
+# coding=utf-8
+"""Run Pulp Smash's functional tests in several processes at once.
+
+Most of Pulp Smash's test modules create their own repositories, users and so
+on, and they can safely run at the same time as each other. This module runs
+test modules in a pool of worker processes:
+
+>>> from pulp_smash import runner
+>>> results = runner.run(processes=4)
+
+A test module is never split between processes, so its ``setUpModule`` and
+``setUpClass`` fixtures run exactly once, in the process that runs its tests.
+
+Some test modules change the state of the whole Pulp deployment. For example,
+they call :func:`pulp_smash.utils.reset_pulp`, restart services, disable
+SELinux, or purge orphaned content units, which other modules may have just
+synced or uploaded. Such modules must not run at the same time as any other
+module. They are serialized through *resource locks*. A module holds a lock
+while it runs, and two modules holding the same lock never run at the same
+time. A module holding :data:`EXCLUSIVE_LOCK` never runs at the same time as
+any other module.
+
+A module may declare the locks it needs with a module-level
+``RESOURCE_LOCKS`` variable, whose value is a literal tuple or set of
+strings::
+
+    RESOURCE_LOCKS = ('squid',)
+
+Modules that use one of :data:`GLOBAL_STATE_MARKERS` are given
+:data:`EXCLUSIVE_LOCK`, whether or not they declare it. So are modules that
+import a function or class from another Pulp Smash module, such as
+``pulp_smash.tests.rpm.api_v2.utils``, whose definition uses one. Imports are
+followed only one level deep. See :func:`get_resource_locks`.
+
+Orphans left behind by deleted resources are purged just before a module
+holding :data:`EXCLUSIVE_LOCK` starts, and when the run ends. See
+:class:`pulp_smash.utils.TeardownCollector`.
+
+The results of every module are merged into one report.
+
+Given several settings files, each describing an identical Pulp deployment,
+test modules are shared out among the deployments:
+
+>>> runner.run(settings_files=['settings1.json', 'settings2.json'])
+
+The duration of each module and test class is recorded in a timing history,
+in the ``pulp_smash`` directory of the XDG cache home. Later runs start the
+longest modules first, so that a long module doesn't start last and keep one
+process busy after the others have finished. Before running, the run is
+simulated with the recorded durations, and the predicted and actual critical
+paths are reported. See :func:`simulate`.
+"""
+import ast
+import fnmatch
+import functools
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+import traceback
+import unittest
+import warnings
+
+from xdg import BaseDirectory
+
+from pulp_smash import cli, config, utils
+
+EXCLUSIVE_LOCK = 'pulp'
+"""The lock held by test modules that change the whole Pulp deployment.
+
+A module holding this lock never runs at the same time as any other module.
+"""
+
+GLOBAL_STATE_MARKERS = frozenset((
+    'GlobalServiceManager',
+    'ORPHANS_PATH',
+    'PULP_CONCURRENCY',
+    'ServiceManager',
+    'purge_orphans',
+    'reset_pulp',
+    'reset_squid',
+    'setenforce',
+))
+"""Names and strings that indicate that a test module changes global state.
+
+A module whose source contains one of these, as a name, an attribute or
+within a string, is given :data:`EXCLUSIVE_LOCK`.
+"""
+
+# Python 3.8 replaced ast.Str with ast.Constant.
+if sys.version_info < (3, 8):
+    _STR_NODES = (ast.Str,)  # pragma: no cover
+else:
+    _STR_NODES = (ast.Constant,)
+
+_REPORT_SEPARATOR_1 = '=' * 70
+_REPORT_SEPARATOR_2 = '-' * 70
+
+
+def find_test_modules(package='pulp_smash.tests', pattern='test*.py'):
+    """Find the test modules within a package, without importing them.
+
+    :param package: The name of the package to search.
+    :param pattern: A pattern matching the file names of test modules, like
+        the one accepted by :meth:`unittest.TestLoader.discover`.
+    :returns: A sorted list of module names, such as
+        ``['pulp_smash.tests.docker.api_v2.test_crud', …]``.
+    """
+    modules = []
+    spec = importlib.util.find_spec(package)
+    for directory in spec.submodule_search_locations:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            # Only descend into packages, like unittest's discovery does.
+            dirnames[:] = sorted(
+                dirname for dirname in dirnames if os.path.isfile(
+                    os.path.join(dirpath, dirname, '__init__.py'))
+            )
+            prefix = os.path.relpath(dirpath, directory).split(os.sep)
+            prefix = [package] + [part for part in prefix if part != '.']
+            for filename in fnmatch.filter(filenames, pattern):
+                name, extension = os.path.splitext(filename)
+                if extension == '.py':
+                    modules.append('.'.join(prefix + [name]))
+    return sorted(modules)
+
+
+def _get_resource_locks_from_source(source):
+    """Return the resource locks needed by the module with source ``source``.
+
+    See :func:`get_resource_locks`.
+    """
+    locks = set()
+    tree = ast.parse(source)
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        names = {getattr(target, 'id', None) for target in node.targets}
+        if 'RESOURCE_LOCKS' in names:
+            locks.update(ast.literal_eval(node.value))
+    if any(_uses_global_state(node) for node in
+           [tree] + list(_get_imported_definitions(tree))):
+        locks.add(EXCLUSIVE_LOCK)
+    return frozenset(locks)
+
+
+def _uses_global_state(tree):
+    """Tell whether ``tree`` uses one of :data:`GLOBAL_STATE_MARKERS`.
+
+    :param tree: An AST node, such as a module or a function definition.
+    """
+    # Docstrings may mention markers without using them.
+    docstrings = {
+        id(node.value) for node in ast.walk(tree)
+        if isinstance(node, ast.Expr) and isinstance(node.value, _STR_NODES)
+    }
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            name = node.id
+        elif isinstance(node, ast.Attribute):
+            name = node.attr
+        elif isinstance(node, (ast.alias, ast.FunctionDef)):
+            name = node.name
+        elif isinstance(node, _STR_NODES) and id(node) not in docstrings:
+            name = getattr(node, 'value', getattr(node, 's', None))
+        else:
+            continue
+        if not isinstance(name, str):
+            continue  # A constant such as a number.
+        if any(marker in name for marker in GLOBAL_STATE_MARKERS):
+            return True
+    return False
+
+
+def _get_imported_definitions(tree):
+    """Yield the definitions of names ``tree`` imports from Pulp Smash.
+
+    Only names imported with ``from pulp_smash… import name`` are followed, and
+    only if ``name`` is a function or class defined in that module.
+
+    :param tree: An AST node, such as a module.
+    :returns: An iterator of ``ast.FunctionDef`` and ``ast.ClassDef`` nodes.
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom) or node.level:
+            continue
+        if not (node.module + '.').startswith('pulp_smash.'):
+            continue
+        definitions = _get_definitions(node.module)
+        for alias in node.names:
+            if alias.name in definitions:
+                yield definitions[alias.name]
+
+
+@functools.lru_cache()
+def _get_definitions(module):
+    """Return the top-level functions and classes defined by ``module``.
+
+    The module's source is parsed, not imported.
+
+    :param module: The name of a module, such as
+        ``'pulp_smash.tests.rpm.api_v2.utils'``.
+    :returns: A dict mapping names to ``ast.FunctionDef`` and ``ast.ClassDef``
+        nodes. Empty if the module's source can't be found.
+    """
+    try:
+        spec = importlib.util.find_spec(module)
+    except ImportError:
+        return {}
+    if spec is None or not (spec.origin or '').endswith('.py'):
+        return {}
+    with open(spec.origin) as handle:
+        tree = ast.parse(handle.read())
+    return {
+        node.name: node for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef))
+    }
+
+
+def get_resource_locks(module):
+    """Return the resource locks needed by a test module.
+
+    The module's source is parsed, not imported. Its locks are the union of
+    the locks listed by its ``RESOURCE_LOCKS`` variable, and of
+    :data:`EXCLUSIVE_LOCK` if it uses one of :data:`GLOBAL_STATE_MARKERS`.
+    Functions and classes imported from other Pulp Smash modules are scanned
+    for markers too, but the modules they import are not: a helper that uses
+    global state through another helper isn't detected. Modules using such a
+    helper should declare ``RESOURCE_LOCKS``.
+
+    :param module: The name of a module, such as
+        ``'pulp_smash.tests.rpm.api_v2.test_broker'``.
+    :returns: A frozenset of lock names.
+    """
+    with open(importlib.util.find_spec(module).origin) as handle:
+        return _get_resource_locks_from_source(handle.read())
+
+
+def _can_start(locks, running):
+    """Tell whether a module holding ``locks`` may start.
+
+    :param locks: The locks needed by the module.
+    :param running: An iterable of the locks held by each running module.
+    """
+    running = tuple(running)
+    if not running:
+        return True
+    held = frozenset().union(*running)
+    if EXCLUSIVE_LOCK in locks or EXCLUSIVE_LOCK in held:
+        return False
+    return not locks & held
+
+
+def _next_job(pending, running):
+    """Return the index of the first pending job that may start, or None.
+
+    :param pending: A list of ``(module, locks)`` tuples.
+    :param running: An iterable of the locks held by each running module.
+    """
+    running = tuple(running)
+    for i, (_, locks) in enumerate(pending):
+        if _can_start(locks, running):
+            return i
+    return None
+
+
+class ModuleResult(object):
+    """The results of running the tests in one module.
+
+    Unlike :class:`unittest.TestResult`, this object holds test IDs instead of
+    test cases, so that it may be passed from one process to another.
+
+    :param module: The name of the test module.
+    """
+
+    def __init__(self, module):
+        """Initialize a new object."""
+        self.module = module
+        self.tests_run = 0
+        self.duration = 0
+        self.errors = []
+        """A list of ``(test_id, formatted_traceback)`` tuples."""
+        self.failures = []
+        """A list of ``(test_id, formatted_traceback)`` tuples."""
+        self.skipped = []
+        """A list of ``(test_id, reason)`` tuples."""
+        self.expected_failures = []
+        """A list of ``(test_id, formatted_traceback)`` tuples."""
+        self.unexpected_successes = []
+        """A list of test IDs."""
+        self.class_durations = {}
+        """A dict mapping test class IDs to the seconds their tests took.
+
+        The time taken by class and module fixtures is included.
+        """
+        self.worker = None
+        """The index of the worker process that ran the module."""
+        self.settings_file = None
+        """The settings file of the deployment the module ran against."""
+        self.finished = None
+        """When the module finished, in seconds since the run started."""
+
+    def was_successful(self):
+        """Tell whether every test in the module passed."""
+        return not (self.errors or self.failures or self.unexpected_successes)
+
+    def describe(self):
+        """Return a short description of the results, like ``ok``."""
+        details = ', '.join(
+            '{}={}'.format(name, len(values)) for name, values in (
+                ('failures', self.failures),
+                ('errors', self.errors),
+                ('unexpected successes', self.unexpected_successes),
+            ) if values
+        )
+        return 'ok' if not details else 'FAILED ({})'.format(details)
+
+
+class _TimingResult(unittest.TestResult):
+    """A test result that records how long each test class takes.
+
+    The time between the end of one test and the end of the next is charged
+    to the class of the latter, so that ``setUpClass`` and ``setUpModule``
+    are charged to the first class that needs them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize a new object."""
+        super().__init__(*args, **kwargs)
+        self.class_durations = {}
+        self._last_stop = time.monotonic()
+
+    def stopTest(self, test):
+        """Charge the time since the last test stopped to this test's class."""
+        super().stopTest(test)
+        now = time.monotonic()
+        class_id = test.id().rpartition('.')[0]
+        self.class_durations[class_id] = (
+            self.class_durations.get(class_id, 0) + now - self._last_stop
+        )
+        self._last_stop = now
+
+
+def _run_module(module):
+    """Run the tests in ``module``, and return a :class:`ModuleResult`."""
+    result = ModuleResult(module)
+    test_result = _TimingResult()
+    start = time.monotonic()
+    try:
+        suite = unittest.defaultTestLoader.loadTestsFromName(module)
+        test_result.startTestRun()
+        suite(test_result)
+        test_result.stopTestRun()
+    except Exception:  # pylint:disable=broad-except
+        result.errors.append((module, traceback.format_exc()))
+    result.duration = time.monotonic() - start
+    result.class_durations = test_result.class_durations
+    result.tests_run = test_result.testsRun
+    result.errors.extend(
+        (test.id(), err) for test, err in test_result.errors)
+    result.failures.extend(
+        (test.id(), err) for test, err in test_result.failures)
+    result.skipped.extend(
+        (test.id(), reason) for test, reason in test_result.skipped)
+    result.expected_failures.extend(
+        (test.id(), err) for test, err in test_result.expectedFailures)
+    result.unexpected_successes.extend(
+        test.id() for test in test_result.unexpectedSuccesses)
+    return result
+
+
+def _work(index, settings_file, tasks, results):
+    """Run the ``(module, locks)`` jobs from ``tasks``, until ``None``.
+
+    Put a tuple of ``(index, result)`` in ``results`` for each module. If
+    ``settings_file`` isn't ``None``, target the Pulp deployment it describes.
+    """
+    if settings_file is not None:
+        os.environ['PULP_SMASH_CONFIG_FILE'] = settings_file
+        # A forked process inherits the parent's cached configuration.
+        config._CONFIG = None  # pylint:disable=protected-access
+    # Other modules may be running against the same deployment, and an orphan
+    # purge would remove the units they have just synced or uploaded.
+    collector = utils.get_teardown_collector()
+    collector.flush_per_module = False
+    try:
+        while True:
+            job = tasks.get()
+            if job is None:
+                return
+            module, locks = job
+            if EXCLUSIVE_LOCK in locks:
+                collector.flush()
+            results.put((index, _run_module(module)))
+            # Pooled spares may not outlive a module, as the next module to
+            # run on this deployment may reset Pulp.
+            utils.close_resource_pool()
+            collector.wait()
+    finally:
+        # Worker processes don't run atexit handlers. Workers are stopped once
+        # every module has finished, so orphans may be purged now.
+        utils.close_resource_pool()
+        utils.close_shared_repos()
+        utils.close_teardown_collector()
+        cli.close_ssh_machines()
+
+
+class _Worker(object):
+    """A worker process, and the job it is running, if any."""
+
+    def __init__(self, context, index, settings_file, results):
+        """Start a new worker process."""
+        self.index = index
+        self.job = None
+        self.settings_file = settings_file
+        self.tasks = context.SimpleQueue()
+        self.process = context.Process(
+            target=_work,
+            args=(index, settings_file, self.tasks, results),
+            daemon=True,
+        )
+        self.process.start()
+
+    def start_job(self, job):
+        """Ask the worker to run the tests in a module."""
+        self.job = job
+        self.tasks.put(job)
+
+    def stop(self):
+        """Ask the worker process to clean up and exit, without waiting."""
+        if self.process.is_alive():
+            self.tasks.put(None)
+
+    def join(self, timeout=None):
+        """Wait for the worker process to exit. Kill it after ``timeout``.
+
+        If the process is killed, a ``RuntimeWarning`` is emitted, as it may
+        have left shared repositories, spares or orphans behind.
+
+        :param timeout: How long to wait, in seconds. If ``None``, wait for
+            as long as it takes.
+        """
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+            warnings.warn(
+                'Worker {} was killed before it finished cleaning up.'
+                .format(self.index),
+                RuntimeWarning
+            )
+
+
+def _get_worker_settings_files(processes, settings_files):
+    """Return the settings file used by each worker process.
+
+    Settings files are dealt out to workers in turn, so that each deployment
+    gets the same number of workers, give or take one.
+    """
+    return [
+        settings_files[index % len(settings_files)]
+        for index in range(processes)
+    ]
+
+
+def _run_jobs(  # pylint:disable=too-many-arguments
+        jobs, processes, settings_files, report_progress, stop_timeout=None):
+    """Run each job in a pool of worker processes.
+
+    :param jobs: A list of ``(module, locks)`` tuples. Jobs are started in
+        this order, except that a job waits while its locks are held on the
+        worker's deployment, and a later job may start in the meantime.
+    :param processes: The number of worker processes.
+    :param settings_files: A list of settings files. See :func:`run`.
+    :param report_progress: A function called with each
+        :class:`ModuleResult`, as soon as it is available.
+    :param stop_timeout: See :func:`run`.
+    :returns: A list of :class:`ModuleResult`, in order of completion. Their
+        ``worker``, ``settings_file`` and ``finished`` attributes are set.
+    """
+    pending = list(jobs)
+    start = time.monotonic()
+    context = multiprocessing.get_context()
+    result_queue = context.Queue()
+    workers = [
+        _Worker(context, index, settings_file, result_queue)
+        for index, settings_file in enumerate(_get_worker_settings_files(
+            min(processes, len(pending)), settings_files))
+    ]
+    results = []
+    interrupted = True
+    try:
+        while pending or any(worker.job for worker in workers):
+            for worker in workers:
+                if worker.job:
+                    continue
+                # Locks are held per deployment.
+                deployment = worker.settings_file
+                i = _next_job(pending, (
+                    other.job[1] for other in workers
+                    if other.job and other.settings_file == deployment
+                ))
+                if i is not None:
+                    worker.start_job(pending.pop(i))
+            try:
+                index, result = result_queue.get(timeout=1)
+            except queue.Empty:
+                # If a worker dies, report its module as broken and replace
+                # the worker, instead of waiting for it forever.
+                for index, worker in enumerate(workers):
+                    if worker.job and not worker.process.is_alive():
+                        result = ModuleResult(worker.job[0])
+                        result.worker = index
+                        result.settings_file = worker.settings_file
+                        result.finished = time.monotonic() - start
+                        result.errors.append((
+                            worker.job[0],
+                            'The worker process running this module exited '
+                            'with code {}.'.format(worker.process.exitcode),
+                        ))
+                        results.append(result)
+                        report_progress(result)
+                        workers[index] = _Worker(
+                            context, index, worker.settings_file, result_queue)
+                continue
+            workers[index].job = None
+            result.worker = index
+            result.settings_file = workers[index].settings_file
+            result.finished = time.monotonic() - start
+            results.append(result)
+            report_progress(result)
+        interrupted = False
+    finally:
+        # Workers clean up before they exit, which involves waiting for Pulp.
+        # Let them all do so at once, unless the run was interrupted.
+        for worker in workers:
+            worker.stop()
+        if interrupted:
+            stop_timeout = 0
+        deadline = None
+        if stop_timeout is not None:
+            deadline = time.monotonic() + stop_timeout
+        for worker in workers:
+            worker.join(
+                None if deadline is None
+                else max(0, deadline - time.monotonic())
+            )
+    return results
+
+
+def _get_timing_history_path():
+    """Return the path to the timing history.
+
+    The file lives in the ``pulp_smash`` directory of the XDG cache home, e.g.
+    ``~/.cache/pulp_smash/durations.json``.
+    """
+    return os.path.join(
+        BaseDirectory.save_cache_path('pulp_smash'),
+        'durations.json',
+    )
+
+
+def read_timing_history():
+    """Read the timing history.
+
+    :returns: A dict with "modules" and "classes" keys. Each maps names to
+        the seconds taken when they were last run. If the history is missing
+        or can't be parsed, both dicts are empty.
+    """
+    history = {'modules': {}, 'classes': {}}
+    try:
+        with open(_get_timing_history_path()) as handle:
+            saved = json.load(handle)
+    except (OSError, ValueError):
+        return history
+    if isinstance(saved, dict):
+        for key in history:
+            if isinstance(saved.get(key), dict):
+                history[key].update(saved[key])
+    return history
+
+
+def save_timing_history(results):
+    """Record the durations of modules and test classes in the history.
+
+    The file is replaced atomically, and entries for modules that weren't
+    run are kept. Modules whose worker process died are not recorded.
+
+    :param results: An iterable of :class:`ModuleResult`.
+    :returns: Nothing.
+    """
+    history = read_timing_history()
+    for result in results:
+        if not result.duration:
+            continue
+        history['modules'][result.module] = result.duration
+        history['classes'].update(result.class_durations)
+    path = _get_timing_history_path()
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, 'w') as temp_file:
+            json.dump(history, temp_file, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
+    except OSError:
+        os.remove(temp_path)
+        raise
+
+
+def predict_durations(modules, history):
+    """Predict how long each module will take.
+
+    Modules without a recorded duration are predicted to take as long as the
+    average recorded module, or no time at all if nothing has been recorded.
+
+    :param modules: An iterable of module names.
+    :param history: A timing history, as returned by
+        :func:`read_timing_history`.
+    :returns: A dict mapping each module to a number of seconds.
+    """
+    known = history['modules']
+    default = sum(known.values()) / len(known) if known else 0
+    return {module: known.get(module, default) for module in modules}
+
+
+def simulate(jobs, processes, durations, settings_files=(None,)):
+    """Predict how a run will unfold, given how long each module takes.
+
+    Jobs are dispatched exactly as :func:`run` does: whenever a worker is
+    idle, it starts the first pending job whose locks are free. If ``jobs``
+    are sorted longest-first, this is the longest-processing-time-first
+    heuristic for packing modules into processes, whose makespan is at most
+    4/3 of the optimum when no locks are involved.
+
+    :param jobs: A list of ``(module, locks)`` tuples.
+    :param processes: The number of worker processes.
+    :param durations: A dict mapping modules to predicted seconds.
+    :param settings_files: A list of settings files. See :func:`run`.
+    :returns: A tuple of ``(makespan, critical_path)``. ``critical_path`` is
+        the list of modules run by the worker that finishes last.
+    """
+    pending = list(jobs)
+    deployments = _get_worker_settings_files(
+        min(processes, len(pending)), list(settings_files))
+    lanes = [[] for _ in deployments]
+    running = {}  # Maps worker index to (end, locks).
+    finished = {}
+    now = 0
+    while pending or running:
+        for index, lane in enumerate(lanes):
+            if index in running:
+                continue
+            i = _next_job(pending, (
+                locks for other, (_, locks) in running.items()
+                if deployments[other] == deployments[index]
+            ))
+            if i is None:
+                continue
+            module, locks = pending.pop(i)
+            lane.append(module)
+            running[index] = (now + durations.get(module, 0), locks)
+        index = min(running, key=lambda index: running[index][0])
+        now = finished[index] = running.pop(index)[0]
+    if not lanes:
+        return (0, [])
+    last = max(finished, key=lambda index: finished[index])
+    return (now, lanes[last])
+
+
+def _get_critical_path(results):
+    """Return the actual ``(makespan, critical_path)`` of a run.
+
+    See :func:`simulate`.
+    """
+    if not results:
+        return (0, [])
+    last = max(results, key=lambda result: result.finished)
+    return (last.finished, [
+        result.module for result in sorted(
+            results, key=lambda result: result.finished)
+        if result.worker == last.worker
+    ])
+
+
+def _print_critical_path(label, critical_path, stream):
+    """Print a line like ``Predicted critical path: 2.0s (mod_a, mod_b)``."""
+    makespan, modules = critical_path
+    stream.write('{} critical path: {:.1f}s ({})\n'.format(
+        label, makespan, ', '.join(modules)))
+
+
+def print_report(results, duration, stream):
+    """Print a report of the results of several test modules.
+
+    The report looks like the one printed by :class:`unittest.TextTestRunner`.
+
+    :param results: An iterable of :class:`ModuleResult`.
+    :param duration: The wall-clock time taken to run the tests, in seconds.
+    :param stream: A file-like object to which the report is written.
+    :returns: Nothing.
+    """
+    results = tuple(results)
+    for flavour, attr in (('ERROR', 'errors'), ('FAIL', 'failures')):
+        for result in results:
+            for test_id, err in getattr(result, attr):
+                stream.write('{}\n{}: {}\n{}\n{}\n'.format(
+                    _REPORT_SEPARATOR_1,
+                    flavour,
+                    test_id,
+                    _REPORT_SEPARATOR_2,
+                    err,
+                ))
+    tests_run = sum(result.tests_run for result in results)
+    stream.write('{}\nRan {} test{} in {:.3f}s\n\n'.format(
+        _REPORT_SEPARATOR_2,
+        tests_run,
+        '' if tests_run == 1 else 's',
+        duration,
+    ))
+    counts = [
+        '{}={}'.format(name, count) for name, count in (
+            ('failures', sum(len(result.failures) for result in results)),
+            ('errors', sum(len(result.errors) for result in results)),
+            ('skipped', sum(len(result.skipped) for result in results)),
+            ('expected failures', sum(
+                len(result.expected_failures) for result in results)),
+            ('unexpected successes', sum(
+                len(result.unexpected_successes) for result in results)),
+        ) if count
+    ]
+    status = (
+        'OK' if all(result.was_successful() for result in results)
+        else 'FAILED'
+    )
+    if counts:
+        status += ' ({})'.format(', '.join(counts))
+    stream.write(status + '\n')
+    stream.flush()
+
+
+def get_settings_files():
+    """Return the settings files named by ``PULP_SMASH_CONFIG_FILE``.
+
+    For the benefit of :func:`run`, the variable may name several settings
+    files, separated by :data:`os.pathsep`, like
+    ``settings1.json:settings2.json``.
+
+    :returns: A list of settings file names. If the variable isn't set, a list
+        holding ``None``, which stands for the default settings file.
+    """
+    value = os.environ.get('PULP_SMASH_CONFIG_FILE')
+    if not value:
+        return [None]
+    return value.split(os.pathsep)
+
+
+def run(  # pylint:disable=too-many-arguments
+        modules=None, processes=None, stream=None, verbosity=1,
+        history=True, settings_files=None, stop_timeout=None):
+    """Run test modules in several processes, and print a merged report.
+
+    Tests may target several identical Pulp deployments at once, each
+    described by a settings file. Each worker process targets one deployment,
+    by setting ``PULP_SMASH_CONFIG_FILE``. Resource locks are held per
+    deployment, so a module that resets one deployment doesn't hold up work on
+    the others.
+
+    :param modules: An iterable of test module names. By default, every test
+        module found by :func:`find_test_modules`.
+    :param processes: The number of worker processes. By default, one per
+        settings file if there are several, or else the number of CPUs.
+    :param stream: A file-like object to which progress and the report are
+        written. By default, ``sys.stderr``.
+    :param verbosity: If 0, only print the report. If 1 or more, also print a
+        line as each module finishes.
+    :param history: Whether to use and update the timing history. If true,
+        modules are started longest-first, and the predicted and actual
+        critical paths are reported. Otherwise, modules are started in the
+        given order.
+    :param settings_files: A list of settings file names or paths, like those
+        accepted by ``PULP_SMASH_CONFIG_FILE``. Workers are dealt out to them
+        in turn. By default, those returned by :func:`get_settings_files`.
+    :param stop_timeout: How long to wait, in seconds, for the workers to
+        clean up once every module has finished. They delete shared
+        repositories and purge orphans. Workers that take longer are killed.
+        By default, wait for as long as it takes. If the run is interrupted,
+        workers are killed at once.
+    :returns: A list of :class:`ModuleResult`, in order of completion.
+    """
+    if modules is None:
+        modules = find_test_modules()
+    if settings_files is None:
+        settings_files = get_settings_files()
+    settings_files = list(settings_files)
+    if processes is None:
+        if len(settings_files) > 1:
+            processes = len(settings_files)
+        else:
+            processes = os.cpu_count() or 1
+    if stream is None:
+        stream = sys.stderr
+
+    def report_progress(result):
+        """Print a line about a module that has finished."""
+        if verbosity:
+            stream.write('{} ... {} ({:.1f}s{})\n'.format(
+                result.module,
+                result.describe(),
+                result.duration,
+                '' if len(settings_files) == 1
+                else ', ' + result.settings_file,
+            ))
+            stream.flush()
+
+    jobs = [(module, get_resource_locks(module)) for module in modules]
+    if history:
+        durations = predict_durations(
+            (module for module, _ in jobs), read_timing_history())
+        # The sort is stable, so modules of equal duration keep their order.
+        jobs.sort(key=lambda job: durations[job[0]], reverse=True)
+        predicted = simulate(jobs, processes, durations, settings_files)
+    start = time.monotonic()
+    results = _run_jobs(
+        jobs, processes, settings_files, report_progress, stop_timeout)
+    duration = time.monotonic() - start
+    if history:
+        try:
+            save_timing_history(results)
+        except OSError as err:
+            warnings.warn(
+                'Cannot save the timing history. Error: {}'.format(err),
+                RuntimeWarning
+            )
+        _print_critical_path('Predicted', predicted, stream)
+        _print_critical_path('Actual', _get_critical_path(results), stream)
+    print_report(results, duration, stream)
+    return results
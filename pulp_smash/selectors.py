@@ -1,11 +1,21 @@
 # coding=utf-8
 """Tools for selecting and deselecting tests."""
+import ast
+import importlib.util
+import json
+import os
+import re
+import tempfile
+import threading
+import time
 import warnings
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
 import requests
 from packaging.version import Version
+from xdg import BaseDirectory
 
 from pulp_smash import exceptions
 
@@ -40,6 +50,33 @@ _TESTABLE_BUGS = frozenset((
 #
 _BUG_STATUS_CACHE = {}
 
+# A mapping between bug IDs and the times at which they were fetched from the
+# bug tracker, in seconds since the epoch. Used to expire `_BUG_STATUS_CACHE`
+# entries.
+_BUG_FETCH_TIMES = {}
+
+# Whether `_BUG_STATUS_CACHE` has been populated from the on-disk bug cache.
+_BUG_CACHE_LOADED = False
+
+# Guards the above, and the on-disk bug cache.
+_BUG_CACHE_LOCK = threading.RLock()
+
+# Matches the names of helpers like `check_issue_2277`, as found in
+# `pulp_smash.tests.rpm.utils`, and captures the bug ID.
+_CHECK_ISSUE_RE = re.compile(r'^check_issue_(\d+)$')
+
+BUG_CACHE_TTL = 24 * 60 * 60
+"""The number of seconds for which a cached bug status is trusted.
+
+Can be overridden with the ``PULP_SMASH_BUG_CACHE_TTL`` environment variable.
+"""
+
+BUG_FETCH_TIMEOUT = 10
+"""The number of seconds to wait for the bug tracker to respond.
+
+If it takes longer, a stale cached bug status is used, if there is one.
+"""
+
 
 # Information about a Pulp bug. (See: https://pulp.plan.io)
 #
@@ -93,10 +130,288 @@ def _convert_tpr(version_string):
     return Version(version_string)
 
 
+def _get_bug_cache_path():
+    """Return the path to the on-disk bug cache.
+
+    The file lives in the ``pulp_smash`` directory of the XDG cache home, e.g.
+    ``~/.cache/pulp_smash/bugs.json``.
+    """
+    return os.path.join(
+        BaseDirectory.save_cache_path('pulp_smash'),
+        'bugs.json',
+    )
+
+
+def _get_bug_cache_ttl():
+    """Return the number of seconds for which a cached bug is trusted."""
+    return float(os.environ.get('PULP_SMASH_BUG_CACHE_TTL', BUG_CACHE_TTL))
+
+
+def _is_offline():
+    """Tell whether the bug tracker should be left alone.
+
+    Offline mode is turned on by setting the ``PULP_SMASH_OFFLINE`` environment
+    variable to "1", "true" or "yes". In this mode, cached bugs are used no
+    matter their age.
+    """
+    return os.environ.get('PULP_SMASH_OFFLINE', '').lower() in {
+        '1', 'true', 'yes'
+    }
+
+
+def _read_bug_cache():
+    """Read the on-disk bug cache.
+
+    Return a dict mapping bug IDs to ``(_Bug, fetch_time)`` tuples. Return an
+    empty dict if the cache is missing or can't be parsed.
+    """
+    try:
+        with open(_get_bug_cache_path()) as handle:
+            cache_json = json.load(handle)
+        return {
+            int(bug_id): (
+                _Bug(
+                    entry['status'],
+                    Version(entry['target_platform_release']),
+                ),
+                entry['fetched'],
+            )
+            for bug_id, entry in cache_json.items()
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _load_bug_cache():
+    """Populate the in-memory bug cache from disk, once per process."""
+    global _BUG_CACHE_LOADED  # pylint:disable=global-statement
+    with _BUG_CACHE_LOCK:
+        if _BUG_CACHE_LOADED:
+            return
+        for bug_id, (bug, fetched) in _read_bug_cache().items():
+            if _BUG_FETCH_TIMES.get(bug_id, float('-inf')) < fetched:
+                _BUG_STATUS_CACHE[bug_id] = bug
+                _BUG_FETCH_TIMES[bug_id] = fetched
+        _BUG_CACHE_LOADED = True
+
+
+def _save_bug_cache():
+    """Write the in-memory bug cache to disk.
+
+    Entries written by other processes in the meantime are kept, unless this
+    process has fresher ones. The file is replaced atomically.
+    """
+    with _BUG_CACHE_LOCK:
+        entries = _read_bug_cache()
+        for bug_id, bug in _BUG_STATUS_CACHE.items():
+            fetched = _BUG_FETCH_TIMES.get(bug_id)
+            if fetched is None:
+                continue
+            if entries.get(bug_id, (None, float('-inf')))[1] < fetched:
+                entries[bug_id] = (bug, fetched)
+        cache_json = {
+            str(bug_id): {
+                'status': bug.status,
+                'target_platform_release': str(bug.target_platform_release),
+                'fetched': fetched,
+            }
+            for bug_id, (bug, fetched) in entries.items()
+        }
+        path = _get_bug_cache_path()
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, 'w') as temp_file:
+                json.dump(cache_json, temp_file, indent=2, sort_keys=True)
+            os.replace(temp_path, path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+
+
+def _fetch_bug(bug_id):
+    """Fetch bug ``bug_id`` from https://pulp.plan.io, and cache it."""
+    response = requests.get(
+        'https://pulp.plan.io/issues/{}.json'.format(bug_id),
+        timeout=BUG_FETCH_TIMEOUT,
+    )
+    response.raise_for_status()
+    bug_json = response.json()
+    bug = _Bug(
+        bug_json['issue']['status']['name'],
+        _convert_tpr(_get_tpr(bug_json)),
+    )
+    with _BUG_CACHE_LOCK:
+        _BUG_STATUS_CACHE[bug_id] = bug
+        _BUG_FETCH_TIMES[bug_id] = time.time()
+    return bug
+
+
+def _is_fresh(bug_id):
+    """Tell whether bug ``bug_id`` is cached and hasn't expired."""
+    with _BUG_CACHE_LOCK:
+        if bug_id not in _BUG_STATUS_CACHE:
+            return False
+        fetched = _BUG_FETCH_TIMES.get(bug_id, float('inf'))
+    return time.time() - fetched < _get_bug_cache_ttl()
+
+
+def _fetch_bugs(bug_ids, max_workers):
+    """Concurrently fetch bugs from https://pulp.plan.io, and cache them.
+
+    The on-disk bug cache is not updated.
+
+    :returns: A ``(bugs, errors)`` tuple. Both items are dicts, mapping bug IDs
+        to ``_Bug`` instances and exceptions, respectively.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            bug_id: executor.submit(_fetch_bug, bug_id) for bug_id in bug_ids
+        }
+    bugs = {}
+    errors = {}
+    for bug_id, future in futures.items():
+        try:
+            bugs[bug_id] = future.result()
+        except (requests.exceptions.RequestException,
+                exceptions.BugTPRMissingError,
+                ValueError,
+                KeyError) as err:
+            errors[bug_id] = err
+    return bugs, errors
+
+
+def refresh_bug_cache(bug_ids=None, max_workers=8):
+    """Fetch bugs from https://pulp.plan.io, and save them to the bug cache.
+
+    Bugs are fetched concurrently, even if their cached copies haven't
+    expired.
+
+    :param bug_ids: An iterable of integer bug IDs. Defaults to the bugs that
+        are already cached, plus the bugs referenced by Pulp Smash's tests.
+        (See :func:`find_bug_ids`.)
+    :param max_workers: The maximum number of bugs to fetch at the same time.
+    :returns: A dict mapping bug IDs to ``_Bug`` instances.
+    :raises: ``requests.exceptions.RequestException`` if a bug can't be
+        fetched. The other bugs are saved anyway.
+    """
+    _load_bug_cache()
+    if bug_ids is None:
+        with _BUG_CACHE_LOCK:
+            bug_ids = set(_BUG_STATUS_CACHE)
+        bug_ids = sorted(bug_ids | find_bug_ids())
+    bugs, errors = _fetch_bugs(bug_ids, max_workers)
+    _save_bug_cache()
+    for bug_id in sorted(errors):
+        raise errors[bug_id]
+    return bugs
+
+
+def prefetch_bugs(bug_ids, max_workers=8):
+    """Make sure bugs are cached, so that tests don't wait on the bug tracker.
+
+    Bugs that are missing from the bug cache, or that have expired, are
+    fetched concurrently and saved. Nothing is fetched in offline mode. Bugs
+    that can't be fetched are reported with a single ``RuntimeWarning``, and
+    are fetched again when a test asks for them. A typical use is to call this
+    before running the test suite:
+
+    >>> from pulp_smash import selectors
+    >>> selectors.prefetch_bugs(selectors.find_bug_ids())
+
+    :param bug_ids: An iterable of integer bug IDs.
+    :param max_workers: The maximum number of bugs to fetch at the same time.
+    :returns: A dict mapping the fetched bugs' IDs to ``_Bug`` instances.
+    """
+    if _is_offline():
+        return {}
+    _load_bug_cache()
+    stale_ids = sorted(
+        bug_id for bug_id in set(bug_ids) if not _is_fresh(bug_id)
+    )
+    if not stale_ids:
+        return {}
+    bugs, errors = _fetch_bugs(stale_ids, max_workers)
+    try:
+        _save_bug_cache()
+    except OSError as err:
+        warnings.warn(
+            'Cannot save the bug cache. Error: {}'.format(err),
+            RuntimeWarning
+        )
+    if errors:
+        warnings.warn(
+            'Cannot prefetch bugs {}. Errors: {}'.format(
+                sorted(errors),
+                '; '.join(str(err) for err in errors.values()),
+            ),
+            RuntimeWarning
+        )
+    return bugs
+
+
+def _find_bug_ids_in_source(source):
+    """Return the set of bug IDs referenced by a chunk of Python source code.
+
+    See :func:`find_bug_ids`.
+    """
+    bug_ids = set()
+    for node in ast.walk(ast.parse(source)):
+        name = None
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name):
+                name = node.func.id
+            elif isinstance(node.func, ast.Attribute):
+                name = node.func.attr
+        elif isinstance(node, ast.FunctionDef):
+            name = node.name
+        if name is None:
+            continue
+        match = _CHECK_ISSUE_RE.match(name)
+        if match:
+            bug_ids.add(int(match.group(1)))
+        elif name in {'bug_is_testable', 'bug_is_untestable'}:
+            if not isinstance(node, ast.Call) or not node.args:
+                continue
+            # Python 3.8 replaced ast.Num with ast.Constant.
+            bug_id = getattr(node.args[0], 'n', None)
+            if bug_id is None:
+                bug_id = getattr(node.args[0], 'value', None)
+            if isinstance(bug_id, int) and not isinstance(bug_id, bool):
+                bug_ids.add(bug_id)
+    return bug_ids
+
+
+def find_bug_ids(package='pulp_smash.tests'):
+    """Find the bugs referenced by the modules in ``package``.
+
+    The modules are parsed, not imported. A bug is referenced by passing an
+    integer literal to :func:`bug_is_testable` or :func:`bug_is_untestable`,
+    or by the name of a helper like ``check_issue_2277``. Bug IDs computed at
+    run time can't be found.
+
+    :param package: The dotted name of a package.
+    :returns: A set of integer bug IDs.
+    """
+    spec = importlib.util.find_spec(package)
+    bug_ids = set()
+    for location in spec.submodule_search_locations or ():
+        for dirpath, _, filenames in os.walk(location):
+            for filename in filenames:
+                if not filename.endswith('.py'):
+                    continue
+                with open(os.path.join(dirpath, filename)) as handle:
+                    bug_ids.update(_find_bug_ids_in_source(handle.read()))
+    return bug_ids
+
+
 def _get_bug(bug_id):
     """Fetch information about bug ``bug_id`` from https://pulp.plan.io.
 
     Return a ``_Bug`` instance.
+
+    Bugs are cached in memory and on disk, for :data:`BUG_CACHE_TTL` seconds.
+    If the bug tracker can't be reached, or if offline mode is on (see
+    :func:`_is_offline`), an expired entry is returned instead.
     """
     # It's rarely a good idea to do type checking in a duck-typed language.
     # However, efficiency dictates we do so here. Without this type check, the
@@ -112,26 +427,41 @@ def _get_bug(bug_id):
             .format(bug_id, type(bug_id))
         )
 
-    # Let's return the bug from the cache if possible. ¶ We shouldn't need to
-    # declare a global until we want to assign to it, but waiting causes Python
-    # itself to emit a SyntaxWarning.
-    global _BUG_STATUS_CACHE  # pylint:disable=global-statement
-    try:
-        return _BUG_STATUS_CACHE[bug_id]
-    except KeyError:
-        pass
+    # Let's return the bug from the cache if possible. Bugs fetched before
+    # this process started are only trusted for a while.
+    _load_bug_cache()
+    with _BUG_CACHE_LOCK:
+        bug = _BUG_STATUS_CACHE.get(bug_id)
+        fetched = _BUG_FETCH_TIMES.get(bug_id, float('inf'))
+    if bug is not None:
+        if _is_offline() or time.time() - fetched < _get_bug_cache_ttl():
+            return bug
+    elif _is_offline():
+        raise requests.exceptions.ConnectionError(
+            'Bug {} is not cached, and offline mode is on.'.format(bug_id)
+        )
 
-    # The bug is not cached. Let's fetch, cache and return it.
-    response = requests.get(
-        'https://pulp.plan.io/issues/{}.json'.format(bug_id)
-    )
-    response.raise_for_status()
-    bug_json = response.json()
-    _BUG_STATUS_CACHE[bug_id] = _Bug(
-        bug_json['issue']['status']['name'],
-        _convert_tpr(_get_tpr(bug_json)),
-    )
-    return _BUG_STATUS_CACHE[bug_id]
+    # The bug is not cached, or is stale. Let's fetch, cache and return it.
+    try:
+        bug = _fetch_bug(bug_id)
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as err:
+        if bug is None:
+            raise
+        warnings.warn(
+            'Cannot contact the bug tracker. Pulp Smash will use a stale copy '
+            'of bug {}. Error: {}'.format(bug_id, err),
+            RuntimeWarning
+        )
+        return bug
+    try:
+        _save_bug_cache()
+    except OSError as err:
+        warnings.warn(
+            'Cannot save the bug cache. Error: {}'.format(err),
+            RuntimeWarning
+        )
+    return bug
 
 
 def bug_is_testable(bug_id, pulp_version):
@@ -147,7 +477,8 @@ def bug_is_testable(bug_id, pulp_version):
     """
     try:
         bug = _get_bug(bug_id)
-    except requests.exceptions.ConnectionError as err:
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as err:
         message = (
             'Cannot contact the bug tracker. Pulp Smash will assume that the '
             'bug referenced is testable. Error: {}'.format(err)
@@ -14,8 +14,8 @@ The second upload should silently fail for all Pulp releases in the 2.x series.
 .. _Pulp #1406: https://pulp.plan.io/issues/1406
 .. _Pulp Smash #81: https://github.com/PulpQE/pulp-smash/issues/81
 """
-from pulp_smash import api, utils
-from pulp_smash.constants import PUPPET_MODULE_URL_1, REPOSITORY_PATH
+from pulp_smash import utils
+from pulp_smash.constants import PUPPET_MODULE_URL_1
 from pulp_smash.tests.puppet.api_v2.utils import gen_repo
 from pulp_smash.tests.puppet.utils import set_up_module as setUpModule  # noqa pylint:disable=unused-import
 
@@ -31,6 +31,5 @@ class DuplicateUploadsTestCase(
         super(DuplicateUploadsTestCase, cls).setUpClass()
         unit = utils.http_get(PUPPET_MODULE_URL_1)
         import_params = {'unit_type_id': 'puppet_module'}
-        repo = api.Client(cls.cfg).post(REPOSITORY_PATH, gen_repo()).json()
+        repo = cls.take_repo(gen_repo)
         cls.upload_import_unit_args = (cls.cfg, unit, import_params, repo)
-        cls.resources.add(repo['_href'])
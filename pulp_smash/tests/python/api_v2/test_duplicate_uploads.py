@@ -18,8 +18,8 @@ import unittest
 
 from packaging.version import Version
 
-from pulp_smash import api, selectors, utils
-from pulp_smash.constants import PYTHON_EGG_URL, REPOSITORY_PATH
+from pulp_smash import selectors, utils
+from pulp_smash.constants import PYTHON_EGG_URL
 from pulp_smash.tests.python.api_v2.utils import gen_repo
 from pulp_smash.tests.python.utils import set_up_module as setUpModule  # noqa pylint:disable=unused-import
 
@@ -38,6 +38,5 @@ class DuplicateUploadsTestCase(
             raise unittest.SkipTest('https://pulp.plan.io/issues/2334')
         unit = utils.http_get(PYTHON_EGG_URL)
         import_params = {'unit_type_id': 'python_package'}
-        repo = api.Client(cls.cfg).post(REPOSITORY_PATH, gen_repo()).json()
+        repo = cls.take_repo(gen_repo)
         cls.upload_import_unit_args = (cls.cfg, unit, import_params, repo)
-        cls.resources.add(repo['_href'])
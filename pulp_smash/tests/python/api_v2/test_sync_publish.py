@@ -37,10 +37,10 @@ class BaseTestCase(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         """Delete fixtures and orphans."""
-        client = api.Client(cls.cfg)
+        collector = utils.get_teardown_collector()
         for repo in cls.repos:
-            client.delete(repo['_href'])
-        client.delete(constants.ORPHANS_PATH)
+            collector.delete(cls.cfg, repo['_href'])
+        collector.purge_orphans(cls.cfg)
 
     def test_01_first_repo(self):
         """Create, populate and publish a Python repository.
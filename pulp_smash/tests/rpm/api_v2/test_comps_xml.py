@@ -127,21 +127,15 @@ class SyncRepoTestCase(utils.BaseAPITestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Create, sync and publish a repository. Fetch its ``comps.xml``."""
-        super(SyncRepoTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg, api.json_handler)
+        """Borrow a synced and published repository. Fetch its ``comps.xml``.
 
-        # Create a repo.
+        The repository is only read, so it may be shared with other tests.
+        """
+        super(SyncRepoTestCase, cls).setUpClass()
         body = gen_repo()
         body['importer_config']['feed'] = RPM_SIGNED_FEED_URL
         body['distributors'] = [gen_distributor()]
-        repo = client.post(REPOSITORY_PATH, body)
-        cls.resources.add(repo['_href'])
-        repo = client.get(repo['_href'], params={'details': True})
-
-        # Sync and publish the repo.
-        utils.sync_repo(cls.cfg, repo)
-        utils.publish_repo(cls.cfg, repo)
+        repo = cls.borrow_repo(body, publish=True)
 
         # Fetch and parse comps.xml.
         cls.root_element = (
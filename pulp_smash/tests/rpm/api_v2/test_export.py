@@ -36,6 +36,10 @@ from pulp_smash.tests.rpm.api_v2.utils import (
 from pulp_smash.tests.rpm.utils import check_issue_2277
 from pulp_smash.tests.rpm.utils import set_up_module
 
+# DisableSELinuxMixin may disable SELinux on the Pulp system, which affects
+# every other test. See pulp_smash.runner.
+RESOURCE_LOCKS = ('pulp',)
+
 
 def setUpModule():  # pylint:disable=invalid-name
     """Possibly skip the tests in this module.
@@ -52,11 +52,12 @@ Each list element should be a tuple of ``(function, args, kwargs)``.
 
 
 def setUpModule():  # pylint:disable=invalid-name
-    """Possibly skip the tests in this module. Create and sync an RPM repo.
+    """Possibly skip the tests in this module. Borrow a synced RPM repo.
 
     Skip this module of tests if Pulp is older than version 2.9. (See `Pulp
-    #1724`_.) Then create an RPM repository with a feed and sync it. Test cases
-    may copy data from this repository but should **not** change it.
+    #1724`_.) Then borrow a synced RPM repository from
+    :class:`pulp_smash.utils.SharedRepoRegistry`. Test cases may copy data from
+    this repository but should **not** change it.
 
     .. _Pulp #1724: https://pulp.plan.io/issues/1724
     """
@@ -67,24 +68,24 @@ def setUpModule():  # pylint:disable=invalid-name
     if check_issue_2277(cfg):
         raise unittest.SkipTest('https://pulp.plan.io/issues/2277')
 
-    # Create and sync a repository.
+    # Borrow a synced repository.
     client = api.Client(cfg, api.json_handler)
     _CLEANUP.append((client.delete, [ORPHANS_PATH], {}))
     body = gen_repo()
     body['importer_config']['feed'] = RPM_SIGNED_FEED_URL
+    registry = utils.get_shared_repo_registry()
     _REPO.clear()
-    _REPO.update(client.post(REPOSITORY_PATH, body))
-    _CLEANUP.append((client.delete, [_REPO['_href']], {}))
     try:
-        utils.sync_repo(cfg, _REPO)
+        _REPO.update(registry.borrow(cfg, body))
     except (exceptions.CallReportError, exceptions.TaskReportError,
             exceptions.TaskTimedOutError):
         tearDownModule()
         raise
+    _CLEANUP.append((registry.release, [dict(_REPO)], {}))
 
 
 def tearDownModule():  # pylint:disable=invalid-name
-    """Delete the repository created by :meth:`setUpModule`."""
+    """Return the repository borrowed by :meth:`setUpModule`."""
     while _CLEANUP:
         action = _CLEANUP.pop()
         action[0](*action[1], **action[2])
@@ -48,8 +48,12 @@ class OrphansTestCase(unittest.TestCase):
 
         Create, sync and delete an RPM repository. Doing this creates orphans
         that the test methods can make use of.
+
+        First, purge the orphans left behind by earlier test classes, so that
+        they don't change the number of orphans.
         """
         cfg = config.get_config()
+        utils.purge_orphans(cfg)
         client = api.Client(cfg, api.json_handler)
         body = gen_repo()
         body['importer_config']['feed'] = RPM_SIGNED_FEED_URL
@@ -75,6 +75,9 @@ class ReuseContentTestCase(unittest.TestCase):
             self.skipTest('https://pulp.plan.io/issues/2798')
         if check_issue_2354(cfg):
             self.skipTest('https://pulp.plan.io/issues/2354')
+        # Content left behind by earlier tests would be served without the
+        # streamer.
+        utils.purge_orphans(cfg)
         repos = [
             self.create_repo(cfg, feed, 'on_demand')
             for feed in (RPM_ALT_LAYOUT_FEED_URL, RPM_UNSIGNED_FEED_URL)
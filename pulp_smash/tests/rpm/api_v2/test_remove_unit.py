@@ -10,7 +10,6 @@ from urllib.parse import urljoin
 
 from pulp_smash import api, config, utils
 from pulp_smash.constants import (
-    ORPHANS_PATH,
     REPOSITORY_PATH,
     RPM_SIGNED_FEED_URL,
 )
@@ -54,11 +53,16 @@ class RemoveMissingTestCase(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        """Delete all resources named by ``resources``."""
-        client = api.Client(cls.cfg)
+        """Delete all resources named by ``resources``, and orphans.
+
+        Wait for the orphans to be purged, so that the purge doesn't remove
+        units that later test classes are syncing or uploading.
+        """
+        collector = utils.get_teardown_collector()
         for repo in cls.repos.values():
-            client.delete(repo['_href'])
-        client.delete(ORPHANS_PATH)
+            collector.delete(cls.cfg, repo['_href'])
+        collector.purge_orphans(cls.cfg)
+        collector.flush()
 
     def test_01_create_root_repo(self):
         """Create, sync and publish a repository.
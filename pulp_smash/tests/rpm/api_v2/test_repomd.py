@@ -31,23 +31,20 @@ class RepoMDTestCase(utils.BaseAPITestCase):
 
         Do the following:
 
-        1. Create an RPM repository with a YUM distributor and publish it.
+        1. Borrow an RPM repository with a YUM distributor, published.
         2. Fetch the ``repomd.xml`` file from the distributor, and parse it.
         """
         super(RepoMDTestCase, cls).setUpClass()
         if check_issue_2277(cls.cfg):
             raise unittest.SkipTest('https://pulp.plan.io/issues/2277')
 
-        # Create a repository with a yum distributor and publish it.
-        client = api.Client(cls.cfg, api.json_handler)
+        # Borrow a published repository with a yum distributor.
         body = gen_repo()
         body['distributors'] = [gen_distributor()]
-        repo = client.post(REPOSITORY_PATH, body)
-        repo = client.get(repo['_href'], params={'details': True})
-        cls.resources.add(repo['_href'])
-        utils.publish_repo(cls.cfg, repo)
+        repo = cls.borrow_repo(body, publish=True)
 
         # Fetch and parse repomd.xml
+        client = api.Client(cls.cfg, api.json_handler)
         client.response_handler = xml_handler
         path = urljoin(
             '/pulp/repos/',
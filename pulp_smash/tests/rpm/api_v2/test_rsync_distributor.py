@@ -77,6 +77,10 @@ from pulp_smash.tests.rpm.api_v2.utils import (
 )
 from pulp_smash.tests.rpm.utils import check_issue_2844, set_up_module
 
+# DisableSELinuxMixin may disable SELinux on the Pulp system, which affects
+# every other test. See pulp_smash.runner.
+RESOURCE_LOCKS = ('pulp',)
+
 
 def _split_path(path):
     """Split a filesystem path into all of its component pieces."""
@@ -100,6 +104,11 @@ def setUpModule():  # pylint:disable=invalid-name
     cfg = config.get_config()
     if selectors.bug_is_untestable(1759, cfg.version):
         raise unittest.SkipTest('https://pulp.plan.io/issues/1759')
+    # Each test case that makes a user makes one.
+    TemporaryUserMixin.prime_users(cfg, sum(
+        1 for obj in globals().values()
+        if isinstance(obj, type) and issubclass(obj, TemporaryUserMixin)
+    ))
     set_pulp_manage_rsync(cfg, True)
 
 
@@ -20,7 +20,6 @@ from urllib.parse import urljoin
 from pulp_smash import api, utils
 from pulp_smash.constants import (
     CONTENT_UNITS_PATH,
-    REPOSITORY_PATH,
     RPM,
     RPM_SIGNED_FEED_URL,
     SRPM,
@@ -36,7 +35,10 @@ class BaseSearchTestCase(utils.BaseAPITestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Create and sync a repository."""
+        """Borrow a synced repository.
+
+        The repository is only searched, so it may be shared with other tests.
+        """
         if inspect.getmro(cls)[0] == BaseSearchTestCase:
             raise unittest.SkipTest('Abstract base class.')
         super(BaseSearchTestCase, cls).setUpClass()
@@ -44,9 +46,7 @@ class BaseSearchTestCase(utils.BaseAPITestCase):
             raise unittest.SkipTest('https://pulp.plan.io/issues/2620')
         body = gen_repo()
         body['importer_config']['feed'] = cls.get_feed_url()
-        cls.repo = api.Client(cls.cfg).post(REPOSITORY_PATH, body).json()
-        cls.resources.add(cls.repo['_href'])
-        utils.sync_repo(cls.cfg, cls.repo)
+        cls.repo = cls.borrow_repo(body)
 
     @staticmethod
     def get_feed_url():
@@ -50,6 +50,8 @@ def setUpModule():  # pylint:disable=invalid-name
     if selectors.bug_is_untestable(2242, config.get_config().version):
         raise unittest.SkipTest('https://pulp.plan.io/issues/2242')
     set_up_module()
+    # Units left behind by earlier tests would be reused, not checked.
+    utils.purge_orphans(config.get_config())
 
 
 def tearDownModule():  # pylint:disable=invalid-name
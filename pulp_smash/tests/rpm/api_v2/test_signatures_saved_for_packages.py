@@ -180,16 +180,16 @@ class SyncPackageTestCase(_BaseTestCase):
     """Test if Pulp saves signatures from synced-in packages."""
 
     def _create_sync_repo(self, feed_url):
-        """Create a repository with the given feed and sync it.
+        """Borrow a repository with the given feed, synced once.
 
-        Return the repository's href.
+        Return the repository's href. See
+        :class:`pulp_smash.utils.SharedRepoRegistry`.
         """
-        self.addCleanup(self.client.delete, ORPHANS_PATH)
         body = gen_repo()
         body['importer_config']['feed'] = feed_url
-        repo = self.client.post(REPOSITORY_PATH, body)
-        self.addCleanup(self.client.delete, repo['_href'])
-        utils.sync_repo(self.cfg, repo)
+        registry = utils.get_shared_repo_registry()
+        repo = registry.borrow(self.cfg, body)
+        self.addCleanup(registry.release, repo)
         return repo['_href']
 
     def test_signed_drpm(self):
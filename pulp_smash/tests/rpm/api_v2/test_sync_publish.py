@@ -52,16 +52,15 @@ class SyncRepoBaseTestCase(utils.BaseAPITestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Create an RPM repository with a valid feed and sync it."""
+        """Borrow an RPM repository with a valid feed, synced once."""
         if inspect.getmro(cls)[0] == SyncRepoBaseTestCase:
             raise unittest.SkipTest('Abstract base class.')
         super(SyncRepoBaseTestCase, cls).setUpClass()
-        client = api.Client(cls.cfg, api.json_handler)
         body = gen_repo()
         body['importer_config']['feed'] = cls.get_feed_url()
-        cls.repo = client.post(REPOSITORY_PATH, body)
-        cls.resources.add(cls.repo['_href'])
-        cls.report = utils.sync_repo(cls.cfg, cls.repo)
+        cls.repo = cls.borrow_repo(body)
+        cls.report = (
+            utils.get_shared_repo_registry().get_sync_report(cls.repo))
 
     @staticmethod
     def get_feed_url():
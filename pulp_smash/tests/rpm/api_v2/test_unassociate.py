@@ -18,7 +18,6 @@ from packaging.version import Version
 
 from pulp_smash import api, config, selectors, utils
 from pulp_smash.constants import (
-    ORPHANS_PATH,
     REPOSITORY_PATH,
     RPM,
     RPM_UNSIGNED_FEED_COUNT,
@@ -65,10 +64,15 @@ class RemoveUnitsTestCase(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        """Remove the created repository and any orphans."""
-        client = api.Client(cls.cfg)
-        client.delete(cls.repo['_href'])
-        client.delete(ORPHANS_PATH)
+        """Remove the created repository and any orphans.
+
+        Wait for the orphans to be purged, so that the purge doesn't remove
+        units that later test classes are syncing or uploading.
+        """
+        collector = utils.get_teardown_collector()
+        collector.delete(cls.cfg, cls.repo['_href'])
+        collector.purge_orphans(cls.cfg)
+        collector.flush()
 
     def test_01_remove_units(self):
         """Remove several types of content units from the repository.
@@ -185,10 +189,15 @@ class RepublishTestCase(utils.BaseAPITestCase):
 
     @classmethod
     def tearDownClass(cls):
-        """Remove the created repository and any orphans."""
-        client = api.Client(cls.cfg)
-        client.delete(cls.repo['_href'])
-        client.delete(ORPHANS_PATH)
+        """Remove the created repository and any orphans.
+
+        Wait for the orphans to be purged, so that the purge doesn't remove
+        units that later test classes are syncing or uploading.
+        """
+        collector = utils.get_teardown_collector()
+        collector.delete(cls.cfg, cls.repo['_href'])
+        collector.purge_orphans(cls.cfg)
+        collector.flush()
 
     def test_01_add_unit(self):
         """Add a content unit to the repository. Publish the repository."""
@@ -426,16 +426,13 @@ class PkglistsTestCase(unittest.TestCase):
         if selectors.bug_is_untestable(2227, cfg.version):
             self.skipTest('https://pulp.plan.io/issues/2277')
 
-        # Create, sync and publish a repository.
-        client = api.Client(cfg, api.json_handler)
+        # Borrow a synced and published repository.
         body = gen_repo()
         body['importer_config']['feed'] = RPM_PKGLISTS_UPDATEINFO_FEED_URL
         body['distributors'] = [gen_distributor()]
-        repo = client.post(REPOSITORY_PATH, body)
-        self.addCleanup(client.delete, repo['_href'])
-        repo = client.get(repo['_href'], params={'details': True})
-        utils.sync_repo(cfg, repo)
-        utils.publish_repo(cfg, repo)
+        registry = utils.get_shared_repo_registry()
+        repo = registry.borrow(cfg, body, publish=True)
+        self.addCleanup(registry.release, repo)
 
         # Fetch and parse ``updateinfo.xml``.
         updates_element = (
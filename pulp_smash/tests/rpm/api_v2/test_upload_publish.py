@@ -16,7 +16,6 @@ from pulp_smash import api, config, selectors, utils
 from pulp_smash.constants import (
     DRPM,
     DRPM_UNSIGNED_URL,
-    ORPHANS_PATH,
     REPOSITORY_PATH,
     RPM,
     RPM_DATA,
@@ -205,10 +204,10 @@ class UploadRpmTestCase(utils.BaseAPITestCase):
     @classmethod
     def tearDownClass(cls):
         """Clean up resources created during the test."""
-        client = api.Client(cls.cfg)
+        collector = utils.get_teardown_collector()
         for repo in cls.repos:
-            client.delete(repo['_href'])
-        client.delete(ORPHANS_PATH)
+            collector.delete(cls.cfg, repo['_href'])
+        collector.purge_orphans(cls.cfg)
 
     def test_01_upload_publish(self):
         """Upload an RPM to the first repository, and publish it.
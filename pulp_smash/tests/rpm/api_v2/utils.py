@@ -209,17 +209,57 @@ class TemporaryUserMixin(object):
         """Create a user account with a home directory and an SSH keypair.
 
         In addition, schedule the user for deletion with ``self.addCleanup``.
+        The user is taken from :func:`pulp_smash.utils.get_resource_pool`, so
+        it is deleted in the background, and it was created ahead of time if
+        the module called :meth:`prime_users`.
 
         :param pulp_smash.config.PulpSmashConfig cfg: Information about the
             host being targeted.
         :returns: A ``(username, private_key)`` tuple.
         """
-        creator = self._make_user(cfg)
+        pool = utils.get_resource_pool()
+        user = pool.take(cfg, self._create_user, self._delete_user)
+        self.addCleanup(pool.discard, cfg, self._delete_user, user)
+        return user
+
+    @staticmethod
+    def prime_users(cfg, count):
+        """Start creating users for :meth:`make_user` in the background.
+
+        Call this from ``setUpModule``, with the number of users the test
+        cases in the module will make.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            host being targeted.
+        :param count: The number of users to create.
+        """
+        utils.get_resource_pool().prime(
+            cfg,
+            TemporaryUserMixin._create_user,
+            TemporaryUserMixin._delete_user,
+            count=count,
+        )
+
+    @staticmethod
+    def _create_user(cfg):
+        """Create a user account, and return a ``(username, private_key)``.
+
+        If the keypair can't be created, delete the user.
+        """
+        creator = TemporaryUserMixin._make_user(cfg)
         username = next(creator)
-        self.addCleanup(self.delete_user, cfg, username)
-        private_key = next(creator)
+        try:
+            private_key = next(creator)
+        except BaseException:
+            TemporaryUserMixin.delete_user(cfg, username)
+            raise
         return (username, private_key)
 
+    @staticmethod
+    def _delete_user(cfg, user):
+        """Delete a user returned by :meth:`_create_user`."""
+        TemporaryUserMixin.delete_user(cfg, user[0])
+
     @staticmethod
     def _make_user(cfg):
         """Create a user account on a target system.
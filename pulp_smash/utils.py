@@ -4,16 +4,28 @@
 This module may make use of :mod:`pulp_smash.api` and :mod:`pulp_smash.cli`,
 but the reverse should not be done.
 """
+import atexit
+import contextlib
+import copy
 import hashlib
 import io
+import json
+import mmap
+import os
+import pathlib
+import tempfile
+import threading
+import time
 import unittest
-import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 
 import requests
 from packaging.version import Version
+from xdg import BaseDirectory
 
-from pulp_smash import api, cli, config, exceptions
+from pulp_smash import api, cassette, cli, config, exceptions
 from pulp_smash.cli import _is_root as is_root  # for backward compatibility
 from pulp_smash.constants import (
     CONTENT_UPLOAD_PATH,
@@ -23,13 +35,31 @@ from pulp_smash.constants import (
     REPOSITORY_PATH,
 )
 
-# A mapping between URLs and SHA 256 checksums. Used by get_sha256_checksum().
+# A mapping between URLs and dicts of checksums, such as {'sha256': '…'}. Used
+# by get_checksums().
 _CHECKSUM_CACHE = {}
 
+# Guards the on-disk checksum cache. See get_checksums().
+_CHECKSUM_CACHE_LOCK = threading.Lock()
+
+# The number of bytes read from the network at a time when hashing files.
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# The number of seconds to wait for a download to connect, or for its next
+# chunk to arrive, if the caller doesn't pass a timeout.
+_DOWNLOAD_TIMEOUT = 60
+
+# The prefix of the IDs of repositories created by SharedRepoRegistry.
+_SHARED_REPO_ID_PREFIX = 'pulp-smash-shared-'
+
 
 def uuid4():
-    """Return a random UUID, as a unicode string."""
-    return type('')(uuid.uuid4())
+    """Return a random UUID, as a unicode string.
+
+    If a cassette is in use, UUIDs are reproducible. See
+    :func:`pulp_smash.cassette.uuid4`.
+    """
+    return type('')(cassette.uuid4())
 
 
 # See design discussion at: https://github.com/PulpQE/pulp-smash/issues/31
@@ -72,11 +102,181 @@ def http_get(url, **kwargs):
     :param kwargs: additional kwargs to be passed to ``requests.get``.
     :returns: the response content of a GET request to ``url``.
     """
-    response = requests.get(url, **kwargs)
+    with cassette.mount(requests.Session()) as session:
+        response = session.get(url, **kwargs)
     response.raise_for_status()
     return response.content
 
 
+class DownloadResult(object):
+    """The result of a call to :func:`http_download`.
+
+    The following attributes are available:
+
+    ``url``
+        The URL that was downloaded.
+    ``status_code``
+        The HTTP status code of the response.
+    ``headers``
+        The HTTP headers of the response.
+    ``size``
+        The number of bytes downloaded.
+    ``checksums``
+        A dict mapping algorithm names, such as "sha256", to hex digests of the
+        downloaded bytes.
+    ``head``
+        The first few downloaded bytes, as a binary blob.
+    ``path``
+        The path to the file the downloaded bytes were spooled to, or
+        ``None``.
+
+    Spooled files are deleted by :meth:`close`, or when the object is used as a
+    context manager:
+
+    >>> with http_download(url, spool=True) as result:
+    ...     with result.mmap() as contents:
+    ...         contents[:4]
+    """
+
+    def __init__(self, url, status_code, headers):
+        """Initialize a new object."""
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.size = 0
+        self.checksums = {}
+        self.head = b''
+        self.path = None
+
+    def __enter__(self):
+        """Return this object."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Call :meth:`close`."""
+        self.close()
+
+    def __repr__(self):
+        """Summarize the download."""
+        return '<{} url={!r} status_code={} size={} path={!r}>'.format(
+            type(self).__name__,
+            self.url,
+            self.status_code,
+            self.size,
+            self.path,
+        )
+
+    def open(self):
+        """Open the spooled file for binary reading, and return it."""
+        if self.path is None:
+            raise ValueError('The download of {} was not spooled.'
+                             .format(self.url))
+        return open(self.path, 'rb')
+
+    @contextlib.contextmanager
+    def mmap(self):
+        """Memory-map the spooled file, and yield the ``mmap`` object."""
+        with self.open() as handle:
+            with mmap.mmap(
+                    handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def close(self):
+        """Delete the spooled file, if any."""
+        if self.path is not None:
+            os.remove(self.path)
+            self.path = None
+
+
+def http_download(  # pylint:disable=too-many-arguments,too-many-locals
+        url,
+        algorithms=(),
+        spool=False,
+        head=0,
+        byte_range=None,
+        **kwargs):
+    r"""Stream the file at ``url``, without holding it in memory.
+
+    This is an alternative to :func:`http_get` for large files. The response
+    body is read one chunk at a time. Each chunk is hashed with every one of
+    ``algorithms`` and, if requested, appended to a temporary file, and is then
+    discarded. For example, to get the size and checksum of a published ISO:
+
+    >>> result = http_download(url, algorithms=('sha256',))
+    >>> result.size, result.checksums['sha256']
+
+    Or, to peek at the first few bytes of an RPM:
+
+    >>> http_download(url, head=4, byte_range=(0, 3)).head
+    b'\xed\xab\xee\xdb'
+
+    :param url: The URL of the file to download.
+    :param algorithms: An iterable of algorithm names understood by
+        ``hashlib.new``, such as "md5", "sha1" or "sha256".
+    :param spool: Whether to save the downloaded bytes to a temporary file.
+    :param head: The number of leading bytes to keep in memory.
+    :param byte_range: A ``(first, last)`` tuple of byte offsets. If given,
+        only that part of the file is requested, with an HTTP Range header.
+        ``last`` is inclusive, and may be ``None``. If the server ignores the
+        header, the range is cut out of the full response.
+    :param kwargs: Additional kwargs to be passed to ``requests.get``. If no
+        ``timeout`` is given, one minute is used.
+    :returns: A :class:`DownloadResult`.
+    :raises: ``requests.exceptions.HTTPError`` if the server responds with an
+        error.
+    """
+    skip = 0
+    remaining = None
+    kwargs.setdefault('timeout', _DOWNLOAD_TIMEOUT)
+    if byte_range is not None:
+        first, last = byte_range
+        kwargs['headers'] = dict(kwargs.get('headers') or {})
+        kwargs['headers']['Range'] = 'bytes={}-{}'.format(
+            first, '' if last is None else last)
+    with cassette.mount(requests.Session()) as session, \
+            session.get(url, stream=True, **kwargs) as response:
+        response.raise_for_status()
+        result = DownloadResult(url, response.status_code, response.headers)
+        if byte_range is not None:
+            if response.status_code == 200:
+                skip = first
+            if last is not None:
+                remaining = last - first + 1
+        hashers = {
+            algorithm: hashlib.new(algorithm) for algorithm in algorithms
+        }
+        spool_file = None
+        if spool:
+            handle, result.path = tempfile.mkstemp(prefix='pulp_smash-')
+            spool_file = os.fdopen(handle, 'wb')
+        try:
+            for chunk in response.iter_content(_DOWNLOAD_CHUNK_SIZE):
+                if skip:
+                    chunk, skip = chunk[skip:], max(0, skip - len(chunk))
+                if remaining is not None:
+                    chunk = chunk[:remaining]
+                    remaining -= len(chunk)
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                if spool_file is not None:
+                    spool_file.write(chunk)
+                if len(result.head) < head:
+                    result.head += chunk[:head - len(result.head)]
+                result.size += len(chunk)
+                if remaining == 0:
+                    break
+        except BaseException:
+            result.close()
+            raise
+        finally:
+            if spool_file is not None:
+                spool_file.close()
+    result.checksums = {
+        algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()
+    }
+    return result
+
+
 def pulp_admin_login(server_config):
     """Execute ``pulp-admin login``.
 
@@ -89,16 +289,55 @@ def pulp_admin_login(server_config):
     return cli.Client(server_config).run(cmd.split())
 
 
-def reset_pulp(server_config):
+def reset_pulp(server_config, mode=None):
     """Stop Pulp, reset its database, remove certain files, and start it.
 
+    Two modes are available:
+
+    ``full``
+        Drop the database, run ``pulp-manage-db`` to recreate it, and remove
+        all content and published files.
+    ``snapshot``
+        The first time, do a full reset and then dump the fresh database to a
+        baseline archive on the system with the ``mongod`` role. After that,
+        restore the database from the archive, and remove all content and
+        published files. This skips ``pulp-manage-db`` and its migrations,
+        which take most of the time of a full reset. The archive is named after
+        the Pulp version under test, so a new baseline is made after an
+        upgrade. Call :func:`discard_pulp_snapshot` to force a new baseline.
+        Requires ``mongodump`` and ``mongorestore`` 3.2 or newer.
+
+    Services are stopped and started on all systems at once, in stages. (See
+    :class:`pulp_smash.cli.GlobalServiceManager`.) Set the
+    ``PULP_SMASH_SERVICE_WORKERS`` environment variable to limit the number of
+    systems managed at the same time. Set it to 1 to manage one system after
+    another.
+
     :param pulp_smash.config.PulpSmashConfig server_config: Information about
         the Pulp server being targeted.
+    :param mode: Either "full" or "snapshot". Defaults to the value of the
+        ``PULP_SMASH_RESET_MODE`` environment variable, or "full".
     :returns: Nothing.
     """
-    svc_mgr = cli.GlobalServiceManager(server_config)
+    if mode is None:
+        mode = os.environ.get('PULP_SMASH_RESET_MODE', 'full')
+    if mode not in ('full', 'snapshot'):
+        raise ValueError(
+            'Unknown reset mode {!r}. Use "full" or "snapshot".'.format(mode)
+        )
+    get_resource_pool().clear()
+    get_shared_repo_registry().clear()
+    # Queued deletions would fail after the reset, and a queued orphan purge
+    # could remove units that the next test class creates.
+    get_teardown_collector().flush()
+    svc_mgr = cli.GlobalServiceManager(
+        server_config, max_workers=_get_service_workers(server_config))
     svc_mgr.stop(PULP_SERVICES)
 
+    if mode == 'snapshot' and _restore_pulp_snapshot(server_config):
+        svc_mgr.start(PULP_SERVICES)
+        return
+
     # Reset the database and nuke accumulated files.
     #
     # Why use `runuser` instead of `sudo`? Because some systems are configured
@@ -122,10 +361,288 @@ def reset_pulp(server_config):
         client.run((prefix + 'rm -rf /var/lib/pulp/content').split())
         client.run((prefix + 'rm -rf /var/lib/pulp/published').split())
 
+    if mode == 'snapshot':
+        _save_pulp_snapshot(server_config)
     svc_mgr.start(PULP_SERVICES)
 
 
-def upload_import_unit(cfg, unit, import_params, repo):
+def _get_service_workers(server_config):
+    """Return the number of systems reset_pulp may manage at the same time.
+
+    Read the ``PULP_SMASH_SERVICE_WORKERS`` environment variable. Default to
+    the number of systems in ``server_config``.
+    """
+    return max(1, int(os.environ.get(
+        'PULP_SMASH_SERVICE_WORKERS',
+        len(server_config.systems),
+    )))
+
+
+def _get_pulp_snapshot_path(server_config):
+    """Return the path to the baseline database archive used by reset_pulp."""
+    return '/var/lib/pulp-smash/pulp_database-{}.archive.gz'.format(
+        server_config.pulp_version)
+
+
+def _get_mongod_system(server_config):
+    """Return the system with the ``mongod`` role, and a command prefix.
+
+    The prefix is ``('sudo',)`` if we aren't root on that system.
+    """
+    system = server_config.get_systems('mongod')[0]
+    sudo = () if is_root(server_config, pulp_system=system) else ('sudo',)
+    return system, sudo
+
+
+def _save_pulp_snapshot(server_config):
+    """Dump the Pulp database to a baseline archive. See reset_pulp."""
+    system, sudo = _get_mongod_system(server_config)
+    client = cli.Client(server_config, pulp_system=system)
+    path = _get_pulp_snapshot_path(server_config)
+    client.run(sudo + ('mkdir', '--parents', os.path.dirname(path)))
+    client.run(sudo + (
+        'mongodump',
+        '--db', 'pulp_database',
+        '--gzip',
+        '--archive={}'.format(path),
+    ))
+
+
+def _restore_pulp_snapshot(server_config):
+    """Restore Pulp's database from a baseline archive, and remove files.
+
+    See :func:`reset_pulp`.
+
+    :returns: ``True`` if Pulp was reset, or ``False`` if there is no baseline
+        archive yet.
+    """
+    system, sudo = _get_mongod_system(server_config)
+    client = cli.Client(server_config, cli.echo_handler, pulp_system=system)
+    path = _get_pulp_snapshot_path(server_config)
+    if client.run(sudo + ('test', '-f', path)).returncode != 0:
+        return False
+
+    # --drop only drops the collections found in the archive, so drop the
+    # whole database first, in case tests created other collections.
+    client.response_handler = cli.code_handler
+    client.run('mongo pulp_database --eval db.dropDatabase()'.split())
+    client.run(sudo + (
+        'mongorestore',
+        '--drop',
+        '--gzip',
+        '--archive={}'.format(path),
+    ))
+    for system in server_config.get_systems('api'):
+        client = cli.Client(server_config, pulp_system=system)
+        sudo = () if is_root(server_config, pulp_system=system) else ('sudo',)
+        client.run(sudo + (
+            'rm', '-rf', '/var/lib/pulp/content', '/var/lib/pulp/published'
+        ))
+    return True
+
+
+def discard_pulp_snapshot(server_config):
+    """Delete the baseline database archive made by :func:`reset_pulp`.
+
+    The next snapshot-mode reset will do a full reset and make a new baseline.
+
+    :param pulp_smash.config.PulpSmashConfig server_config: Information about
+        the Pulp server being targeted.
+    :returns: Nothing.
+    """
+    system, sudo = _get_mongod_system(server_config)
+    client = cli.Client(server_config, pulp_system=system)
+    client.run(sudo + ('rm', '-f', _get_pulp_snapshot_path(server_config)))
+
+
+def _iter_chunks(unit, chunk_size):
+    """Split ``unit`` into chunks of at most ``chunk_size`` bytes.
+
+    See :func:`upload_import_unit` for the types of ``unit`` accepted. Files
+    are memory-mapped where possible, so only one chunk at a time is copied
+    into memory.
+
+    :returns: An iterator of ``(offset, chunk)`` tuples.
+    """
+    if isinstance(unit, (bytes, bytearray, memoryview)):
+        with memoryview(unit) as view:
+            for offset in range(0, len(view), chunk_size):
+                yield offset, bytes(view[offset:offset + chunk_size])
+    elif (isinstance(unit, (str, pathlib.PurePath)) or
+          hasattr(unit, '__fspath__')):
+        if isinstance(unit, pathlib.PurePath):
+            unit = str(unit)  # Python 3.4 and 3.5 can't open() path objects.
+        with open(unit, 'rb') as handle:
+            yield from _iter_file_chunks(handle, chunk_size)
+    elif hasattr(unit, 'read'):
+        yield from _iter_file_chunks(unit, chunk_size)
+    else:
+        offset = 0
+        for data in unit:
+            for start in range(0, len(data), chunk_size):
+                chunk = bytes(data[start:start + chunk_size])
+                yield offset, chunk
+                offset += len(chunk)
+
+
+def _iter_file_chunks(handle, chunk_size):
+    """Split the rest of the binary file ``handle`` into chunks.
+
+    Memory-map the file if it is a regular file, or read from it otherwise.
+
+    :returns: An iterator of ``(offset, chunk)`` tuples. Offsets are relative
+        to the file's current position.
+    """
+    try:
+        start = handle.tell()
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        # The file isn't backed by a file descriptor, isn't seekable, or is
+        # empty. mmap() refuses empty files.
+        offset = 0
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:  # if chunk == b'':
+                break  # we've reached EOF
+            yield offset, chunk
+            offset += len(chunk)
+        return
+    with mapped:
+        for offset in range(start, len(mapped), chunk_size):
+            yield offset - start, mapped[offset:offset + chunk_size]
+
+
+class UploadStats(object):
+    """Statistics about the upload of a content unit.
+
+    Pass an instance of this class to :func:`upload_import_unit`, and it will
+    be filled in:
+
+    >>> from pulp_smash import config, utils
+    >>> stats = utils.UploadStats()
+    >>> utils.upload_import_unit(
+    ...     config.get_config(), 'big.iso', {}, repo, stats=stats)
+    >>> print('{:.1f} MB/s'.format(stats.throughput))
+
+    The following attributes are available:
+
+    ``bytes``
+        The number of bytes uploaded.
+    ``chunks``
+        The number of chunks uploaded.
+    ``retries``
+        The number of times a chunk upload failed and was retried.
+    ``seconds``
+        The time spent uploading chunks.
+    """
+
+    def __init__(self):
+        """Initialize a new object."""
+        self.bytes = 0
+        self.chunks = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        """Return the upload throughput, in megabytes per second."""
+        if not self.seconds:
+            return 0.0
+        return self.bytes / 1e6 / self.seconds
+
+    def __repr__(self):
+        """Summarize the upload."""
+        return (
+            '<{} bytes={} chunks={} retries={} seconds={:.3f} '
+            'throughput={:.1f}MB/s>'.format(
+                type(self).__name__,
+                self.bytes,
+                self.chunks,
+                self.retries,
+                self.seconds,
+                self.throughput,
+            )
+        )
+
+
+def _upload_chunk(  # pylint:disable=too-many-arguments
+        client, upload_href, offset, chunk, retries, stats, lock):
+    """Upload ``chunk`` at ``offset``, retrying up to ``retries`` times."""
+    path = urljoin(upload_href, '{}/'.format(offset))
+    for attempt in range(retries + 1):
+        try:
+            client.put(path, data=chunk)
+            break
+        except requests.exceptions.RequestException:
+            if attempt == retries:
+                raise
+            with lock:
+                stats.retries += 1
+    with lock:
+        stats.bytes += len(chunk)
+        stats.chunks += 1
+
+
+def _upload_chunks(  # pylint:disable=too-many-arguments
+        client, upload_href, chunks, max_workers, retries, stats):
+    """Upload each ``(offset, chunk)`` in ``chunks``.
+
+    If ``max_workers`` is greater than one, upload up to that many chunks at
+    the same time. At most twice that many chunks are held in memory. No more
+    chunks are read once one has failed.
+    """
+    lock = threading.Lock()
+    start = time.monotonic()
+    try:
+        if max_workers <= 1:
+            for offset, chunk in chunks:
+                _upload_chunk(
+                    client, upload_href, offset, chunk, retries, stats, lock)
+            return
+
+        in_flight = threading.BoundedSemaphore(2 * max_workers)
+        failed = threading.Event()
+
+        def done(future):
+            """Make room for another chunk, and note any failure."""
+            if future.exception() is not None:
+                failed.set()
+            in_flight.release()
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for offset, chunk in chunks:
+                in_flight.acquire()
+                if failed.is_set():
+                    in_flight.release()
+                    break
+                future = executor.submit(
+                    _upload_chunk,
+                    client,
+                    upload_href,
+                    offset,
+                    chunk,
+                    retries,
+                    stats,
+                    lock,
+                )
+                future.add_done_callback(done)
+                futures.append(future)
+        for future in futures:
+            future.result()
+    finally:
+        stats.seconds += time.monotonic() - start
+
+
+def upload_import_unit(  # pylint:disable=too-many-arguments
+        cfg,
+        unit,
+        import_params,
+        repo,
+        chunk_size=200000,
+        max_workers=1,
+        retries=0,
+        stats=None):
     """Upload a content unit to a Pulp server and import it into a repository.
 
     This procedure only works for some unit types, such as ``rpm`` or
@@ -156,28 +673,45 @@ def upload_import_unit(cfg, unit, import_params, repo):
             'upload_id': '…',
         }
 
+    The unit is streamed to Pulp, so large units needn't fit in memory. If
+    ``unit`` is a path or a regular file, it is memory-mapped.
+
+    Pulp accepts chunks at any offset, in any order. If ``max_workers`` is
+    greater than one, that many chunks are uploaded at the same time, over the
+    connections pooled by :func:`pulp_smash.api.get_session`. The pool should
+    be at least that large. (See the ``api`` role's ``pool_size``.)
+
     :param pulp_smash.config.PulpSmashConfig cfg: Information about a Pulp
         host.
-    :param unit: The unit to be uploaded and imported, as a binary blob.
+    :param unit: The unit to be uploaded and imported. Either a binary blob,
+        the path to a file (a string or a path object), a binary file object,
+        or an iterable of binary blobs.
     :param import_params: A dict of parameters to be merged into the default
         set of import parameters during step 3.
     :param repo: A dict of information about the target repository.
+    :param chunk_size: The maximum number of bytes to upload per request.
+        Defaults to 200,000 bytes (~200 kB).
+    :param max_workers: The maximum number of chunks to upload at the same
+        time.
+    :param retries: The number of times to retry the upload of a chunk that
+        fails.
+    :param stats: An :class:`UploadStats` object, to be filled in with
+        statistics about the upload.
     :returns: The call report returned when importing the unit.
     """
+    if stats is None:
+        stats = UploadStats()
     client = api.Client(cfg, api.json_handler)
     malloc = client.post(CONTENT_UPLOAD_PATH)
 
-    # 200,000 bytes ~= 200 kB
-    chunk_size = 200000
-    offset = 0
-    with io.BytesIO(unit) as handle:
-        while True:
-            chunk = handle.read(chunk_size)
-            if not chunk:  # if chunk == b'':
-                break  # we've reached EOF
-            path = urljoin(malloc['_href'], '{}/'.format(offset))
-            client.put(path, data=chunk)
-            offset += chunk_size
+    _upload_chunks(
+        client,
+        malloc['_href'],
+        _iter_chunks(unit, chunk_size),
+        max_workers,
+        retries,
+        stats,
+    )
 
     path = urljoin(repo['_href'], 'actions/import_upload/')
     body = {'unit_key': {}, 'upload_id': malloc['upload_id']}
@@ -212,6 +746,673 @@ def upload_import_erratum(server_config, erratum, repo_href):
     return call_report
 
 
+class TeardownCollector(object):
+    """A thread-safe collector of resources to delete after tests.
+
+    Deleting a resource makes Pulp spawn a task, and waiting for each task
+    slows down every test class. Instead, test classes may queue deletions
+    here. They are issued concurrently in the background, while later tests
+    run:
+
+    >>> collector = TeardownCollector()
+    >>> collector.delete(cfg, repo['_href'])
+    >>> collector.purge_orphans(cfg)
+    >>> collector.close()
+
+    Content units are left behind as orphans by deleted repositories. Orphans
+    are purged once per Pulp deployment, by :meth:`flush`, after every queued
+    deletion is done. :class:`BaseAPITestCase` calls :meth:`start_module`, so
+    that this happens once per test module, unless ``flush_per_module`` is
+    false. Test classes that depend on which units are orphaned, or that must
+    download content afresh, should call :func:`purge_orphans` first.
+    :func:`reset_pulp` flushes too.
+
+    If a deletion fails, the failure is recorded, and :meth:`close` reports
+    every failure at once. Call :func:`close_teardown_collector` at the end of
+    a test session. It is also called when the process exits, but by then,
+    deletions can only be issued one at a time.
+
+    :param max_workers: The maximum number of resources to delete at the
+        same time.
+    """
+
+    def __init__(self, max_workers=4):
+        """Initialize a new object."""
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = None
+        # A dict mapping base URLs to configs, for deployments with orphans.
+        self._orphans = {}
+        # A list of (href, error) tuples, for resources not deleted.
+        self.failures = []
+        # Whether start_module() flushes. A runner that runs several modules
+        # against one deployment at once turns this off.
+        self.flush_per_module = True
+        # The name of the test module that started last.
+        self._module = None
+
+    def _delete(self, cfg, href):
+        """Delete ``href``, and record the error if that fails."""
+        try:
+            api.Client(cfg).delete(href)
+        except Exception as err:  # pylint:disable=broad-except
+            with self._lock:
+                self.failures.append((href, err))
+
+    def delete(self, cfg, href):
+        """Delete the resource at ``href`` in the background.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            Pulp deployment being targeted.
+        :param href: The path to a resource, such as a repository's
+            ``_href``.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+            executor = self._executor
+        # If the interpreter is shutting down, delete the resource now.
+        api.submit_or_call(executor, self._delete, cfg, href)
+
+    def purge_orphans(self, cfg):
+        """Purge orphaned content units when :meth:`flush` is called.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            Pulp deployment being targeted.
+        """
+        with self._lock:
+            self._orphans[cfg.get_base_url()] = cfg
+
+    def wait(self):
+        """Wait for every queued deletion to finish."""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown()
+
+    def flush(self):
+        """Wait for every queued deletion, then purge orphans if requested."""
+        self.wait()
+        with self._lock:
+            orphans = self._orphans
+            self._orphans = {}
+        for cfg in orphans.values():
+            self._delete(cfg, ORPHANS_PATH)
+
+    def start_module(self, module):
+        """Note that a test in ``module`` is starting.
+
+        If the previous test was in another module, and ``flush_per_module``
+        is true, :meth:`flush`. This way, orphans are purged between modules
+        even when they run one after another in a single process.
+
+        :param module: The name of a test module.
+        """
+        with self._lock:
+            previous = self._module
+            self._module = module
+        if self.flush_per_module and previous not in (None, module):
+            self.flush()
+
+    def close(self):
+        """Flush, and report every resource that couldn't be deleted.
+
+        Failures are reported in a single ``RuntimeWarning``.
+        """
+        self.flush()
+        with self._lock:
+            failures = self.failures
+            self.failures = []
+        if failures:
+            warnings.warn(
+                'Cannot delete {} resources during teardown. Errors:\n{}'
+                .format(len(failures), '\n'.join(
+                    '{}: {}'.format(href, err) for href, err in failures
+                )),
+                RuntimeWarning
+            )
+
+
+_TEARDOWN_COLLECTOR = TeardownCollector()
+# Registered before other cleanup handlers, so that it runs after them, and
+# orphans they leave behind are purged too.
+atexit.register(_TEARDOWN_COLLECTOR.close)
+
+
+def get_teardown_collector():
+    """Return the :class:`TeardownCollector` shared by all test classes."""
+    return _TEARDOWN_COLLECTOR
+
+
+def close_teardown_collector():
+    """Finish queued deletions, purge orphans, and report failures."""
+    _TEARDOWN_COLLECTOR.close()
+
+
+def purge_orphans(cfg):
+    """Finish queued deletions, then purge orphaned content units.
+
+    Call this before a test that depends on which content units are orphaned,
+    or on content being downloaded afresh. Shared repositories that nobody
+    borrows are deleted first, so that their units are purged too. See
+    :meth:`SharedRepoRegistry.purge`.
+
+    :param pulp_smash.config.PulpSmashConfig cfg: Information about the Pulp
+        deployment being targeted.
+    """
+    get_shared_repo_registry().purge(cfg)
+    _TEARDOWN_COLLECTOR.purge_orphans(cfg)
+    _TEARDOWN_COLLECTOR.flush()
+
+
+class _SharedRepo(object):  # pylint:disable=too-few-public-methods
+    """A repository in a :class:`SharedRepoRegistry`, and its borrowers."""
+
+    def __init__(self, cfg, body):
+        """Initialize a new object."""
+        self.cfg = cfg
+        self.body = body
+        self.borrowers = 0
+        self.lock = threading.Lock()
+        self.repo = None
+        # The response to the request that synced the repository.
+        self.report = None
+
+
+class SharedRepoRegistry(object):
+    """A thread-safe registry of synced repositories, shared between tests.
+
+    Many test classes create a repository, sync it from a well-known feed, and
+    then only read from it. Instead, they may borrow a repository from this
+    registry. The first borrower causes the repository to be created and
+    synced, and later borrowers get the same repository:
+
+    >>> registry = SharedRepoRegistry()
+    >>> body = gen_repo()
+    >>> body['importer_config']['feed'] = RPM_SIGNED_FEED_URL
+    >>> repo = registry.borrow(cfg, body)
+    >>> # Search, download, copy from the repository, but don't change it.
+    >>> registry.release(repo)
+
+    Repositories are keyed by their importer type and configuration, notes,
+    distributor types and configurations, and whether they are published.
+    Other parts of the body, such as the repository and distributor IDs, are
+    used when the repository is created, and are otherwise ignored.
+
+    Repositories are reference counted. A borrowed repository is never
+    deleted. A repository that is no longer borrowed is kept, so that later
+    borrowers don't sync it again, until :meth:`close` is called at the end of
+    the session, :meth:`clear` is called by :func:`reset_pulp`, or
+    :meth:`purge` is called by :func:`purge_orphans`. Tests that expect
+    content units to be orphaned should call :func:`purge_orphans` first. If a
+    repository has disappeared, for example because another process purged
+    it, it is created again.
+
+    Shared repositories are given IDs starting with ``pulp-smash-shared-``, so
+    that :meth:`purge` can find those created by other processes. A
+    repository without a feed is created but not synced.
+    """
+
+    def __init__(self):
+        """Initialize a new object."""
+        self._lock = threading.Lock()
+        # A dict mapping keys, as returned by _get_key(), to _SharedRepo.
+        self._repos = {}
+
+    def __len__(self):
+        """Return the number of repositories in the registry."""
+        with self._lock:
+            return len(self._repos)
+
+    @staticmethod
+    def _get_key(cfg, body, publish):
+        """Return a key identifying the repositories like ``body``."""
+        # Distributor IDs are random, and don't change how a repository
+        # behaves.
+        distributors = [
+            {key: value for key, value in distributor.items()
+             if key != 'distributor_id'}
+            for distributor in body.get('distributors', ())
+        ]
+        return json.dumps({
+            'base_url': cfg.get_base_url(),
+            'distributors': sorted(
+                distributors,
+                key=lambda dist: json.dumps(dist, sort_keys=True),
+            ),
+            'importer_config': body.get('importer_config', {}),
+            'importer_type_id': body.get('importer_type_id'),
+            'notes': body.get('notes', {}),
+            'publish': publish,
+        }, sort_keys=True)
+
+    def borrow(self, cfg, body, publish=False):
+        """Return a synced repository like ``body``, creating it if needed.
+
+        The caller must not change the repository, and must call
+        :meth:`release` when done with it.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            Pulp deployment being targeted.
+        :param body: A dict of information for creating the repository, such
+            as one returned by ``gen_repo()``. Its ID is ignored.
+        :param publish: Whether to publish the repository with each of its
+            distributors after syncing it.
+        :returns: A dict of detailed information about the repository.
+        """
+        body = copy.deepcopy(body)
+        body['id'] = _SHARED_REPO_ID_PREFIX + uuid4()
+        with self._lock:
+            shared = self._repos.setdefault(
+                self._get_key(cfg, body, publish), _SharedRepo(cfg, body))
+            shared.borrowers += 1
+        try:
+            # Syncing may take a while. Don't block other repositories.
+            with shared.lock:
+                if shared.repo is not None and not self._exists(shared):
+                    shared.repo = None
+                if shared.repo is None:
+                    shared.repo = self._create(shared, publish)
+                return copy.deepcopy(shared.repo)
+        except BaseException:
+            with self._lock:
+                shared.borrowers -= 1
+            raise
+
+    def get_sync_report(self, repo):
+        """Return the response to the request that synced ``repo``.
+
+        :param repo: A repository returned by :meth:`borrow`.
+        :returns: A ``requests.Response``, or ``None`` if the repository has
+            no feed.
+        :raises: ``ValueError`` if ``repo`` isn't in the registry.
+        """
+        with self._lock:
+            for shared in self._repos.values():
+                if (shared.repo is not None and
+                        shared.repo['_href'] == repo['_href']):
+                    return shared.report
+        raise ValueError(
+            'Repository {} is not shared.'.format(repo['_href']))
+
+    def release(self, repo):
+        """Stop borrowing ``repo``. See :meth:`borrow`.
+
+        The repository is kept, even if nobody else is borrowing it.
+
+        :raises: ``ValueError`` if ``repo`` wasn't borrowed.
+        """
+        with self._lock:
+            for shared in self._repos.values():
+                if not shared.borrowers or shared.repo is None:
+                    continue
+                if shared.repo['_href'] == repo['_href']:
+                    shared.borrowers -= 1
+                    return
+        raise ValueError(
+            'Repository {} was not borrowed.'.format(repo['_href']))
+
+    def _pop_idle(self, cfg=None):
+        """Forget every repository that is not borrowed, and return them.
+
+        If ``cfg`` is given, only forget those on the deployment it describes.
+        """
+        with self._lock:
+            keys = [
+                key for key, shared in self._repos.items()
+                if not shared.borrowers and (
+                    cfg is None or
+                    shared.cfg.get_base_url() == cfg.get_base_url())
+            ]
+            return [self._repos.pop(key) for key in keys]
+
+    def clear(self):
+        """Forget every repository that is not borrowed, without deleting it.
+
+        :func:`reset_pulp` calls this, as the repositories are gone.
+        """
+        self._pop_idle()
+
+    def purge(self, cfg):
+        """Delete every shared repository on a deployment that isn't borrowed.
+
+        Repositories shared by other processes are deleted too, if they have
+        an ID starting with ``pulp-smash-shared-``. Those processes create
+        them again as needed. Only call this when no other process is running
+        tests against the deployment, for example from a test module holding
+        :data:`pulp_smash.runner.EXCLUSIVE_LOCK`.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            Pulp deployment being targeted.
+        """
+        self._pop_idle(cfg)
+        with self._lock:
+            borrowed = {
+                shared.repo['_href'] for shared in self._repos.values()
+                if shared.repo is not None
+            }
+        client = api.Client(cfg, api.json_handler)
+        for repo in client.get(REPOSITORY_PATH):
+            if (repo['id'].startswith(_SHARED_REPO_ID_PREFIX) and
+                    repo['_href'] not in borrowed):
+                self._delete(cfg, repo)
+
+    def close(self):
+        """Delete every repository that is not borrowed.
+
+        If a repository can't be deleted, a ``RuntimeWarning`` is emitted.
+        """
+        for shared in self._pop_idle():
+            if shared.repo is not None:
+                self._delete(shared.cfg, shared.repo)
+
+    @staticmethod
+    def _delete(cfg, repo):
+        """Delete ``repo``. If that fails, emit a ``RuntimeWarning``."""
+        try:
+            api.Client(cfg).delete(repo['_href'])
+        except Exception as err:  # pylint:disable=broad-except
+            warnings.warn(
+                'Cannot delete shared repository {}. Error: {}'
+                .format(repo['_href'], err),
+                RuntimeWarning
+            )
+
+    @staticmethod
+    def _exists(shared):
+        """Tell whether the repository of ``shared`` still exists."""
+        client = api.Client(shared.cfg, api.echo_handler)
+        response = client.get(shared.repo['_href'])
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    @staticmethod
+    def _create(shared, publish):
+        """Create, sync and maybe publish the repository of ``shared``."""
+        client = api.Client(shared.cfg, api.json_handler)
+        repo = client.post(REPOSITORY_PATH, shared.body)
+        try:
+            shared.report = None
+            if shared.body.get('importer_config', {}).get('feed'):
+                shared.report = sync_repo(shared.cfg, repo)
+            repo = client.get(repo['_href'], params={'details': True})
+            if publish:
+                for distributor in repo['distributors']:
+                    publish_repo(shared.cfg, repo, {'id': distributor['id']})
+                repo = client.get(repo['_href'], params={'details': True})
+        except BaseException:
+            client.delete(repo['_href'])
+            raise
+        return repo
+
+
+_SHARED_REPO_REGISTRY = SharedRepoRegistry()
+atexit.register(_SHARED_REPO_REGISTRY.close)
+
+
+def get_shared_repo_registry():
+    """Return the :class:`SharedRepoRegistry` shared by all test classes."""
+    return _SHARED_REPO_REGISTRY
+
+
+def close_shared_repos():
+    """Delete every shared repository that is not borrowed.
+
+    Call this at the end of a test session. It is also called when the
+    process exits, but by then, deletions can only be issued one at a time.
+    Repositories borrowed afterwards are created again as needed.
+    """
+    _SHARED_REPO_REGISTRY.close()
+
+
+class ResourcePool(object):
+    """A thread-safe pool of throwaway resources, created ahead of demand.
+
+    Many test classes start by creating an empty repository or a user, and end
+    by deleting it. Instead, they may take one from this pool, and discard it
+    when done:
+
+    >>> pool = ResourcePool()
+    >>> pool.prime(cfg, create_repo, delete_repo, gen_repo, count=2)
+    >>> repo = pool.take(cfg, create_repo, delete_repo, gen_repo)
+    >>> # Do anything at all with the repository.
+    >>> pool.discard(cfg, delete_repo, repo)
+
+    A kind of resource is named by a ``create`` callable and its arguments.
+    ``create(cfg, *args)`` must return a new resource, and ``delete(cfg,
+    resource)`` must delete it. A test module that knows how many resources
+    of some kind its test classes take may create them ahead of time, in the
+    background, by calling :meth:`prime` from ``setUpModule``. A resource is
+    then taken from these spares, or created on the spot if there are none.
+    Discarded resources are deleted in the background.
+
+    Spares are deleted when :meth:`close` is called. Call
+    :func:`close_resource_pool` at the end of a test session. It is also
+    called when the process exits, but by then, resources can only be created
+    or deleted one at a time. Spares must not outlive the Pulp database they
+    were created in: :func:`reset_pulp` calls :meth:`clear`.
+
+    :param max_workers: The maximum number of resources to create or delete
+        at the same time.
+    """
+
+    def __init__(self, max_workers=4):
+        """Initialize a new object."""
+        self.max_workers = max_workers
+        # Reentrant, as a future's callbacks may run in the submitting thread.
+        self._lock = threading.RLock()
+        self._executor = None
+        # Futures for every resource being created or deleted.
+        self._futures = set()
+        # Bumped by clear(), so that spares created before then are dropped.
+        self._generation = 0
+        # A dict mapping keys, as returned by _get_key(), to lists of spares.
+        self._spares = {}
+        # A dict mapping keys to the number of spares being created.
+        self._pending = {}
+        # A dict mapping keys to (cfg, delete) tuples.
+        self._deleters = {}
+        # A list of (resource, error) tuples, for resources not deleted.
+        self._failures = []
+
+    def __len__(self):
+        """Return the number of spares in the pool."""
+        with self._lock:
+            return sum(len(spares) for spares in self._spares.values())
+
+    @staticmethod
+    def _get_key(cfg, create, args):
+        """Return a key identifying the resources made by ``create``."""
+        return (cfg.get_base_url(), create, args)
+
+    def _submit(self, func, *args):
+        """Call ``func(*args)`` in the background. Don't hold ``_lock``."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers)
+            executor = self._executor
+        # If the interpreter is shutting down, call func now.
+        future = api.submit_or_call(executor, func, *args)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget_future)
+
+    def _forget_future(self, future):
+        """Stop tracking a finished future."""
+        with self._lock:
+            self._futures.discard(future)
+
+    def _create_spare(self, key, generation, cfg, create, args):
+        """Create a spare. Drop it if :meth:`clear` has been called since."""
+        try:
+            resource = create(cfg, *args)
+        except Exception:  # pylint:disable=broad-except
+            # Taking a resource creates one if there are no spares, and
+            # reports the error then.
+            with self._lock:
+                self._pending[key] -= 1
+            return
+        with self._lock:
+            self._pending[key] -= 1
+            if generation == self._generation:
+                self._spares.setdefault(key, []).append(resource)
+                return
+        self._delete(cfg, self._deleters[key][1], resource, False)
+
+    def _delete(self, cfg, delete, resource, record=True):
+        """Delete ``resource``, and maybe record the error if that fails."""
+        try:
+            delete(cfg, resource)
+        except Exception as err:  # pylint:disable=broad-except
+            if record:
+                with self._lock:
+                    self._failures.append((resource, err))
+
+    def prime(self, cfg, create, delete, *args, count=1):
+        """Start creating spares of a kind of resource, in the background.
+
+        Arguments are as for :meth:`take`.
+
+        :param count: The number of spares to create. Spares that are being
+            created already are counted.
+        """
+        key = self._get_key(cfg, create, args)
+        with self._lock:
+            self._deleters[key] = (cfg, delete)
+            spares = len(self._spares.get(key, ())) + self._pending.get(key, 0)
+            count = max(0, count - spares)
+            self._pending[key] = self._pending.get(key, 0) + count
+            generation = self._generation
+        for _ in range(count):
+            self._submit(
+                self._create_spare, key, generation, cfg, create, args)
+
+    def take(self, cfg, create, delete, *args):
+        """Return a spare resource, or create one if there are none.
+
+        Taking a resource doesn't create spares. See :meth:`prime`.
+
+        The caller owns the resource, and should call :meth:`discard` when done
+        with it.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            Pulp deployment being targeted.
+        :param create: A callable which creates a resource. It is passed
+            ``cfg`` and ``args``, and must return the resource.
+        :param delete: A callable which deletes a resource. It is passed
+            ``cfg`` and a resource.
+        :param args: Hashable arguments for ``create``.
+        :returns: A resource, as returned by ``create``.
+        """
+        key = self._get_key(cfg, create, args)
+        with self._lock:
+            self._deleters[key] = (cfg, delete)
+            spares = self._spares.get(key)
+            resource = spares.pop(0) if spares else None
+        if resource is None:
+            resource = create(cfg, *args)
+        return resource
+
+    def discard(self, cfg, delete, resource):
+        """Delete ``resource`` in the background.
+
+        :param pulp_smash.config.PulpSmashConfig cfg: Information about the
+            Pulp deployment being targeted.
+        :param delete: A callable which deletes a resource. It is passed
+            ``cfg`` and ``resource``.
+        :param resource: A resource, such as one returned by :meth:`take`.
+        """
+        self._submit(self._delete, cfg, delete, resource)
+
+    def clear(self):
+        """Forget every spare, and every spare being created.
+
+        Spares are deleted in the background, if they still exist.
+        """
+        with self._lock:
+            self._generation += 1
+            spares = [
+                (self._deleters[key], resource)
+                for key, resources in self._spares.items()
+                for resource in resources
+            ]
+            self._spares.clear()
+        for (cfg, delete), resource in spares:
+            self._submit(self._delete, cfg, delete, resource, False)
+
+    def wait(self):
+        """Wait for every resource being created or deleted."""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown()
+
+    def close(self):
+        """Wait for background work, and delete every spare.
+
+        If a resource can't be deleted, a ``RuntimeWarning`` is emitted.
+        Resources taken afterwards are created again as needed.
+        """
+        self.wait()
+        with self._lock:
+            spares = [
+                (self._deleters[key], resource)
+                for key, resources in self._spares.items()
+                for resource in resources
+            ]
+            self._spares.clear()
+        for (cfg, delete), resource in spares:
+            self._delete(cfg, delete, resource)
+        with self._lock:
+            failures = self._failures
+            self._failures = []
+        for resource, err in failures:
+            warnings.warn(
+                'Cannot delete pooled resource {!r}. Error: {}'
+                .format(resource, err),
+                RuntimeWarning
+            )
+
+
+_RESOURCE_POOL = ResourcePool()
+atexit.register(_RESOURCE_POOL.close)
+
+
+def get_resource_pool():
+    """Return the :class:`ResourcePool` shared by all test classes."""
+    return _RESOURCE_POOL
+
+
+def close_resource_pool():
+    """Wait for the resource pool's background work, and delete its spares.
+
+    Call this at the end of a test session. See :class:`ResourcePool`.
+    """
+    _RESOURCE_POOL.close()
+
+
+def create_repo(cfg, gen_body):
+    """Create a repository, and return the response body.
+
+    :param pulp_smash.config.PulpSmashConfig cfg: Information about the Pulp
+        deployment being targeted.
+    :param gen_body: A function returning a dict of information for creating
+        the repository, such as ``gen_repo()``.
+    :returns: A dict of information about the new repository.
+    """
+    return api.Client(cfg, api.json_handler).post(REPOSITORY_PATH, gen_body())
+
+
+def delete_repo(cfg, repo):
+    """Delete a repository, such as one returned by :func:`create_repo`."""
+    api.Client(cfg).delete(repo['_href'])
+
+
 class BaseAPITestCase(unittest.TestCase):
     """A class with behaviour that is of use in many API test cases.
 
@@ -224,6 +1425,10 @@ class BaseAPITestCase(unittest.TestCase):
     def setUpClass(cls):
         """Provide a server config and an iterable of resources to delete.
 
+        If the previous test class was in another module, first finish the
+        deletions and orphan purges it queued. See
+        :meth:`TeardownCollector.start_module`.
+
         The following class attributes are created this method:
 
         ``cfg``
@@ -232,17 +1437,73 @@ class BaseAPITestCase(unittest.TestCase):
             A set object. If a child class creates some resources that should
             be deleted when the test is complete, the child class should add
             that resource's href to this set.
+        ``borrowed_repos``
+            A list of the repositories borrowed with :meth:`borrow_repo`.
+        ``taken_repos``
+            A list of the repositories taken with :meth:`take_repo`.
         """
+        get_teardown_collector().start_module(cls.__module__)
         cls.cfg = config.get_config()
         cls.resources = set()
+        cls.borrowed_repos = []
+        cls.taken_repos = []
 
     @classmethod
     def tearDownClass(cls):
-        """Delete all resources named by ``resources``."""
-        client = api.Client(cls.cfg)
+        """Delete all resources named by ``resources``, in the background.
+
+        Deletions are queued with :func:`get_teardown_collector`, which also
+        purges orphans later on. Also return the repositories named by
+        ``borrowed_repos``, and discard the repositories named by
+        ``taken_repos``.
+        """
+        registry = get_shared_repo_registry()
+        while cls.borrowed_repos:
+            registry.release(cls.borrowed_repos.pop())
+        pool = get_resource_pool()
+        while cls.taken_repos:
+            pool.discard(cls.cfg, delete_repo, cls.taken_repos.pop())
+        collector = get_teardown_collector()
         for resource in cls.resources:
-            client.delete(resource)
-        client.delete(ORPHANS_PATH)
+            collector.delete(cls.cfg, resource)
+        collector.purge_orphans(cls.cfg)
+
+    @classmethod
+    def borrow_repo(cls, body, publish=False):
+        """Borrow a synced repository, shared with other test classes.
+
+        Use this instead of creating and syncing a repository if the test
+        class only reads from it. The repository is returned by
+        :meth:`tearDownClass`, and kept for later borrowers. See
+        :class:`SharedRepoRegistry`.
+
+        :param body: A dict of information for creating the repository.
+        :param publish: Whether to publish the repository with each of its
+            distributors.
+        :returns: A dict of detailed information about the repository.
+        """
+        repo = get_shared_repo_registry().borrow(cls.cfg, body, publish)
+        cls.borrowed_repos.append(repo)
+        return repo
+
+    @classmethod
+    def take_repo(cls, gen_body):
+        """Take a new, empty repository from the resource pool.
+
+        Use this instead of creating a repository with ``REPOSITORY_PATH``.
+        The repository is deleted in the background by :meth:`tearDownClass`.
+        If the module primed the pool with :func:`create_repo` and
+        ``gen_body``, a spare is taken. See :class:`ResourcePool`.
+
+        :param gen_body: A function returning a dict of information for
+            creating the repository, such as ``gen_repo()``. It must be the
+            function the pool was primed with, if it was.
+        :returns: A dict of information about the repository.
+        """
+        repo = get_resource_pool().take(
+            cls.cfg, create_repo, delete_repo, gen_body)
+        cls.taken_repos.append(repo)
+        return repo
 
 
 class BaseAPICrudTestCase(unittest.TestCase):
@@ -482,24 +1743,147 @@ def sync_repo(cfg, repo):
     return api.Client(cfg).post(urljoin(repo['_href'], 'actions/sync/'))
 
 
-def get_sha256_checksum(url):
-    """Return the sha256 checksum of the file at the given URL.
+def _get_checksum_cache_path():
+    """Return the path to the on-disk checksum cache.
+
+    The file lives in the ``pulp_smash`` directory of the XDG cache home, e.g.
+    ``~/.cache/pulp_smash/checksums.json``.
+    """
+    return os.path.join(
+        BaseDirectory.save_cache_path('pulp_smash'),
+        'checksums.json',
+    )
+
 
-    When a URL is encountered for the first time, do the following:
+def _read_checksum_cache():
+    """Read the on-disk checksum cache.
 
-    1. Download the file and calculate its sha256 checksum.
-    2. Cache the URL-checksum pair.
-    3. Return the checksum.
+    Return a dict mapping URLs to dicts with "checksums", "etag" and
+    "last_modified" keys. Return an empty dict if the cache is missing or
+    can't be parsed.
+    """
+    try:
+        with open(_get_checksum_cache_path()) as handle:
+            cache = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return cache
+
+
+def _save_checksum_cache_entry(url, entry):
+    """Add ``entry`` to the on-disk checksum cache, under key ``url``.
 
-    On subsequent calls, return a cached checksum.
+    The file is replaced atomically, and entries written by other processes in
+    the meantime are kept.
+    """
+    with _CHECKSUM_CACHE_LOCK:
+        cache = _read_checksum_cache()
+        cache[url] = entry
+        path = _get_checksum_cache_path()
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, 'w') as temp_file:
+                json.dump(cache, temp_file, indent=2, sort_keys=True)
+            os.replace(temp_path, path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+
+
+def get_checksums(url, algorithms=('sha256',)):
+    """Return checksums of the file at the given URL.
+
+    Checksums are cached in memory, and on disk in the ``pulp_smash``
+    directory of the XDG cache home. When a URL is encountered for the first
+    time in a process, do the following:
+
+    1. If the on-disk cache has the requested checksums, and if the file's
+       ``ETag`` or ``Last-Modified`` header was recorded, ask the server
+       whether the file has changed. If not, use the cached checksums.
+    2. Otherwise, download the file and calculate all of the requested
+       checksums in one pass. The file is hashed as it is downloaded, so it is
+       never held in memory.
+    3. Cache the checksums, along with the file's ``ETag`` and
+       ``Last-Modified`` headers.
+
+    If the server can't be reached, stale checksums from the on-disk cache
+    are used, and a ``RuntimeWarning`` is emitted.
+
+    :param url: The URL of the file.
+    :param algorithms: An iterable of algorithm names understood by
+        ``hashlib.new``, such as "md5", "sha1" or "sha256".
+    :returns: A dict mapping each of ``algorithms`` to a hex digest.
     """
     # URLs are normalized before checking the cache and possibly downloading
     # files. Otherwise, unnecessary downloads and cache entries may be made.
     url = urlparse(url).geturl()
-    if url not in _CHECKSUM_CACHE:
-        checksum = hashlib.sha256(http_get(url)).hexdigest()
-        _CHECKSUM_CACHE[url] = checksum
-    return _CHECKSUM_CACHE[url]
+    algorithms = set(algorithms)
+    checksums = _CHECKSUM_CACHE.get(url, {})
+    if not algorithms.issubset(checksums):
+        checksums = _fetch_checksums(url, algorithms)
+        _CHECKSUM_CACHE[url] = checksums
+    return {algorithm: checksums[algorithm] for algorithm in algorithms}
+
+
+def _fetch_checksums(url, algorithms):
+    """Validate or calculate checksums of the file at ``url``.
+
+    See :func:`get_checksums`. Checksums already cached for ``url`` are
+    calculated too, so that they stay valid.
+    """
+    entry = _read_checksum_cache().get(url, {})
+    cached = entry.get('checksums', {})
+    headers = {}
+    if algorithms.issubset(cached):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        result = http_download(
+            url,
+            algorithms.union(cached),
+            headers=headers,
+        )
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as err:
+        if not algorithms.issubset(cached):
+            raise
+        warnings.warn(
+            'Cannot contact {}. Pulp Smash will use stale checksums. Error: {}'
+            .format(url, err),
+            RuntimeWarning
+        )
+        return cached
+    if headers and result.status_code == 304:
+        return cached
+    checksums = result.checksums
+    etag = result.headers.get('ETag')
+    last_modified = result.headers.get('Last-Modified')
+    if etag or last_modified:
+        try:
+            _save_checksum_cache_entry(url, {
+                'checksums': checksums,
+                'etag': etag,
+                'last_modified': last_modified,
+            })
+        except OSError as err:
+            warnings.warn(
+                'Cannot save the checksum cache. Error: {}'.format(err),
+                RuntimeWarning
+            )
+    return checksums
+
+
+def get_sha256_checksum(url):
+    """Return the sha256 checksum of the file at the given URL.
+
+    This is a thin wrapper around :func:`get_checksums`.
+    """
+    return get_checksums(url, ('sha256',))['sha256']
 
 
 def publish_repo(cfg, repo, json=None):
@@ -10,20 +10,73 @@ information while Pulp Smash runs. A typical use case is the following::
 
 This requires that gprof2dot and GraphViz be installed. The former is available
 via PyPi, and the latter must be installed on your system.
+
+To run test modules in several processes at once, pass ``--processes``. To
+run them against several identical Pulp deployments at once, pass
+``--settings-file`` once per deployment. See :mod:`pulp_smash.runner`.
+
+The exit status is 0 if all tests pass, or 1 otherwise.
 """
+import argparse
+import os
+import sys
 import unittest
 
+from pulp_smash import runner, selectors, utils
+
 
 def main():
     """Find and execute test cases."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--processes',
+        type=int,
+        help='The number of test modules to run at the same time.',
+    )
+    parser.add_argument(
+        '--settings-file',
+        action='append',
+        dest='settings_files',
+        help='The settings file of a Pulp deployment to test. May be given '
+        'many times. Defaults to PULP_SMASH_CONFIG_FILE, which may name many '
+        'files separated by "{}".'.format(os.pathsep),
+    )
+    parser.add_argument(
+        '--stop-timeout',
+        type=float,
+        help='How long to wait, in seconds, for worker processes to clean up '
+        'after the last test module. Defaults to as long as it takes.',
+    )
+    args = parser.parse_args()
+    settings_files = args.settings_files or runner.get_settings_files()
+
+    if args.processes or len(settings_files) > 1:
+        # Fetch the bugs referenced by the tests all at once, instead of one
+        # at a time in each worker process. This isn't done when running
+        # serially, so that profiles show only the tests.
+        selectors.prefetch_bugs(selectors.find_bug_ids())
+        results = runner.run(
+            processes=args.processes,
+            settings_files=settings_files,
+            stop_timeout=args.stop_timeout,
+        )
+        return int(not all(result.was_successful() for result in results))
+
     # discover() searches for test cases within a *package*. Even if pointed at
     # a module, it will go up a level and search through the parent package.
     # One can select a module with e.g. `pattern='test_login.py'`.
     suite = unittest.TestSuite()
     suite.addTests(unittest.TestLoader().discover('pulp_smash.tests'))
-    runner = unittest.TextTestRunner()
-    runner.run(suite)
+    test_runner = unittest.TextTestRunner()
+    try:
+        return int(not test_runner.run(suite).wasSuccessful())
+    finally:
+        # Thread pools refuse new work once the interpreter starts to shut
+        # down, so clean up now rather than in atexit handlers.
+        utils.close_resource_pool()
+        utils.close_shared_repos()
+        utils.close_teardown_collector()
 
 
 if __name__ == '__main__':
-    exit(main())
+    sys.exit(main())
@@ -37,6 +37,7 @@ setup(
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
     ],
+    python_requires='>=3.4',
     packages=find_packages(include=['pulp_smash', 'pulp_smash.*']),
     install_requires=[
         'click',
@@ -1,9 +1,15 @@
 # coding=utf-8
 """Unit tests for :mod:`pulp_smash.api`."""
+import itertools
+import threading
+import time
 import unittest
 from unittest import mock
+from urllib.parse import urlparse
 
-from pulp_smash import api, config
+import requests
+
+from pulp_smash import api, config, exceptions
 
 
 class EchoHandlerTestCase(unittest.TestCase):
@@ -177,3 +183,336 @@ class ClientTestCase2(unittest.TestCase):
                 self.assertEqual(
                     request.call_args[0], (method.upper(), 'some url'))
                 self.assertIs(request.call_args[1]['json'], json)
+
+
+def _get_config(hostname='example.com', **api_role):
+    """Return a config with a single system, named ``hostname``."""
+    api_role.setdefault('scheme', 'http')
+    return config.PulpSmashConfig(
+        pulp_auth=['admin', 'admin'],
+        systems=[config.PulpSystem(hostname=hostname, roles={'api': api_role})]
+    )
+
+
+class GetSessionTestCase(unittest.TestCase):
+    """Tests for :func:`pulp_smash.api.get_session`."""
+
+    def setUp(self):
+        """Start each test with an empty session cache."""
+        api.close_sessions()
+        self.addCleanup(api.close_sessions)
+
+    def test_shared(self):
+        """Assert clients targeting the same system share a session."""
+        cfg = _get_config()
+        self.assertIs(api.Client(cfg).session, api.Client(cfg).session)
+
+    def test_not_shared(self):
+        """Assert clients targeting different systems have distinct sessions.
+
+        Systems are distinguished by hostname, scheme, verify and auth.
+        """
+        session = api.get_session(_get_config())
+        for cfg in (
+                _get_config(hostname='other.example.com'),
+                _get_config(scheme='https'),
+                _get_config(verify=False)):
+            with self.subTest(cfg=cfg):
+                self.assertIsNot(session, api.get_session(cfg))
+
+    def test_pool_size(self):
+        """Assert the ``pool_size`` option sets the pool size."""
+        session = api.get_session(_get_config(pool_size=3))
+        adapter = session.get_adapter('http://example.com')
+        # pylint:disable=protected-access
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_keep_alive(self):
+        """Assert disabling ``keep_alive`` asks the server to close."""
+        session = api.get_session(_get_config(keep_alive=False))
+        self.assertEqual(session.headers['Connection'], 'close')
+
+    def test_request(self):
+        """Assert :meth:`pulp_smash.api.Client.request` uses the session."""
+        client = api.Client(_get_config(), api.echo_handler)
+        with mock.patch.object(client.session, 'request') as request:
+            response = client.get('/foo/')
+        self.assertIs(response, request.return_value)
+        self.assertEqual(
+            request.call_args[1]['url'],
+            'http://example.com/foo/',
+        )
+
+    def test_connection_stats(self):
+        """Assert a fresh session reports no connections."""
+        self.assertEqual(
+            api.get_connection_stats(_get_config()),
+            {'connections': 0, 'requests': 0, 'reused': 0},
+        )
+
+
+def _task(href, state='finished', spawned=()):
+    """Return a task report for the task at ``href``."""
+    return {
+        '_href': href,
+        'state': state,
+        'spawned_tasks': [{'_href': child} for child in spawned],
+    }
+
+
+def _mock_task_session(tasks, barrier=None):
+    """Return a mock session whose ``get`` method returns task reports.
+
+    :param tasks: A dict mapping task hrefs to task reports.
+    :param barrier: If given, a ``threading.Barrier`` each request waits on.
+    """
+    def get(url, **kwargs):  # pylint:disable=unused-argument
+        """Return a mock response for the task at ``url``."""
+        if barrier is not None:
+            barrier.wait(timeout=5)
+        response = mock.Mock()
+        response.json.return_value = tasks[urlparse(url).path]
+        return response
+    return mock.Mock(get=mock.Mock(side_effect=get))
+
+
+class PollTaskTestCase(unittest.TestCase):
+    """Tests for :func:`pulp_smash.api.poll_task`."""
+
+    def test_order(self):
+        """Assert tasks are yielded parent first, then children in order."""
+        tasks = {
+            '/a/': _task('/a/', spawned=('/b/', '/d/')),
+            '/b/': _task('/b/', spawned=('/c/',)),
+            '/c/': _task('/c/'),
+            '/d/': _task('/d/'),
+        }
+        with mock.patch.object(api, 'get_session') as get_session:
+            get_session.return_value = _mock_task_session(tasks)
+            hrefs = [
+                task['_href'] for task in api.poll_task(_get_config(), '/a/')
+            ]
+        self.assertEqual(hrefs, ['/a/', '/b/', '/c/', '/d/'])
+
+    def test_concurrent(self):
+        """Assert sibling tasks are polled concurrently.
+
+        Each request blocks until two requests are in flight at once. If tasks
+        were polled one after another, the barrier would never be passed.
+        """
+        tasks = {'/a/': _task('/a/'), '/b/': _task('/b/')}
+        call_report = {'spawned_tasks': [{'_href': '/a/'}, {'_href': '/b/'}]}
+        barrier = threading.Barrier(2)
+        with mock.patch.object(api, 'get_session') as get_session:
+            get_session.return_value = _mock_task_session(tasks, barrier)
+            hrefs = [
+                task['_href'] for task
+                in api.poll_spawned_tasks(_get_config(), call_report)
+            ]
+        self.assertEqual(hrefs, ['/a/', '/b/'])
+
+    def test_error(self):
+        """Assert errors raised while polling are propagated."""
+        session = mock.Mock()
+        session.get.return_value.raise_for_status.side_effect = ValueError
+        with mock.patch.object(api, 'get_session') as get_session:
+            get_session.return_value = session
+            with self.assertRaises(ValueError):
+                tuple(api.poll_task(_get_config(), '/a/'))
+
+    def test_timeout(self):
+        """Assert an exhausted schedule raises ``TaskTimedOutError``."""
+        tasks = {'/a/': _task('/a/', state='running')}
+        with mock.patch.object(api, 'get_session') as get_session:
+            get_session.return_value = _mock_task_session(tasks)
+            with self.assertRaises(exceptions.TaskTimedOutError):
+                tuple(api.poll_task(_get_config(), '/a/', schedule=(0, 0)))
+        self.assertEqual(get_session.return_value.get.call_count, 3)
+
+    def test_shut_down(self):
+        """Assert tasks are polled inline if thread pools refuse new work."""
+        tasks = {
+            '/a/': _task('/a/', spawned=('/b/',)),
+            '/b/': _task('/b/'),
+        }
+        executor = mock.Mock()
+        executor.submit.side_effect = RuntimeError(
+            'cannot schedule new futures after interpreter shutdown')
+        with mock.patch.object(api, 'get_session') as get_session, \
+                mock.patch.object(
+                    api, 'ThreadPoolExecutor', return_value=executor):
+            get_session.return_value = _mock_task_session(tasks)
+            hrefs = [
+                task['_href'] for task in api.poll_task(_get_config(), '/a/')
+            ]
+        self.assertEqual(hrefs, ['/a/', '/b/'])
+
+
+class PollScheduleTestCase(unittest.TestCase):
+    """Tests for :class:`pulp_smash.api.PollSchedule`."""
+
+    def test_backoff(self):
+        """Assert delays grow by ``factor`` up to ``maximum``."""
+        schedule = api.PollSchedule(initial=0.5, factor=3, maximum=10)
+        self.assertEqual(
+            list(itertools.islice(schedule, 5)),
+            [0.5, 1.5, 4.5, 10, 10],
+        )
+
+    def test_timeout(self):
+        """Assert iteration stops once ``timeout`` seconds have passed."""
+        self.assertEqual(list(api.PollSchedule(timeout=0)), [])
+
+    def test_get_poll_schedule(self):
+        """Assert the default schedule is built from the config."""
+        cfg = _get_config()
+        cfg.task_polling = {'initial': 1, 'timeout': 60}
+        schedule = api.get_poll_schedule(cfg)
+        self.assertEqual(
+            (schedule.initial, schedule.factor, schedule.timeout),
+            (1, 2, 60),
+        )
+
+
+class BatchPollTaskTestCase(unittest.TestCase):
+    """Tests for :func:`pulp_smash.api.poll_task` with ``batch=True``."""
+
+    def setUp(self):
+        """Mock out the session used to search for tasks."""
+        api._TASK_BATCHERS.clear()  # pylint:disable=protected-access
+        self.addCleanup(api._TASK_BATCHERS.clear)  # noqa pylint:disable=protected-access
+        self.searches = []
+        self.tasks = {}
+
+        def post(url, json, **kwargs):  # noqa pylint:disable=unused-argument,redefined-outer-name
+            """Return the tasks named in the search criteria."""
+            task_ids = json['criteria']['filters']['task_id']['$in']
+            self.searches.append(sorted(task_ids))
+            response = mock.Mock()
+            response.json.return_value = [
+                self.tasks[task_id] for task_id in task_ids
+                if task_id in self.tasks
+            ]
+            return response
+
+        def get(url, **kwargs):  # pylint:disable=unused-argument
+            """Return the task at ``url``."""
+            task_id = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+            self.gets.append(task_id)
+            response = mock.Mock()
+            if task_id in self.tasks:
+                response.json.return_value = self.tasks[task_id]
+            else:
+                response.raise_for_status.side_effect = (
+                    requests.exceptions.HTTPError('404')
+                )
+            return response
+
+        self.gets = []
+        patcher = mock.patch.object(api, 'get_session')
+        self.addCleanup(patcher.stop)
+        self.session = patcher.start().return_value
+        self.session.post.side_effect = post
+        self.session.get.side_effect = get
+
+    def add_task(self, task_id, spawned=(), state='finished'):
+        """Make the mock server aware of a task."""
+        task = _task(
+            '/tasks/{}/'.format(task_id),
+            state,
+            ['/tasks/{}/'.format(child) for child in spawned],
+        )
+        task['task_id'] = task_id
+        self.tasks[task_id] = task
+
+    def test_one_search_per_tick(self):
+        """Assert all spawned tasks are looked up with a single search."""
+        for task_id in ('a', 'b', 'c'):
+            self.add_task(task_id)
+        call_report = {'spawned_tasks': [
+            {'_href': '/tasks/{}/'.format(task_id)} for task_id in 'abc'
+        ]}
+        hrefs = [
+            task['_href'] for task in api.poll_spawned_tasks(
+                _get_config(), call_report, batch=True)
+        ]
+        self.assertEqual(hrefs, ['/tasks/a/', '/tasks/b/', '/tasks/c/'])
+        self.assertEqual(self.searches, [['a', 'b', 'c']])
+
+    def test_children(self):
+        """Assert child tasks are polled once their parent completes."""
+        self.add_task('a', spawned=('b',))
+        self.add_task('b')
+        hrefs = [
+            task['_href'] for task
+            in api.poll_task(_get_config(), '/tasks/a/', batch=True)
+        ]
+        self.assertEqual(hrefs, ['/tasks/a/', '/tasks/b/'])
+        self.assertEqual(self.searches, [['a'], ['b']])
+
+    def test_timeout(self):
+        """Assert an exhausted schedule raises ``TaskTimedOutError``."""
+        self.add_task('a', state='running')
+        with self.assertRaises(exceptions.TaskTimedOutError):
+            tuple(api.poll_task(
+                _get_config(), '/tasks/a/', schedule=(0,), batch=True))
+        self.assertEqual(len(self.searches), 2)
+
+    def test_missing(self):
+        """Assert a task missing from search results raises at once."""
+        with self.assertRaises(exceptions.TaskNotFoundError):
+            tuple(api.poll_task(_get_config(), '/tasks/a/', batch=True))
+        self.assertEqual(self.searches, [['a']])
+
+    def test_independent_schedules(self):
+        """Assert a task's schedule only advances when it is due.
+
+        Poll a slow task alongside a fast one, which causes many more ticks.
+        Assert the slow task is still polled for as long as its own schedule
+        says, and as many times.
+        """
+        self.add_task('fast', state='running')
+        self.add_task('slow', state='running')
+        config_ = _get_config()
+        durations = {}
+
+        def poll(task_id, schedule):
+            """Poll a task until it times out, and record how long it took."""
+            start = time.monotonic()
+            with self.assertRaises(exceptions.TaskTimedOutError):
+                tuple(api.poll_task(
+                    config_,
+                    '/tasks/{}/'.format(task_id),
+                    schedule=schedule,
+                    batch=True,
+                ))
+            durations[task_id] = time.monotonic() - start
+
+        threads = [
+            threading.Thread(target=poll, args=('fast', (0.01,) * 30)),
+            threading.Thread(target=poll, args=('slow', (0.1, 0.1))),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(durations['slow'], 0.2)
+        slow_searches = [ids for ids in self.searches if 'slow' in ids]
+        self.assertEqual(len(slow_searches), 3)
+
+    def test_search_error(self):
+        """Assert tasks are looked up one by one if a search fails."""
+        self.add_task('a')
+        self.session.post.side_effect = requests.exceptions.ConnectionError
+        hrefs = [
+            task['_href'] for task
+            in api.poll_task(_get_config(), '/tasks/a/', batch=True)
+        ]
+        self.assertEqual(hrefs, ['/tasks/a/'])
+        self.assertEqual(self.gets, ['a'])
+
+    def test_search_and_get_error(self):
+        """Assert a task fails if neither a search nor a lookup finds it."""
+        self.session.post.side_effect = requests.exceptions.ConnectionError
+        with self.assertRaises(requests.exceptions.HTTPError):
+            tuple(api.poll_task(_get_config(), '/tasks/a/', batch=True))
@@ -0,0 +1,151 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.async_api`.
+
+:mod:`pulp_smash.async_api` requires Python 3.6 or newer, so these tests are
+skipped on older versions of Python. For the same reason, this module doesn't
+use the ``async`` and ``await`` keywords itself.
+"""
+import asyncio
+import sys
+import unittest
+from unittest import mock
+
+if sys.version_info < (3, 6):
+    raise unittest.SkipTest('pulp_smash.async_api requires Python 3.6.')
+
+# pylint:disable=wrong-import-position
+from pulp_smash import api, async_api, exceptions  # noqa:E402
+
+from .test_api import _get_config, _mock_task_session, _task  # noqa:E402
+
+
+def _run(coro):
+    """Run ``coro`` in a new event loop, and return its result."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _collect(agen):
+    """Run ``agen`` in a new event loop, and return what it yields."""
+    loop = asyncio.new_event_loop()
+    items = []
+    try:
+        while True:
+            try:
+                items.append(loop.run_until_complete(agen.__anext__()))
+            except StopAsyncIteration:
+                return items
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+class ClientTestCase(unittest.TestCase):
+    """Tests for :class:`pulp_smash.async_api.Client`."""
+
+    def setUp(self):
+        """Start each test with an empty session cache."""
+        api.close_sessions()
+        self.addCleanup(api.close_sessions)
+        self.cfg = _get_config()
+
+    def test_methods(self):
+        """Assert each HTTP method is a coroutine sending that method."""
+        client = async_api.Client(self.cfg, api.echo_handler)
+        session = api.get_session(self.cfg)
+        for method in ('delete', 'get', 'head', 'options', 'patch', 'post',
+                       'put'):
+            with self.subTest(method=method):
+                with mock.patch.object(session, 'request') as request:
+                    response = _run(getattr(client, method)('/foo/'))
+                self.assertIs(response, request.return_value)
+                self.assertEqual(request.call_args[0], (method.upper(),))
+                self.assertEqual(
+                    request.call_args[1]['url'], 'http://example.com/foo/')
+
+    def test_json(self):
+        """Assert ``json`` is sent by post, put and patch, if given."""
+        client = async_api.Client(self.cfg, api.echo_handler)
+        session = api.get_session(self.cfg)
+        for method in ('patch', 'post', 'put'):
+            with self.subTest(method=method):
+                with mock.patch.object(session, 'request') as request:
+                    _run(getattr(client, method)('/foo/', None))
+                self.assertIsNone(request.call_args[1]['json'])
+
+    def test_request_kwargs(self):
+        """Assert ``request_kwargs`` are shared with the wrapped client."""
+        client = async_api.Client(self.cfg, api.echo_handler)
+        client.request_kwargs['verify'] = 'my.crt'
+        session = api.get_session(self.cfg)
+        with mock.patch.object(session, 'request') as request:
+            _run(client.get('/foo/'))
+        self.assertEqual(request.call_args[1]['verify'], 'my.crt')
+
+    def test_default_handler(self):
+        """Assert the default response handler is ``safe_handler``."""
+        client = async_api.Client(self.cfg)
+        self.assertIs(client.response_handler, async_api.safe_handler)
+
+    def test_async_handler(self):
+        """Assert awaitable results of response handlers are awaited."""
+        def handler(server_config, response):  # noqa pylint:disable=unused-argument
+            """Return a future, resolved with a marker."""
+            future = asyncio.Future()
+            future.set_result('handled')
+            return future
+
+        client = async_api.Client(self.cfg, handler)
+        with mock.patch.object(api.get_session(self.cfg), 'request'):
+            self.assertEqual(_run(client.get('/foo/')), 'handled')
+
+    def test_json_handler(self):
+        """Assert ``json_handler`` waits for spawned tasks."""
+        response = mock.Mock(status_code=202)
+        response.headers = {'Content-Type': 'application/json'}
+        response.json.return_value = {
+            'error': None,
+            'spawned_tasks': [{'_href': '/a/'}],
+        }
+        task = _task('/a/')
+        task.update({'error': None, 'exception': None, 'traceback': None})
+        with mock.patch.object(api, 'get_session') as get_session:
+            get_session.return_value = _mock_task_session({'/a/': task})
+            body = _run(async_api.json_handler(self.cfg, response))
+        self.assertIs(body, response.json.return_value)
+        self.assertEqual(get_session.return_value.get.call_count, 1)
+
+
+class PollSpawnedTasksTestCase(unittest.TestCase):
+    """Tests for :func:`pulp_smash.async_api.poll_spawned_tasks`."""
+
+    @staticmethod
+    def poll(tasks, call_report, **kwargs):
+        """Return the hrefs of tasks yielded while polling ``call_report``."""
+        with mock.patch.object(api, 'get_session') as get_session:
+            get_session.return_value = _mock_task_session(tasks)
+            return [
+                task['_href'] for task in _collect(
+                    async_api.poll_spawned_tasks(
+                        _get_config(), call_report, **kwargs))
+            ]
+
+    def test_order(self):
+        """Assert tasks are yielded parent first, then children in order."""
+        tasks = {
+            '/a/': _task('/a/', spawned=('/b/',)),
+            '/b/': _task('/b/'),
+            '/c/': _task('/c/'),
+        }
+        call_report = {'spawned_tasks': [{'_href': '/a/'}, {'_href': '/c/'}]}
+        self.assertEqual(self.poll(tasks, call_report), ['/a/', '/b/', '/c/'])
+
+    def test_timeout(self):
+        """Assert an exhausted schedule raises ``TaskTimedOutError``."""
+        tasks = {'/a/': _task('/a/', state='running')}
+        call_report = {'spawned_tasks': [{'_href': '/a/'}]}
+        with self.assertRaises(exceptions.TaskTimedOutError):
+            self.poll(tasks, call_report, schedule=(0,))
@@ -0,0 +1,190 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.cassette`."""
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+import requests
+
+from pulp_smash import api, cassette, config, utils
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Answer requests like a very small Pulp would."""
+
+    def do_GET(self):  # pylint:disable=invalid-name
+        """Return a task, which finishes after three polls, or bytes."""
+        if self.path == '/task/':
+            self.server.polls += 1
+            state = 'finished' if self.server.polls >= 3 else 'running'
+            self.reply(json.dumps({
+                '_href': '/task/',
+                'spawned_tasks': [],
+                'state': state,
+                'task_id': 'task',
+            }).encode('utf-8'))
+        elif self.path == '/bytes/':
+            self.reply(bytes(range(256)), 'application/octet-stream')
+        else:
+            self.send_error(404)
+
+    def do_POST(self):  # pylint:disable=invalid-name
+        """Return the request body."""
+        length = int(self.headers['Content-Length'])
+        self.reply(self.rfile.read(length))
+
+    def reply(self, body, content_type='application/json'):
+        """Send a response with ``body``."""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+        """Don't log requests."""
+
+
+class BaseCassetteTestCase(unittest.TestCase):
+    """Serve requests, and provide a path for a cassette."""
+
+    def setUp(self):
+        """Start a server, and forget any cassette in use."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cassette')
+        self.server = HTTPServer(('127.0.0.1', 0), _RequestHandler)
+        self.server.polls = 0
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = 'http://127.0.0.1:{}/'.format(
+            self.server.server_address[1])
+        for cleanup in (api.close_sessions, cassette.close):
+            cleanup()
+            self.addCleanup(cleanup)
+
+    def get_session(self, mode):
+        """Return a session which records or replays with a cassette."""
+        session = requests.Session()
+        self.addCleanup(session.close)
+        adapter = cassette.CassetteAdapter(self.path, mode)
+        session.mount('http://', adapter)
+        return session, adapter
+
+
+class CassetteAdapterTestCase(BaseCassetteTestCase):
+    """Test :class:`pulp_smash.cassette.CassetteAdapter`."""
+
+    def test_record_replay(self):
+        """Assert recorded responses are replayed, without a server."""
+        session, adapter = self.get_session('record')
+        expected = [
+            session.post(self.base_url + 'echo/', json={'a': 1}),
+            session.post(self.base_url + 'echo/', json={'a': 2}),
+            session.get(self.base_url + 'bytes/'),
+            session.get(self.base_url + 'missing/'),
+        ]
+        adapter.save()
+        self.server.shutdown()
+
+        session, _ = self.get_session('replay')
+        actual = [
+            session.post(self.base_url + 'echo/', json={'a': 1}),
+            session.post(self.base_url + 'echo/', json={'a': 2}),
+            session.get(self.base_url + 'bytes/'),
+            session.get(self.base_url + 'missing/'),
+        ]
+        for response_a, response_b in zip(expected, actual):
+            with self.subTest(url=response_a.url):
+                self.assertEqual(
+                    response_a.status_code, response_b.status_code)
+                self.assertEqual(response_a.content, response_b.content)
+                self.assertEqual(
+                    response_a.headers['Content-Type'],
+                    response_b.headers['Content-Type'],
+                )
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            session.post(self.base_url + 'echo/', json={'a': 3})
+
+    def test_collapse_polls(self):
+        """Assert only the final state of a polled task is recorded."""
+        session, adapter = self.get_session('record')
+        states = [
+            session.get(self.base_url + 'task/').json()['state']
+            for _ in range(3)
+        ]
+        self.assertEqual(states, ['running', 'running', 'finished'])
+        adapter.save()
+
+        session, adapter = self.get_session('replay')
+        self.assertEqual(len(adapter.interactions), 1)
+        for _ in range(2):
+            response = session.get(self.base_url + 'task/')
+            self.assertEqual(response.json()['state'], 'finished')
+
+    def test_unknown_mode(self):
+        """Assert an unknown mode is rejected."""
+        with self.assertRaises(ValueError):
+            cassette.CassetteAdapter(self.path, 'rewind')
+
+
+class EnvironmentTestCase(BaseCassetteTestCase):
+    """Test recording and replaying through :mod:`pulp_smash.api`."""
+
+    def set_mode(self, mode):
+        """Use the cassette in ``mode``, as named by environment variables."""
+        cassette.close()
+        api.close_sessions()
+        patcher = mock.patch.dict(os.environ, {
+            'PULP_SMASH_CASSETTE': self.path,
+            'PULP_SMASH_CASSETTE_MODE': mode,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assertEqual(cassette.get_mode(), mode)
+
+    def run_tests(self, schedule=None):
+        """Do what a test might do. Return what it gets."""
+        cfg = config.PulpSmashConfig(
+            pulp_auth=['admin', 'admin'],
+            systems=[config.PulpSystem(
+                hostname='127.0.0.1:{}'.format(self.server.server_address[1]),
+                roles={'api': {'scheme': 'http'}},
+            )],
+        )
+        repo_id = utils.uuid4()
+        client = api.Client(cfg, api.json_handler)
+        return (
+            repo_id,
+            client.post('echo/', {'id': repo_id}),
+            [task['state'] for task in api.poll_task(
+                cfg, '/task/', schedule=schedule)],
+            utils.http_get(self.base_url + 'bytes/'),
+        )
+
+    def test_record_replay(self):
+        """Assert a recording made through the API can be replayed."""
+        self.assertIsNone(cassette.get_mode())
+        self.set_mode('record')
+        expected = self.run_tests(api.PollSchedule(initial=0.2))
+        cassette.close()
+        self.server.shutdown()
+
+        self.set_mode('replay')
+        start = time.monotonic()
+        self.assertEqual(self.run_tests(), expected)
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertEqual(expected[2], ['finished'])
+
+    def test_no_cassette(self):
+        """Assert UUIDs are random if no cassette is in use."""
+        self.assertIsNone(cassette.get_adapter())
+        self.assertNotEqual(cassette.uuid4(), cassette.uuid4())
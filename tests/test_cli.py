@@ -1,6 +1,7 @@
 # coding=utf-8
 """Unit tests for :mod:`pulp_smash.cli`."""
 import socket
+import threading
 import unittest
 from unittest import mock
 
@@ -105,6 +106,84 @@ class CompletedProcessTestCase(unittest.TestCase):
         self.assertEqual(string, repr(eval(string)))
 
 
+class SshMachinePoolTestCase(unittest.TestCase):
+    """Tests for :class:`pulp_smash.cli.SshMachinePool`."""
+
+    def setUp(self):
+        """Patch out ``plumbum`` and create a pool."""
+        patcher = mock.patch('pulp_smash.cli.plumbum')
+        self.plumbum = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.plumbum.machines.SshMachine.side_effect = (
+            lambda *args, **kwargs: mock.Mock()
+        )
+        self.pool = cli.SshMachinePool()
+
+    def test_reuse(self):
+        """Assert one machine is created per hostname and user."""
+        hostname = utils.uuid4()
+        machine = self.pool.get(hostname)
+        self.assertIs(self.pool.get(hostname), machine)
+        self.assertIsNot(self.pool.get(hostname, 'root'), machine)
+        self.assertIsNot(self.pool.get(utils.uuid4()), machine)
+        self.assertEqual(len(self.pool), 3)
+        self.assertEqual(
+            self.plumbum.machines.SshMachine.call_args_list,
+            [
+                mock.call(hostname),
+                mock.call(hostname, user='root'),
+                mock.call(mock.ANY),
+            ],
+        )
+
+    def test_close(self):
+        """Assert ``close`` closes and drops every machine."""
+        machines = [self.pool.get(utils.uuid4()) for _ in range(2)]
+        self.pool.close()
+        self.assertEqual(len(self.pool), 0)
+        for machine in machines:
+            self.assertEqual(machine.close.call_count, 1)
+
+    def test_evict_idle(self):
+        """Assert machines unused for ``idle_timeout`` seconds are evicted."""
+        self.pool.idle_timeout = 10
+        with mock.patch.object(cli.time, 'monotonic', return_value=100):
+            old = self.pool.get(utils.uuid4())
+        with mock.patch.object(cli.time, 'monotonic', return_value=105):
+            new = self.pool.get(utils.uuid4())
+        with mock.patch.object(cli.time, 'monotonic', return_value=111):
+            self.assertEqual(self.pool.evict_idle(), 1)
+        self.assertEqual(old.close.call_count, 1)
+        self.assertNotIn(old, self.pool)
+        self.assertIn(new, self.pool)
+
+    def test_checkout(self):
+        """Assert machines are not evicted while checked out."""
+        self.pool.idle_timeout = 10
+        hostname = utils.uuid4()
+        patcher = mock.patch.object(cli.time, 'monotonic')
+        monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+        monotonic.return_value = 100
+        with self.pool.checkout(hostname) as machine:
+            self.assertIs(self.pool.get(hostname), machine)
+            monotonic.return_value = 200
+            self.assertEqual(self.pool.evict_idle(), 0)
+        monotonic.return_value = 205
+        self.assertEqual(self.pool.evict_idle(), 0)
+        monotonic.return_value = 211
+        self.assertEqual(self.pool.evict_idle(), 1)
+        self.assertEqual(machine.close.call_count, 1)
+
+    def test_no_idle_timeout(self):
+        """Assert machines are never evicted if ``idle_timeout`` is None."""
+        self.pool.idle_timeout = None
+        with mock.patch.object(cli.time, 'monotonic', return_value=0):
+            machine = self.pool.get(utils.uuid4())
+        self.assertEqual(self.pool.evict_idle(), 0)
+        self.assertIn(machine, self.pool)
+
+
 class ClientTestCase(unittest.TestCase):
     """Tests for :class:`pulp_smash.cli.Client`."""
 
@@ -206,3 +285,144 @@ class ClientTestCase(unittest.TestCase):
                 cli.Client(cfg, pulp_system=cfg.systems[1]).machine, machine)
             plumbum.machines.SshMachine.assert_called_once_with(
                 cfg.systems[1].hostname)
+
+    def test_pooled_machine(self):
+        """Assert clients for one system share an SSH machine by default."""
+        cfg = config.PulpSmashConfig(systems=[
+            config.PulpSystem(
+                hostname=utils.uuid4(),
+                roles={
+                    'pulp cli': {},
+                    'shell': {'transport': 'ssh', 'user': 'root'},
+                }
+            )
+        ])
+        with mock.patch('pulp_smash.cli.plumbum') as plumbum:
+            plumbum.machines.SshMachine.side_effect = (
+                lambda *args, **kwargs: mock.Mock()
+            )
+            self.assertIs(cli.Client(cfg).machine, cli.Client(cfg).machine)
+            plumbum.machines.SshMachine.assert_called_once_with(
+                cfg.systems[0].hostname, user='root')
+            self.assertIsNot(
+                cli.Client(cfg, pooled=False).machine,
+                cli.Client(cfg).machine,
+            )
+
+    def test_evicted_machine(self):
+        """Assert a client replaces its machine if the pool evicted it."""
+        cfg = config.PulpSmashConfig(systems=[
+            config.PulpSystem(
+                hostname=utils.uuid4(),
+                roles={
+                    'pulp cli': {},
+                    'shell': {'transport': 'ssh'},
+                }
+            )
+        ])
+        with mock.patch('pulp_smash.cli.plumbum') as plumbum:
+            plumbum.machines.SshMachine.side_effect = (
+                lambda *args, **kwargs: mock.MagicMock()
+            )
+            client = cli.Client(cfg, cli.echo_handler)
+            old_machine = client.machine
+            cli.close_ssh_machines()
+            new_machine = cli.get_ssh_machine_pool().get(
+                cfg.systems[0].hostname)
+            new_machine.__getitem__.return_value.run.return_value = (
+                0, '', ''
+            )
+            client.run(('true',))
+            self.assertIs(client.machine, new_machine)
+            self.assertEqual(old_machine.close.call_count, 1)
+
+
+class GlobalServiceManagerTestCase(unittest.TestCase):
+    """Tests for :class:`pulp_smash.cli.GlobalServiceManager`."""
+
+    def setUp(self):
+        """Create a clustered deployment, and patch out clients."""
+        self.cfg = config.PulpSmashConfig(systems=[
+            config.PulpSystem(
+                hostname='db.example.com',
+                roles={'mongod': {}, 'shell': {}},
+            ),
+            config.PulpSystem(
+                hostname='broker.example.com',
+                roles={'amqp broker': {'service': 'qpidd'}, 'shell': {}},
+            ),
+            config.PulpSystem(
+                hostname='api.example.com',
+                roles={'api': {}, 'pulp workers': {}, 'shell': {}},
+            ),
+        ])
+        self.commands = []  # (hostname, command) pairs, in execution order.
+        self.barrier = None
+
+        def make_client(cfg, pulp_system):  # pylint:disable=unused-argument
+            """Return a client that records the commands it runs."""
+            def run(cmd):
+                """Record ``cmd``, and optionally wait for other threads."""
+                if self.barrier is not None:
+                    self.barrier.wait(timeout=5)
+                self.commands.append((pulp_system.hostname, cmd))
+                return cmd
+            return mock.Mock(run=run)
+
+        for patcher in (
+                mock.patch.object(cli, 'Client', side_effect=make_client),
+                mock.patch.object(cli, '_is_root', return_value=True),
+                mock.patch.dict(cli._SERVICE_MANAGERS, {  # noqa pylint:disable=protected-access
+                    system.hostname: 'systemd' for system in self.cfg.systems
+                }),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_serial(self):
+        """Assert systems are managed one after another by default."""
+        svc_mgr = cli.GlobalServiceManager(self.cfg)
+        result = svc_mgr.start(('httpd', 'mongod'))
+        self.assertEqual(set(result), {'db.example.com', 'api.example.com'})
+        self.assertEqual(self.commands, [
+            ('db.example.com', ('systemctl', 'start', 'mongod')),
+            ('api.example.com', ('systemctl', 'start', 'httpd')),
+        ])
+        self.assertEqual(set(svc_mgr.timings), set(result))
+
+    def test_parallel_start(self):
+        """Assert services are started stage by stage, in parallel."""
+        svc_mgr = cli.GlobalServiceManager(self.cfg, max_workers=3)
+        result = svc_mgr.start(('pulp_workers', 'httpd', 'qpidd', 'mongod'))
+        self.assertEqual(
+            [cmd[2:] for _, cmd in self.commands],
+            [('mongod',), ('qpidd',), ('httpd',), ('pulp_workers',)],
+        )
+        self.assertEqual(result, {
+            'db.example.com': (('systemctl', 'start', 'mongod'),),
+            'broker.example.com': (('systemctl', 'start', 'qpidd'),),
+            'api.example.com': (
+                ('systemctl', 'start', 'httpd'),
+                ('systemctl', 'start', 'pulp_workers'),
+            ),
+        })
+        self.assertEqual(set(svc_mgr.timings), set(result))
+
+    def test_parallel_stop(self):
+        """Assert services are stopped in the reverse order."""
+        cli.GlobalServiceManager(self.cfg, max_workers=3).stop(
+            ('pulp_workers', 'httpd', 'qpidd', 'mongod'))
+        self.assertEqual(
+            [cmd[2:] for _, cmd in self.commands],
+            [('pulp_workers',), ('httpd',), ('qpidd',), ('mongod',)],
+        )
+
+    def test_concurrency(self):
+        """Assert systems in the same stage are managed at the same time."""
+        self.barrier = threading.Barrier(3)
+        result = cli.GlobalServiceManager(
+            self.cfg,
+            max_workers=3,
+            stages=(),
+        ).restart(('httpd', 'qpidd', 'mongod'))
+        self.assertEqual(len(result), 3)
@@ -1,10 +1,12 @@
 # coding=utf-8
 """Unit tests for :mod:`pulp_smash.config`."""
 import builtins
+import copy
 import itertools
 import json
 import os
 import random
+import timeit
 import unittest
 from unittest import mock
 
@@ -44,7 +46,8 @@ PULP_SMASH_CONFIG = """
                 "squid": {}
             }
         }
-    ]
+    ],
+    "task_polling": {"initial": 0.1, "maximum": 2}
 }
 """
 
@@ -93,6 +96,7 @@ def _gen_attrs():
                 }
             )
         ],
+        'task_polling': {'initial': random.uniform(0.01, 1)},
     }
 
 
@@ -113,6 +117,95 @@ class GetConfigTestCase(unittest.TestCase):
                 config.get_config()
         self.assertEqual(read.call_count, 1)
 
+    def test_shared(self):
+        """Assert the same read-only object is returned on every call."""
+        cfg = config.PulpSmashConfig(**_gen_attrs())
+        with mock.patch.object(config, '_CONFIG', None):
+            with mock.patch.object(config.PulpSmashConfig, 'read') as read:
+                read.return_value = cfg
+                self.assertIs(config.get_config(), config.get_config())
+        self.assertTrue(cfg._frozen)  # pylint:disable=protected-access
+
+
+class GetConfigBenchmarkTestCase(unittest.TestCase):
+    """Compare the per-call cost of :func:`pulp_smash.config.get_config`.
+
+    ``get_config`` used to return ``deepcopy(_CONFIG)``. It now returns a
+    shared, read-only object. Measure both approaches.
+    """
+
+    def test_benchmark(self):
+        """Assert sharing a config is much cheaper than deep-copying it."""
+        attrs = _gen_attrs()
+        number = 1000
+        # Deep-copy a mutable config, as PulpSmashConfig did before it defined
+        # __deepcopy__, rather than through the new copy() method.
+        cfg = config.PulpSmashConfig(**attrs)
+        with mock.patch.object(config.PulpSmashConfig, '__deepcopy__', None):
+            before = timeit.timeit(
+                lambda: copy.deepcopy(cfg),
+                number=number,
+            ) / number
+        cfg = config.PulpSmashConfig(**attrs).freeze()
+        with mock.patch.object(config, '_CONFIG', cfg):
+            after = timeit.timeit(config.get_config, number=number) / number
+        self.assertLess(
+            after * 10,
+            before,
+            'get_config() took {:.2e}s per call, and deepcopy() took {:.2e}s.'
+            .format(after, before),
+        )
+
+
+class FreezeTestCase(unittest.TestCase):
+    """Test :meth:`pulp_smash.config.PulpSmashConfig.freeze`."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate a config and freeze it."""
+        cls.attrs = _gen_attrs()
+        cls.cfg = config.PulpSmashConfig(**cls.attrs).freeze()
+
+    def test_setattr(self):
+        """Assert attributes cannot be set."""
+        with self.assertRaises(AttributeError):
+            self.cfg.pulp_auth = ['alice', 'hunter2']
+
+    def test_roles(self):
+        """Assert roles cannot be changed."""
+        with self.assertRaises(TypeError):
+            self.cfg.systems[0].roles['api']['verify'] = False
+
+    def test_values(self):
+        """Assert freezing preserves the values of attributes."""
+        self.assertEqual(
+            tuple(self.cfg.pulp_auth),
+            tuple(self.attrs['pulp_auth']),
+        )
+        self.assertEqual(self.cfg.systems[0], self.attrs['systems'][0])
+        self.assertEqual(self.cfg.get_requests_kwargs(), {
+            'auth': tuple(self.attrs['pulp_auth']),
+            'verify': True,
+        })
+
+    def test_copy(self):
+        """Assert copies are modifiable, and do not affect the original."""
+        cfg = self.cfg.copy()
+        cfg.systems[0].roles['api']['verify'] = False
+        self.assertTrue(self.cfg.systems[0].roles['api']['verify'])
+
+    def test_deepcopy(self):
+        """Assert ``copy.deepcopy`` returns a modifiable copy."""
+        cfg = copy.deepcopy(self.cfg)
+        cfg.pulp_auth = ['alice', 'hunter2']
+        self.assertEqual(cfg.systems, self.attrs['systems'])
+
+    def test_repr(self):
+        """Assert the representation can still be evaluated."""
+        from pulp_smash.config import PulpSmashConfig, PulpSystem  # noqa pylint:disable=unused-variable
+        cfg = eval(repr(self.cfg))  # pylint:disable=eval-used
+        self.assertEqual(cfg.systems, self.attrs['systems'])
+
 
 class ConvertOldConfigTestCase(unittest.TestCase):
     """Test :func:`pulp_smash.config.convert_old_config`."""
@@ -183,6 +276,39 @@ class ValidateConfigTestCase(unittest.TestCase):
         )
 
 
+class ValidateConfigsTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.config.validate_configs`."""
+
+    def test_validate_configs(self):
+        """Assert each file is validated, and problems are collected."""
+        contents = {
+            'valid.json': PULP_SMASH_CONFIG,
+            'invalid.json': PULP_SMASH_CONFIG.replace('"auth"', '"oops"'),
+            'old.json': OLD_CONFIG,
+            'garbage.json': '{',
+        }
+
+        def open_(path, *args, **kwargs):
+            """Return a mock file with the contents of ``path``."""
+            return mock.mock_open(read_data=contents[path])(
+                path, *args, **kwargs)
+
+        with mock.patch.object(builtins, 'open', open_):
+            results = config.validate_configs(sorted(contents))
+        self.assertEqual(results['valid.json'], [])
+        for path in ('invalid.json', 'old.json', 'garbage.json'):
+            with self.subTest(path=path):
+                self.assertGreater(len(results[path]), 0)
+
+    def test_validator_cached(self):
+        """Assert the schema validator is built only once."""
+        with mock.patch.object(config, '_VALIDATOR', None):
+            # pylint:disable=protected-access
+            validator = config._get_validator()
+            config.validate_config(json.loads(PULP_SMASH_CONFIG))
+            self.assertIs(config._get_validator(), validator)
+
+
 class InitTestCase(unittest.TestCase):
     """Test :class:`pulp_smash.config.PulpSmashConfig` instantiation."""
 
@@ -239,6 +365,8 @@ class ReadTestCase(unittest.TestCase):
             self.assertEqual(cfg.pulp_auth, ['username', 'password'])
         with self.subTest('check pulp_version'):
             self.assertEqual(cfg.pulp_version, config.Version('2.12.1'))
+        with self.subTest('check task_polling'):
+            self.assertEqual(cfg.task_polling, {'initial': 0.1, 'maximum': 2})
         with self.subTest('check systems'):
             self.assertEqual(
                 sorted(cfg.systems),
@@ -391,6 +519,16 @@ class GetRequestsKwargsTestCase(unittest.TestCase):
             }
         )
 
+    def test_pool_options(self):
+        """Assert that connection pool options are not returned."""
+        system = self.cfg.systems[0]
+        system = system._replace(roles=dict(system.roles, api=dict(
+            system.roles['api'], pool_size=5, keep_alive=False)))
+        self.assertEqual(
+            self.cfg.get_requests_kwargs(system),
+            {'auth': tuple(self.attrs['pulp_auth']), 'verify': True},
+        )
+
     def test_cfg_auth(self):
         """Assert that the method does not alter the config's ``auth``."""
         # _gen_attrs() returns ``auth`` as a list.
@@ -0,0 +1,279 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.fake_pulp`.
+
+These tests also show that :mod:`pulp_smash.api` and :mod:`pulp_smash.utils`
+work with something like a real Pulp.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+from pulp_smash import api, config, exceptions, fake_pulp, utils
+from pulp_smash.constants import (
+    CONSUMERS_PATH,
+    ORPHANS_PATH,
+    REPOSITORY_PATH,
+    USER_PATH,
+)
+
+
+class BaseFakePulpTestCase(unittest.TestCase):
+    """Run a fake Pulp, and provide a config targeting it."""
+
+    server_kwargs = {}
+
+    def setUp(self):
+        """Start a fake Pulp in a thread."""
+        self.server = fake_pulp.FakePulpServer(
+            '127.0.0.1', 0, **self.server_kwargs)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(api.close_sessions)
+        self.cfg = config.PulpSmashConfig(
+            pulp_auth=['admin', 'admin'],
+            systems=[config.PulpSystem(
+                hostname=self.server.hostname,
+                roles={'api': {'scheme': 'http'}},
+            )],
+            task_polling={'initial': 0.01, 'maximum': 0.05, 'timeout': 10},
+        )
+        self.client = api.Client(self.cfg, api.json_handler)
+
+    def create_repo(self, **kwargs):
+        """Create a repository, and return it."""
+        body = {
+            'distributors': [{
+                'distributor_id': 'dist',
+                'distributor_type_id': 'yum_distributor',
+            }],
+            'id': utils.uuid4(),
+            'importer_config': {'feed': 'http://example.com/'},
+            'importer_type_id': 'yum_importer',
+        }
+        body.update(kwargs)
+        return self.client.post(REPOSITORY_PATH, body)
+
+
+class RepositoryTestCase(BaseFakePulpTestCase):
+    """Test repositories, uploads and searches."""
+
+    def test_crud(self):
+        """Create, read, update and delete a repository."""
+        client = api.Client(self.cfg, api.echo_handler)
+        response = client.post(REPOSITORY_PATH, {'id': 'foo'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            client.post(REPOSITORY_PATH, {'id': 'foo'}).status_code, 409)
+        href = response.json()['_href']
+        response = client.put(href, {'delta': {'notes': {'a': 'b'}}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result']['notes'], {'a': 'b'})
+        self.assertEqual(client.get(href).json()['id'], 'foo')
+        self.assertEqual(client.delete(href).status_code, 202)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            api.Client(self.cfg).get(href)
+
+    def test_sync_publish(self):
+        """Sync and publish a repository, and wait for the tasks."""
+        repo = self.create_repo()
+        utils.sync_repo(self.cfg, repo)
+        utils.publish_repo(self.cfg, repo)
+        repo = self.client.get(repo['_href'])
+        self.assertIsNotNone(repo['importers'][0]['last_sync'])
+        self.assertIsNotNone(repo['distributors'][0]['last_publish'])
+
+    def test_upload_search_copy(self):
+        """Upload units, search for them, copy them and remove them."""
+        repo = self.create_repo()
+        for unit in (b'a' * 1000, b'b' * 10):
+            utils.upload_import_unit(
+                self.cfg, unit, {'unit_type_id': 'rpm'}, repo,
+                chunk_size=100, max_workers=4)
+        utils.upload_import_erratum(self.cfg, {'id': 'RHEA-1'}, repo['_href'])
+        units = utils.search_units(self.cfg, repo)
+        self.assertEqual(
+            sorted(unit['metadata'].get('size') for unit in units),
+            [0, 10, 1000],
+        )
+        self.assertEqual(
+            len(utils.search_units(self.cfg, repo, {'type_ids': ['rpm']})), 2)
+
+        other = self.create_repo()
+        self.client.post(urljoin(other['_href'], 'actions/associate/'), {
+            'source_repo_id': repo['id'],
+            'criteria': {'type_ids': ['erratum']},
+        })
+        self.assertEqual(
+            self.client.get(other['_href'])['content_unit_counts'],
+            {'erratum': 1},
+        )
+        self.client.post(urljoin(repo['_href'], 'actions/unassociate/'), {
+            'criteria': {'type_ids': ['rpm']},
+        })
+        self.assertEqual(self.client.get(ORPHANS_PATH)['rpm']['count'], 2)
+        self.client.delete(ORPHANS_PATH)
+        self.assertEqual(self.client.get(ORPHANS_PATH), {})
+
+
+class ResourceTestCase(BaseFakePulpTestCase):
+    """Test users and consumers."""
+
+    def test_users(self):
+        """Create many users at once, then delete them."""
+        logins = ['user{}'.format(i) for i in range(20)]
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            users = list(executor.map(
+                lambda login: self.client.post(USER_PATH, {'login': login}),
+                logins,
+            ))
+        self.assertEqual([user['login'] for user in users], logins)
+        self.assertEqual(len(self.client.get(USER_PATH)), 20)
+        for user in users:
+            self.client.delete(user['_href'])
+        self.assertEqual(self.client.get(USER_PATH), [])
+
+    def test_consumers(self):
+        """Register and unregister a consumer."""
+        response = self.client.post(CONSUMERS_PATH, {'id': 'foo'})
+        self.assertIn('certificate', response)
+        href = response['consumer']['_href']
+        self.assertEqual(self.client.get(href)['id'], 'foo')
+        self.client.delete(href)
+        self.assertEqual(self.client.get(CONSUMERS_PATH), [])
+
+
+class TaskLatencyTestCase(BaseFakePulpTestCase):
+    """Test that pollers wait for slow tasks."""
+
+    server_kwargs = {'task_latency': 0.2}
+
+    def test_poll(self):
+        """Assert tasks are waited for, with and without batching."""
+        for batch in (False, True):
+            with self.subTest(batch=batch):
+                self.cfg.task_polling['batch'] = batch
+                repo = self.create_repo()
+                start = time.monotonic()
+                call_report = utils.sync_repo(self.cfg, repo).json()
+                self.assertGreaterEqual(time.monotonic() - start, 0.2)
+                href = call_report['spawned_tasks'][0]['_href']
+                task = self.client.get(href)
+                self.assertEqual(task['state'], 'finished')
+
+    def test_timeout(self):
+        """Assert pollers give up on tasks that take too long."""
+        call_report = self.client.post(REPOSITORY_PATH, {'id': 'foo'})
+        call_report = api.Client(self.cfg, api.echo_handler).delete(
+            call_report['_href']).json()
+        with self.assertRaises(exceptions.TaskTimedOutError):
+            tuple(api.poll_spawned_tasks(
+                self.cfg,
+                call_report,
+                schedule=api.PollSchedule(timeout=0.05),
+            ))
+
+
+class ExitTestCase(BaseFakePulpTestCase):
+    """Test cleaning up when the interpreter exits."""
+
+    server_kwargs = {'task_latency': 0.2}
+
+    def test_teardown_collector(self):
+        """Assert queued deletions and orphan purges finish at exit.
+
+        Thread pools refuse new work while the interpreter shuts down, so the
+        tasks spawned by the deletions must still be polled somehow.
+        """
+        script = (
+            'import sys\n'
+            'from pulp_smash import api, config, utils\n'
+            'from pulp_smash.constants import REPOSITORY_PATH\n'
+            'cfg = config.PulpSmashConfig(\n'
+            '    pulp_auth=["admin", "admin"],\n'
+            '    systems=[config.PulpSystem(\n'
+            '        hostname=sys.argv[1],\n'
+            '        roles={"api": {"scheme": "http"}},\n'
+            '    )],\n'
+            '    task_polling={"initial": 0.01, "maximum": 0.05},\n'
+            ')\n'
+            'client = api.Client(cfg, api.json_handler)\n'
+            'repo = client.post(REPOSITORY_PATH, {"id": "foo"})\n'
+            'utils.get_teardown_collector().delete(cfg, repo["_href"])\n'
+            'utils.get_teardown_collector().purge_orphans(cfg)\n'
+        )
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+            os.path.dirname(os.path.abspath(api.__file__))))
+        process = subprocess.run(
+            (sys.executable, '-c', script, self.server.hostname),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            timeout=60,
+        )
+        stderr = process.stderr.decode()
+        self.assertEqual(process.returncode, 0, stderr)
+        self.assertNotIn('Cannot delete', stderr)
+        self.assertEqual(self.client.get(REPOSITORY_PATH), [])
+        tags = [task['tags'] for task in self.server.pulp.tasks.values()]
+        self.assertIn(['pulp:action:delete_orphans'], tags)
+
+
+class TaskRetentionTestCase(BaseFakePulpTestCase):
+    """Test that finished tasks are forgotten."""
+
+    server_kwargs = {'task_retention': 0.1}
+
+    def test_prune(self):
+        """Assert tasks are pruned only after the retention period."""
+        repo = self.create_repo()
+        call_report = utils.sync_repo(self.cfg, repo).json()
+        href = call_report['spawned_tasks'][0]['_href']
+        utils.sync_repo(self.cfg, repo)
+        self.assertEqual(len(self.server.pulp.tasks), 2)
+        self.assertEqual(self.client.get(href)['state'], 'finished')
+        time.sleep(0.2)
+        utils.sync_repo(self.cfg, repo)
+        self.assertEqual(len(self.server.pulp.tasks), 1)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.client.get(href)
+
+
+class FailureInjectionTestCase(BaseFakePulpTestCase):
+    """Test that injected failures are reported, or retried."""
+
+    server_kwargs = {'seed': 0, 'task_failure_rate': 1}
+
+    def test_task_failure(self):
+        """Assert failed tasks raise ``TaskReportError``."""
+        repo = self.create_repo()
+        with self.assertRaises(exceptions.TaskReportError):
+            utils.sync_repo(self.cfg, repo)
+
+    def test_request_failure(self):
+        """Assert failed chunk uploads are retried."""
+        self.server.pulp.task_failure_rate = 0
+        repo = self.create_repo()
+        self.server.pulp.request_failure_rate = 0.2
+        stats = utils.UploadStats()
+        for _ in range(10):
+            try:
+                utils.upload_import_unit(
+                    self.cfg, b'a' * 1000, {'unit_type_id': 'rpm'}, repo,
+                    chunk_size=10, retries=10, stats=stats)
+            except requests.exceptions.HTTPError:
+                continue  # Requests other than chunk uploads aren't retried.
+            break
+        self.server.pulp.request_failure_rate = 0
+        self.assertGreater(stats.retries, 0)
+        self.assertEqual(
+            self.client.get(repo['_href'])['content_unit_counts'], {'rpm': 1})
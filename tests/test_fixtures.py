@@ -0,0 +1,125 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.fixtures`."""
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+from pulp_smash import fixtures
+
+# It makes sense for unit tests to access otherwise private data.
+# pylint:disable=protected-access
+
+_INDEX = """
+<html><body><h1>Index of /pulp/fixtures/rpm/</h1>
+<a href="?C=N;O=D">Name</a>
+<a href="/pulp/fixtures/">Parent Directory</a>
+<a href="../">Parent Directory</a>
+<a href="repodata/">repodata/</a>
+<a href="bear-4.1-1.noarch.rpm">bear-4.1-1.noarch.rpm</a>
+<a href="http://example.org/elsewhere/">Elsewhere</a>
+<a name="no-href">Nothing</a>
+</body></html>
+"""
+
+
+class ParseIndexTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.fixtures.parse_index`."""
+
+    def test_parse(self):
+        """Assert only links into the directory are returned."""
+        base_url = 'http://example.com/pulp/fixtures/rpm/'
+        self.assertEqual(fixtures.parse_index(base_url, _INDEX), [
+            base_url + 'bear-4.1-1.noarch.rpm',
+            base_url + 'repodata/',
+        ])
+
+
+class GetLocalPathTestCase(unittest.TestCase):
+    """Test ``pulp_smash.fixtures._get_local_path``."""
+
+    def test_paths(self):
+        """Assert URLs map to paths below the destination directory."""
+        base_url = 'http://example.com/fixtures/'
+        for url, path in (
+                (base_url + 'rpm/bear.rpm', '/dest/rpm/bear.rpm'),
+                (base_url + 'a%20b/c', '/dest/a b/c'),
+                (base_url + '../../etc/passwd', '/dest/etc/passwd'),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    fixtures._get_local_path('/dest', base_url, url),
+                    path,
+                )
+
+
+class MirrorTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.fixtures.mirror` and the fixtures server."""
+
+    def setUp(self):
+        """Serve a small tree of fixtures."""
+        source = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        destination = tempfile.TemporaryDirectory()
+        self.addCleanup(destination.cleanup)
+        self.source = source.name
+        self.destination = destination.name
+        self.files = {
+            os.path.join('rpm', 'bear.rpm'): b'bear',
+            os.path.join('rpm', 'repodata', 'repomd.xml'): b'<repomd/>',
+            os.path.join('file', '1.iso'): os.urandom(3 * 1024 * 1024),
+        }
+        for path, contents in self.files.items():
+            path = os.path.join(self.source, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as handle:
+                handle.write(contents)
+
+        server = fixtures.FixturesServer(self.source, '127.0.0.1', 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = server.base_url
+
+    def test_mirror(self):
+        """Assert the whole tree is mirrored, and not downloaded twice."""
+        downloaded = fixtures.mirror(self.destination, self.base_url)
+        self.assertEqual(downloaded, sorted(
+            os.path.join(self.destination, path) for path in self.files
+        ))
+        for path, contents in self.files.items():
+            with self.subTest(path=path):
+                with open(os.path.join(self.destination, path), 'rb') as file_:
+                    self.assertEqual(file_.read(), contents)
+        self.assertEqual(fixtures.mirror(self.destination, self.base_url), [])
+        downloaded = fixtures.mirror(
+            self.destination, self.base_url, refresh=True)
+        self.assertEqual(len(downloaded), len(self.files))
+
+    def test_paths(self):
+        """Assert only the given paths are mirrored."""
+        downloaded = fixtures.mirror(
+            self.destination,
+            self.base_url,
+            paths=('rpm/repodata/', 'file/1.iso'),
+        )
+        self.assertEqual(downloaded, [
+            os.path.join(self.destination, 'file', '1.iso'),
+            os.path.join(self.destination, 'rpm', 'repodata', 'repomd.xml'),
+        ])
+
+    def test_stalled_host(self):
+        """Assert a host that never responds makes the mirror fail."""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(1)  # accept no connection, and send nothing
+            base_url = 'http://127.0.0.1:{}/'.format(sock.getsockname()[1])
+            with mock.patch.object(fixtures, '_TIMEOUT', 0.1):
+                with self.assertRaises(requests.exceptions.Timeout):
+                    fixtures.mirror(self.destination, base_url)
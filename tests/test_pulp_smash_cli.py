@@ -5,8 +5,10 @@ import os
 import unittest
 from unittest import mock
 
+import requests
 from click.testing import CliRunner
-from pulp_smash import config, exceptions, pulp_smash_cli
+from packaging.version import Version
+from pulp_smash import config, exceptions, pulp_smash_cli, selectors
 
 from .test_config import OLD_CONFIG, PULP_SMASH_CONFIG
 
@@ -320,3 +322,113 @@ class SettingsValidateTestCase(
                 ),
                 result.output,
             )
+
+    def test_many_config_files(self):
+        """Ensure validate checks each of the settings files it is given."""
+        with self.cli_runner.isolated_filesystem():
+            with open('valid.json', 'w') as handler:
+                handler.write(PULP_SMASH_CONFIG)
+            with open('invalid.json', 'w') as handler:
+                handler.write(PULP_SMASH_CONFIG.replace('"auth"', '"oops"'))
+            result = self.cli_runner.invoke(
+                pulp_smash_cli.settings,
+                ['validate', 'valid.json', 'invalid.json'],
+            )
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('valid.json: valid', result.output)
+        self.assertIn('invalid.json: invalid', result.output)
+        self.assertIn('1 of 2 settings files are invalid', result.output)
+
+
+class BugsRefreshTestCase(BasePulpSmashCliTestCase):
+    """Test ``pulp_smash.pulp_smash_cli.bugs_refresh`` command."""
+
+    def test_refresh(self):
+        """Ensure refresh fetches the given bugs and prints their statuses."""
+        with mock.patch.object(selectors, 'refresh_bug_cache') as refresh:
+            refresh.return_value = {
+                2: selectors._Bug('NEW', Version('0')),  # noqa pylint:disable=protected-access
+                1: selectors._Bug('VERIFIED', Version('2.8')),  # noqa pylint:disable=protected-access
+            }
+            result = self.cli_runner.invoke(
+                pulp_smash_cli.bugs, ['refresh', '1', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output, '1: VERIFIED\n2: NEW\n')
+        refresh.assert_called_once_with((1, 2))
+
+    def test_refresh_all(self):
+        """Ensure refresh defaults to every cached bug."""
+        with mock.patch.object(selectors, 'refresh_bug_cache') as refresh:
+            refresh.return_value = {}
+            result = self.cli_runner.invoke(pulp_smash_cli.bugs, ['refresh'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        refresh.assert_called_once_with(None)
+
+    def test_refresh_error(self):
+        """Ensure refresh fails if the bug tracker can't be reached."""
+        with mock.patch.object(selectors, 'refresh_bug_cache') as refresh:
+            refresh.side_effect = requests.exceptions.ConnectionError('oops')
+            result = self.cli_runner.invoke(pulp_smash_cli.bugs, ['refresh'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('unable to refresh the bug cache: oops', result.output)
+
+
+class FixturesMirrorTestCase(BasePulpSmashCliTestCase):
+    """Test ``pulp_smash.pulp_smash_cli.fixtures_mirror`` command."""
+
+    def test_mirror(self):
+        """Ensure mirror passes its options on and reports the result."""
+        with mock.patch.object(pulp_smash_cli, 'mirror') as mirror:
+            mirror.return_value = ['dest/a', 'dest/b']
+            result = self.cli_runner.invoke(pulp_smash_cli.fixtures, [
+                'mirror',
+                'dest',
+                '--base-url', 'http://example.com/',
+                '--path', 'rpm/',
+                '--path', 'file/',
+            ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output, 'Downloaded 2 files into dest.\n')
+        mirror.assert_called_once_with(
+            'dest', 'http://example.com/', ('rpm/', 'file/'), False)
+
+    def test_mirror_error(self):
+        """Ensure mirror fails if the fixtures can't be downloaded."""
+        with mock.patch.object(pulp_smash_cli, 'mirror') as mirror:
+            mirror.side_effect = requests.exceptions.HTTPError('oops')
+            result = self.cli_runner.invoke(
+                pulp_smash_cli.fixtures, ['mirror', 'dest'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('unable to mirror the fixtures: oops', result.output)
+        mirror.assert_called_once_with(
+            'dest', pulp_smash_cli.PULP_FIXTURES_BASE_URL, None, False)
+
+
+class FakePulpTestCase(BasePulpSmashCliTestCase):
+    """Test ``pulp_smash.pulp_smash_cli.fake_pulp`` command."""
+
+    def test_fake_pulp(self):
+        """Ensure fake-pulp passes its options on, and serves until stopped."""
+        with mock.patch.object(pulp_smash_cli, 'FakePulpServer') as server:
+            server.return_value.base_url = 'http://127.0.0.1:9000/'
+            server.return_value.hostname = '127.0.0.1:9000'
+            server.return_value.serve_forever.side_effect = KeyboardInterrupt
+            result = self.cli_runner.invoke(pulp_smash_cli.pulp_smash, [
+                'fake-pulp',
+                '--port', '9000',
+                '--task-latency', '0.5',
+                '--task-failure-rate', '0.1',
+                '--seed', '1',
+                '--task-retention', '60',
+            ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('http://127.0.0.1:9000/', result.output)
+        server.assert_called_once_with(
+            '127.0.0.1', 9000, 0.5, 0.1, 0.0, 1, 60.0, verbose=True)
+        server.return_value.server_close.assert_called_once_with()
+
+    def test_invalid_rate(self):
+        """Ensure fake-pulp rejects failure rates greater than one."""
+        result = self.cli_runner.invoke(pulp_smash_cli.pulp_smash, [
+            'fake-pulp', '--request-failure-rate', '2'])
+        self.assertNotEqual(result.exit_code, 0)
@@ -0,0 +1,489 @@
+# coding=utf-8
+"""Unit tests for :mod:`pulp_smash.runner`."""
+import importlib
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+from pulp_smash import cli, runner, utils
+
+# It makes sense for unit tests to access otherwise private data.
+# pylint:disable=protected-access
+
+_PACKAGE = 'pulp_smash_runner_fixtures'
+
+# Each test records when it starts and stops running, so that tests can check
+# which modules ran at the same time.
+_MODULE_TEMPLATE = """
+import os
+import time
+import unittest
+
+RESOURCE_LOCKS = {locks!r}
+
+
+class {name}TestCase(unittest.TestCase):
+
+    def test_record(self):
+        with open(os.environ['RUNNER_LOG'], 'a') as handle:
+            handle.write('start {name}\\n')
+        time.sleep(0.3)
+        with open(os.environ['RUNNER_LOG'], 'a') as handle:
+            handle.write('stop {name}\\n')
+{extra}
+"""
+
+
+class GetResourceLocksTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.runner.get_resource_locks`."""
+
+    def test_declared(self):
+        """Assert locks declared with ``RESOURCE_LOCKS`` are returned."""
+        source = "RESOURCE_LOCKS = ('squid', 'selinux')\n"
+        self.assertEqual(
+            runner._get_resource_locks_from_source(source),
+            {'squid', 'selinux'},
+        )
+
+    def test_markers(self):
+        """Assert modules using global state markers get the exclusive lock."""
+        for source in (
+                'utils.reset_pulp(cfg)\n',
+                'from pulp_smash.utils import reset_squid\n',
+                'cli.GlobalServiceManager(cfg).restart(PULP_SERVICES)\n',
+                "client.run(('setenforce', '0'))\n",
+                "client.run('echo PULP_CONCURRENCY=1 >> {}')\n",
+                'self.addCleanup(client.delete, ORPHANS_PATH)\n',
+                'utils.purge_orphans(cfg)\n',
+        ):
+            with self.subTest(source=source):
+                self.assertEqual(
+                    runner._get_resource_locks_from_source(source),
+                    {runner.EXCLUSIVE_LOCK},
+                )
+
+    def test_no_markers(self):
+        """Assert modules merely mentioning markers in docstrings get none."""
+        source = (
+            '"""Unlike reset_pulp, do not reset Pulp."""\n'
+            'def test():\n'
+            '    """Do not call setenforce."""\n'
+            '    return 1\n'
+        )
+        self.assertEqual(runner._get_resource_locks_from_source(source), set())
+
+    def test_imported_helpers(self):
+        """Assert helpers imported from Pulp Smash are scanned for markers."""
+        source = (
+            'from pulp_smash.tests.rpm.api_v2.utils import (\n'
+            '    DisableSELinuxMixin as Mixin,\n'
+            ')\n'
+        )
+        self.assertEqual(
+            runner._get_resource_locks_from_source(source),
+            {runner.EXCLUSIVE_LOCK},
+        )
+        for source in (
+                'from pulp_smash.tests.rpm.api_v2.utils import gen_repo\n',
+                'from pulp_smash.tests.rpm.api_v2 import utils\n',
+                'from os.path import join\n',
+        ):
+            with self.subTest(source=source):
+                self.assertEqual(
+                    runner._get_resource_locks_from_source(source), set())
+
+    def test_tests_package(self):
+        """Assert locks are found for Pulp Smash's own tests."""
+        self.assertEqual(
+            runner.get_resource_locks(
+                'pulp_smash.tests.rpm.api_v2.test_broker'),
+            {runner.EXCLUSIVE_LOCK},
+        )
+        self.assertEqual(
+            runner.get_resource_locks(
+                'pulp_smash.tests.platform.api_v2.test_login'),
+            set(),
+        )
+
+
+class NextJobTestCase(unittest.TestCase):
+    """Test ``pulp_smash.runner._next_job``."""
+
+    def test_nothing_running(self):
+        """Assert the first job starts if nothing is running."""
+        pending = [('a', frozenset((runner.EXCLUSIVE_LOCK,))), ('b', set())]
+        self.assertEqual(runner._next_job(pending, ()), 0)
+
+    def test_exclusive(self):
+        """Assert exclusive jobs wait for, and block, every other job."""
+        pending = [('a', {runner.EXCLUSIVE_LOCK}), ('b', set())]
+        self.assertEqual(runner._next_job(pending, [set()]), 1)
+        self.assertIsNone(runner._next_job(pending, [{runner.EXCLUSIVE_LOCK}]))
+
+    def test_shared_lock(self):
+        """Assert jobs holding the same lock don't run at the same time."""
+        pending = [('a', {'squid'}), ('b', {'selinux'})]
+        self.assertEqual(runner._next_job(pending, [{'squid'}]), 1)
+        self.assertIsNone(runner._next_job(pending, [{'squid', 'selinux'}]))
+
+
+class WorkTestCase(unittest.TestCase):
+    """Test ``pulp_smash.runner._work``."""
+
+    def test_purge_orphans(self):
+        """Assert orphans are only purged before exclusive modules."""
+        tasks = queue.Queue()
+        for job in (('a', set()), ('b', {runner.EXCLUSIVE_LOCK}), None):
+            tasks.put(job)
+        collector = utils.TeardownCollector()
+        with mock.patch.object(runner, '_run_module') as run_module, \
+                mock.patch.object(utils, '_TEARDOWN_COLLECTOR', collector), \
+                mock.patch.object(collector, 'flush') as flush, \
+                mock.patch.object(utils, 'close_resource_pool'), \
+                mock.patch.object(utils, 'close_shared_repos'), \
+                mock.patch.object(utils, 'close_teardown_collector'), \
+                mock.patch.object(cli, 'close_ssh_machines'):
+            flush.side_effect = lambda: self.assertEqual(
+                run_module.call_count, 1)
+            runner._work(0, None, tasks, queue.Queue())
+        self.assertEqual(run_module.call_count, 2)
+        flush.assert_called_once_with()
+        self.assertFalse(collector.flush_per_module)
+
+
+class StopWorkersTestCase(unittest.TestCase):
+    """Test how ``pulp_smash.runner._run_jobs`` stops its workers."""
+
+    def setUp(self):
+        """Prepare to record calls to the workers."""
+        self.calls = []
+
+    def run_jobs(self, report_progress, **kwargs):
+        """Run two jobs in fake workers, and record what happens to them."""
+        calls = self.calls
+
+        def make_worker(context, index, settings_file, results):
+            """Return a fake worker that finishes its jobs at once."""
+            worker = mock.Mock(job=None, settings_file=settings_file)
+            worker.start_job.side_effect = lambda job: results.put(
+                (index, runner.ModuleResult(job[0])))
+            worker.stop.side_effect = lambda: calls.append(('stop', index))
+            worker.join.side_effect = lambda timeout: calls.append(
+                ('join', index, timeout))
+            return worker
+
+        with mock.patch.object(runner, '_Worker', side_effect=make_worker):
+            runner._run_jobs(
+                [('a', set()), ('b', set())], 2, [None], report_progress,
+                **kwargs)
+
+    def test_finished(self):
+        """Assert every worker is asked to stop, then waited for."""
+        self.run_jobs(lambda result: None)
+        self.assertEqual(self.calls, [
+            ('stop', 0), ('stop', 1), ('join', 0, None), ('join', 1, None),
+        ])
+
+    def test_stop_timeout(self):
+        """Assert workers are waited for until ``stop_timeout`` at most."""
+        self.run_jobs(lambda result: None, stop_timeout=60)
+        self.assertEqual(self.calls[:2], [('stop', 0), ('stop', 1)])
+        for call in self.calls[2:]:
+            self.assertEqual(call[0], 'join')
+            self.assertTrue(0 < call[2] <= 60, call)
+
+    def test_interrupted(self):
+        """Assert workers are killed at once if the run is interrupted."""
+        report_progress = mock.Mock(side_effect=KeyboardInterrupt)
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_jobs(report_progress)
+        self.assertEqual(self.calls, [
+            ('stop', 0), ('stop', 1), ('join', 0, 0), ('join', 1, 0),
+        ])
+
+
+class WorkerTestCase(unittest.TestCase):
+    """Test ``pulp_smash.runner._Worker``."""
+
+    def setUp(self):
+        """Create a worker with a fake process."""
+        context = mock.Mock()
+        self.process = context.Process.return_value
+        self.worker = runner._Worker(context, 0, None, None)
+
+    def test_join(self):
+        """Assert a worker that exits in time is not killed."""
+        self.process.is_alive.return_value = False
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.worker.join(5)
+        self.process.join.assert_called_once_with(5)
+        self.process.terminate.assert_not_called()
+
+    def test_kill(self):
+        """Assert a worker that does not exit in time is killed, loudly."""
+        self.process.is_alive.return_value = True
+        with self.assertWarns(RuntimeWarning):
+            self.worker.join(0)
+        self.process.terminate.assert_called_once_with()
+
+
+class BaseRunnerTestCase(unittest.TestCase):
+    """Create a package of test modules, and put it on ``sys.path``."""
+
+    def setUp(self):
+        """Create an empty package."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.package_dir = os.path.join(directory.name, _PACKAGE)
+        os.mkdir(self.package_dir)
+        self.write_module('__init__.py', '')
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+        self.addCleanup(self._forget_package)
+        importlib.invalidate_caches()
+        self.log_path = os.path.join(directory.name, 'log')
+        patcher = mock.patch.dict(os.environ, {'RUNNER_LOG': self.log_path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.history_path = os.path.join(directory.name, 'durations.json')
+        patcher = mock.patch.object(
+            runner, '_get_timing_history_path', return_value=self.history_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _forget_package():
+        """Remove the package and its modules from ``sys.modules``."""
+        for name in tuple(sys.modules):
+            if name == _PACKAGE or name.startswith(_PACKAGE + '.'):
+                del sys.modules[name]
+
+    def write_module(self, path, source):
+        """Write a module into the package."""
+        path = os.path.join(self.package_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as handle:
+            handle.write(source)
+
+    def write_test_module(self, name, locks=(), extra=''):
+        """Write a test module that records when its test runs."""
+        self.write_module('test_{}.py'.format(name), _MODULE_TEMPLATE.format(
+            name=name.capitalize(),
+            locks=tuple(locks),
+            extra=extra,
+        ))
+
+
+class FindTestModulesTestCase(BaseRunnerTestCase):
+    """Test :func:`pulp_smash.runner.find_test_modules`."""
+
+    def test_find(self):
+        """Assert test modules are found in the package and its subpackages."""
+        self.write_module('test_a.py', '')
+        self.write_module('utils.py', '')
+        self.write_module(os.path.join('sub', '__init__.py'), '')
+        self.write_module(os.path.join('sub', 'test_b.py'), '')
+        self.write_module(os.path.join('data', 'test_c.py'), '')
+        self.assertEqual(runner.find_test_modules(_PACKAGE), [
+            _PACKAGE + '.sub.test_b',
+            _PACKAGE + '.test_a',
+        ])
+
+
+class RunTestCase(BaseRunnerTestCase):
+    """Test :func:`pulp_smash.runner.run`."""
+
+    def run_modules(self, processes=3, settings_files=(None,)):
+        """Run every module in the package, and return the results."""
+        stream = io.StringIO()
+        results = runner.run(
+            runner.find_test_modules(_PACKAGE),
+            processes,
+            stream,
+            0,
+            settings_files=settings_files,
+        )
+        with open(self.log_path) as handle:
+            log = handle.read().splitlines()
+        return results, stream.getvalue(), log
+
+    def test_merged_report(self):
+        """Assert the results of every module are merged into one report."""
+        self.write_test_module('one', extra=(
+            '    def test_fail(self):\n'
+            '        self.fail("oops")\n'
+        ))
+        self.write_test_module('two', extra=(
+            '    @unittest.skip("not today")\n'
+            '    def test_skip(self):\n'
+            '        pass\n'
+        ))
+        self.write_module('test_three.py', 'import nonexistent_module\n')
+        results, report, log = self.run_modules()
+        self.assertEqual(
+            sorted(result.module for result in results),
+            [_PACKAGE + '.test_one', _PACKAGE + '.test_three',
+             _PACKAGE + '.test_two'],
+        )
+        self.assertEqual(len(log), 4)
+        self.assertIn('FAIL: {}.test_one.OneTestCase.test_fail'.format(
+            _PACKAGE), report)
+        self.assertIn('nonexistent_module', report)
+        self.assertIn('Ran 5 tests in ', report)
+        self.assertIn('FAILED (failures=1, errors=1, skipped=1)', report)
+
+    def test_locks(self):
+        """Assert modules holding the same lock never run at the same time."""
+        self.write_test_module('one')
+        self.write_test_module('two', locks=(runner.EXCLUSIVE_LOCK,))
+        self.write_test_module('three', locks=('squid',))
+        self.write_test_module('four', locks=('squid',))
+        self.write_test_module('five')
+        results, report, log = self.run_modules()
+        self.assertTrue(all(result.was_successful() for result in results))
+        self.assertTrue(report.endswith('OK\n'), report)
+
+        # The exclusive module runs alone.
+        start = log.index('start Two')
+        self.assertEqual(log[start + 1], 'stop Two')
+
+        # The modules holding the squid lock don't overlap.
+        events = [line for line in log if line.endswith(('Three', 'Four'))]
+        self.assertEqual(
+            [event.split()[0] for event in events],
+            ['start', 'stop', 'start', 'stop'],
+        )
+
+        # Other modules do overlap.
+        self.assertEqual(
+            [line.split()[0] for line in log[:2]], ['start', 'start'])
+
+    def test_timing_history(self):
+        """Assert durations are recorded, and used to order modules."""
+        self.write_test_module('one')
+        self.write_test_module('two')
+        with open(self.history_path, 'w') as handle:
+            json.dump({'modules': {
+                _PACKAGE + '.test_one': 1,
+                _PACKAGE + '.test_two': 2,
+                _PACKAGE + '.test_gone': 3,
+            }}, handle)
+        results, report, log = self.run_modules(processes=1)
+        self.assertEqual(log[0], 'start Two')
+        self.assertIn('Predicted critical path: 3.0s (', report)
+        self.assertIn('Actual critical path: ', report)
+
+        history = runner.read_timing_history()
+        for result in results:
+            with self.subTest(module=result.module):
+                class_id = '{}.{}TestCase'.format(
+                    result.module, result.module.rpartition('_')[2].title())
+                self.assertGreaterEqual(result.class_durations[class_id], 0.3)
+                self.assertEqual(
+                    history['modules'][result.module], result.duration)
+                self.assertEqual(
+                    history['classes'][class_id],
+                    result.class_durations[class_id],
+                )
+        self.assertEqual(history['modules'][_PACKAGE + '.test_gone'], 3)
+
+    def test_deployments(self):
+        """Assert modules are shared out among several deployments.
+
+        Locks are held per deployment, so exclusive modules may run at the
+        same time on different deployments.
+        """
+        extra = (
+            '    def test_config(self):\n'
+            '        with open(os.environ["RUNNER_LOG"], "a") as handle:\n'
+            '            handle.write("config {} {}\\n".format(\n'
+            '                type(self).__name__,\n'
+            '                os.environ["PULP_SMASH_CONFIG_FILE"],\n'
+            '            ))\n'
+        )
+        self.write_test_module('one', (runner.EXCLUSIVE_LOCK,), extra)
+        self.write_test_module('two', (runner.EXCLUSIVE_LOCK,), extra)
+        results, _, log = self.run_modules(
+            processes=None, settings_files=['a.json', 'b.json'])
+        events = [line.split()[0] for line in log if 'config' not in line]
+        self.assertEqual(events, ['start', 'start', 'stop', 'stop'])
+        self.assertEqual(
+            {result.settings_file for result in results},
+            {'a.json', 'b.json'},
+        )
+        for result in results:
+            with self.subTest(module=result.module):
+                name = result.module.rpartition('_')[2].title()
+                self.assertIn('config {}TestCase {}'.format(
+                    name, result.settings_file), log)
+
+
+class GetSettingsFilesTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.runner.get_settings_files`."""
+
+    def test_default(self):
+        """Assert the default settings file is used if none are named."""
+        with mock.patch.dict(os.environ, {'PULP_SMASH_CONFIG_FILE': ''}):
+            self.assertEqual(runner.get_settings_files(), [None])
+
+    def test_several(self):
+        """Assert several settings files may be named."""
+        value = os.pathsep.join(('a.json', 'b.json'))
+        with mock.patch.dict(os.environ, {'PULP_SMASH_CONFIG_FILE': value}):
+            self.assertEqual(runner.get_settings_files(), ['a.json', 'b.json'])
+
+
+class PredictDurationsTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.runner.predict_durations`."""
+
+    def test_unknown(self):
+        """Assert unknown modules are predicted to take the average time."""
+        history = {'modules': {'a': 1, 'b': 5}, 'classes': {}}
+        self.assertEqual(
+            runner.predict_durations(('a', 'c'), history),
+            {'a': 1, 'c': 3},
+        )
+
+    def test_empty_history(self):
+        """Assert modules are predicted to take no time if nothing is known."""
+        history = {'modules': {}, 'classes': {}}
+        self.assertEqual(runner.predict_durations(('a',), history), {'a': 0})
+
+
+class SimulateTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.runner.simulate`."""
+
+    def test_longest_first(self):
+        """Assert modules are packed into the first idle worker."""
+        durations = {'a': 5, 'b': 4, 'c': 3, 'd': 3, 'e': 3}
+        jobs = [(module, set()) for module in sorted(durations)]
+        self.assertEqual(
+            runner.simulate(jobs, 2, durations),
+            (10, ['b', 'c', 'e']),
+        )
+
+    def test_exclusive(self):
+        """Assert exclusive modules run on their own."""
+        durations = {'a': 2, 'b': 1, 'c': 1}
+        jobs = [('a', {runner.EXCLUSIVE_LOCK}), ('b', set()), ('c', set())]
+        self.assertEqual(runner.simulate(jobs, 2, durations), (3, ['a', 'b']))
+
+    def test_deployments(self):
+        """Assert exclusive modules run at once on different deployments."""
+        durations = {'a': 2, 'b': 2, 'c': 1}
+        jobs = [(module, {runner.EXCLUSIVE_LOCK}) for module in 'abc']
+        self.assertEqual(
+            runner.simulate(jobs, 2, durations, ['x.json', 'y.json']),
+            (3, ['a', 'c']),
+        )
+
+    def test_no_jobs(self):
+        """Assert an empty run takes no time."""
+        self.assertEqual(runner.simulate([], 2, {}), (0, []))
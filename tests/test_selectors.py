@@ -1,6 +1,9 @@
 # coding=utf-8
 """Unit tests for :mod:`pulp_smash.selectors`."""
+import json
+import os
 import random
+import tempfile
 import unittest
 from unittest import mock
 
@@ -70,6 +73,196 @@ class GetBugTestCase(unittest.TestCase):
             selectors._get_bug('1')
 
 
+def _bug_json(status='NEW', tpr=''):
+    """Return a JSON representation of a bug, as served by the bug tracker."""
+    return {
+        'issue': {
+            'id': 1,
+            'status': {'name': status},
+            'custom_fields': [{'id': 4, 'value': tpr}],
+        }
+    }
+
+
+class BaseBugCacheTestCase(unittest.TestCase):
+    """A base class for tests that use the on-disk bug cache."""
+
+    def setUp(self):
+        """Point the bug cache at a temporary file, and empty it."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, 'bugs.json')
+        for patcher in (
+                mock.patch.object(
+                    selectors,
+                    '_get_bug_cache_path',
+                    return_value=self.path,
+                ),
+                mock.patch.object(selectors, '_BUG_STATUS_CACHE', {}),
+                mock.patch.object(selectors, '_BUG_FETCH_TIMES', {}),
+                mock.patch.object(selectors, '_BUG_CACHE_LOADED', False),
+                mock.patch.dict(os.environ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        os.environ.pop('PULP_SMASH_OFFLINE', None)
+        os.environ.pop('PULP_SMASH_BUG_CACHE_TTL', None)
+        patcher = mock.patch.object(selectors.requests, 'get')
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.get.return_value.json.return_value = _bug_json('MODIFIED', '2.8')
+
+    def _forget(self):
+        """Make the next ``_get_bug`` call behave like a new process."""
+        selectors._BUG_STATUS_CACHE.clear()
+        selectors._BUG_FETCH_TIMES.clear()
+        selectors._BUG_CACHE_LOADED = False
+
+
+class BugCacheTestCase(BaseBugCacheTestCase):
+    """Test the on-disk bug cache used by ``_get_bug``."""
+
+    def test_survives_processes(self):
+        """Assert a fetched bug is saved to disk and read back."""
+        bug = selectors._get_bug(1)
+        self.assertEqual(bug, selectors._Bug('MODIFIED', Version('2.8')))
+        with open(self.path) as handle:
+            self.assertEqual(json.load(handle)['1']['status'], 'MODIFIED')
+        self._forget()
+        self.assertEqual(selectors._get_bug(1), bug)
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_expiry(self):
+        """Assert a bug older than the TTL is fetched again."""
+        selectors._get_bug(1)
+        self._forget()
+        os.environ['PULP_SMASH_BUG_CACHE_TTL'] = '0'
+        self.get.return_value.json.return_value = _bug_json('VERIFIED', '2.8')
+        self.assertEqual(selectors._get_bug(1).status, 'VERIFIED')
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_stale_on_error(self):
+        """Assert a stale bug is used if the tracker can't be reached."""
+        selectors._get_bug(1)
+        self._forget()
+        os.environ['PULP_SMASH_BUG_CACHE_TTL'] = '0'
+        self.get.side_effect = requests.exceptions.ConnectionError
+        with self.assertWarns(RuntimeWarning):
+            self.assertEqual(selectors._get_bug(1).status, 'MODIFIED')
+
+    def test_stale_on_timeout(self):
+        """Assert a stale bug is used if the tracker is too slow to respond."""
+        selectors._get_bug(1)
+        self.assertEqual(
+            self.get.call_args[1]['timeout'], selectors.BUG_FETCH_TIMEOUT)
+        self._forget()
+        os.environ['PULP_SMASH_BUG_CACHE_TTL'] = '0'
+        self.get.side_effect = requests.exceptions.Timeout
+        with self.assertWarns(RuntimeWarning):
+            self.assertEqual(selectors._get_bug(1).status, 'MODIFIED')
+
+    def test_offline(self):
+        """Assert offline mode serves stale bugs, and never fetches."""
+        selectors._get_bug(1)
+        self._forget()
+        os.environ['PULP_SMASH_BUG_CACHE_TTL'] = '0'
+        os.environ['PULP_SMASH_OFFLINE'] = 'true'
+        self.assertEqual(selectors._get_bug(1).status, 'MODIFIED')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            selectors._get_bug(2)
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_corrupt_cache(self):
+        """Assert an unreadable cache file is ignored."""
+        with open(self.path, 'w') as handle:
+            handle.write('{not json')
+        self.assertEqual(selectors._get_bug(1).status, 'MODIFIED')
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_refresh(self):
+        """Assert ``refresh_bug_cache`` fetches even fresh bugs."""
+        selectors._get_bug(1)
+        self.get.return_value.json.return_value = _bug_json('VERIFIED', '2.8')
+        with mock.patch.object(selectors, 'find_bug_ids', return_value=set()):
+            bugs = selectors.refresh_bug_cache()
+        self.assertEqual(list(bugs), [1])
+        self.assertEqual(bugs[1].status, 'VERIFIED')
+        self._forget()
+        self.assertEqual(selectors._get_bug(1).status, 'VERIFIED')
+
+
+class PrefetchBugsTestCase(BaseBugCacheTestCase):
+    """Test :func:`pulp_smash.selectors.prefetch_bugs`."""
+
+    def test_prefetch(self):
+        """Assert only missing and expired bugs are fetched, then saved."""
+        selectors._get_bug(1)
+        with mock.patch.object(selectors, '_save_bug_cache') as save:
+            bugs = selectors.prefetch_bugs([1, 2, 3, 2])
+        self.assertEqual(set(bugs), {2, 3})
+        self.assertEqual(self.get.call_count, 3)
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(selectors.prefetch_bugs([1, 2, 3]), {})
+
+    def test_errors(self):
+        """Assert unfetchable bugs are reported with a single warning."""
+        self.get.side_effect = requests.exceptions.ConnectionError
+        with self.assertWarns(RuntimeWarning) as context:
+            self.assertEqual(selectors.prefetch_bugs([1, 2]), {})
+        self.assertIn('[1, 2]', str(context.warning))
+
+    def test_offline(self):
+        """Assert nothing is fetched in offline mode."""
+        os.environ['PULP_SMASH_OFFLINE'] = '1'
+        self.assertEqual(selectors.prefetch_bugs([1, 2]), {})
+        self.assertEqual(self.get.call_count, 0)
+
+    def test_refresh_scanned(self):
+        """Assert ``refresh_bug_cache`` includes the bugs tests reference."""
+        with mock.patch.object(selectors, 'find_bug_ids', return_value={5}):
+            selectors._get_bug(1)
+            self.assertEqual(set(selectors.refresh_bug_cache()), {1, 5})
+
+    def test_refresh_error(self):
+        """Assert ``refresh_bug_cache`` saves other bugs, then raises."""
+        self.get.return_value.json.side_effect = [
+            _bug_json(),
+            requests.exceptions.HTTPError(),
+        ]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            selectors.refresh_bug_cache([1, 2], max_workers=1)
+        with open(self.path) as handle:
+            self.assertEqual(set(json.load(handle)), {'1'})
+
+
+class FindBugIdsTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.selectors.find_bug_ids`."""
+
+    def test_source(self):
+        """Assert bug IDs are found in the ways tests reference them."""
+        source = (
+            'from pulp_smash import selectors\n'
+            'from pulp_smash.selectors import bug_is_testable\n'
+            'if selectors.bug_is_untestable(1, cfg.version):\n'
+            '    pass\n'
+            'bug_is_testable(2, cfg.version)\n'
+            'selectors.bug_is_untestable(issue_id, cfg.version)\n'
+            'def check_issue_3(cfg):\n'
+            '    pass\n'
+            'utils.check_issue_4(cfg)\n'
+            'check_issue_foo(5)\n'
+        )
+        self.assertEqual(
+            selectors._find_bug_ids_in_source(source),
+            {1, 2, 3, 4},
+        )
+
+    def test_tests_package(self):
+        """Assert bugs referenced by Pulp Smash's own tests are found."""
+        bug_ids = selectors.find_bug_ids()
+        self.assertTrue({2277, 2620}.issubset(bug_ids), bug_ids)
+
+
 class BugIsTestableTestCase(unittest.TestCase):
     """Test :meth:`pulp_smash.selectors.bug_is_testable` and its partner."""
 
@@ -110,3 +303,13 @@ class BugIsTestableTestCase(unittest.TestCase):
                 selectors.bug_is_testable(None, ver)
             with self.assertWarns(RuntimeWarning):
                 selectors.bug_is_untestable(None, ver)
+
+    def test_timeout(self):
+        """Make the dependent function raise a timeout error."""
+        ver = Version('0')
+        with mock.patch.object(selectors, '_get_bug') as get_bug:
+            get_bug.side_effect = requests.exceptions.ReadTimeout
+            with self.assertWarns(RuntimeWarning):
+                self.assertTrue(selectors.bug_is_testable(None, ver))
+            with self.assertWarns(RuntimeWarning):
+                self.assertFalse(selectors.bug_is_untestable(None, ver))
@@ -1,11 +1,21 @@
 # coding=utf-8
 """Unit tests for :mod:`pulp_smash.utils`."""
+import hashlib
+import io
+import json
+import os
+import pathlib
 import random
+import tempfile
+import threading
+import tracemalloc
 import unittest
 from unittest import mock
 
+import requests
 
 from pulp_smash import api, cli, config, exceptions, utils
+from pulp_smash.constants import ORPHANS_PATH
 
 
 class UUID4TestCase(unittest.TestCase):
@@ -72,10 +82,10 @@ class BaseAPITestCase(unittest.TestCase):
     def test_set_up_class(self):
         """Assert method ``setUpClass`` creates correct class attributes.
 
-        Verify that the method creates attributes named ``cfg`` and
-        ``resources``.
+        Verify that the method creates attributes named ``cfg``,
+        ``resources``, ``borrowed_repos`` and ``taken_repos``.
         """
-        for attr in {'cfg', 'resources'}:
+        for attr in {'cfg', 'resources', 'borrowed_repos', 'taken_repos'}:
             with self.subTest(attr=attr):
                 self.assertTrue(hasattr(self.child, attr))
 
@@ -84,16 +94,386 @@ class BaseAPITestCase(unittest.TestCase):
 
         :meth:`pulp_smash.api.Client.delete` should be called once for each
         resource listed in ``resources``, and once for
-        :data:`pulp_smash.constants.ORPHANS_PATH`.
+        :data:`pulp_smash.constants.ORPHANS_PATH`, when the teardown
+        collector is flushed.
         """
+        collector = utils.TeardownCollector()
         with mock.patch.object(api, 'Client') as client:
-            self.child.tearDownClass()
+            with mock.patch.object(utils, '_TEARDOWN_COLLECTOR', collector):
+                self.child.tearDownClass()
+            collector.flush()
         self.assertEqual(
             client.return_value.delete.call_count,
             len(self.child.resources) + 1,
         )
 
 
+class TeardownCollectorTestCase(unittest.TestCase):
+    """Test :class:`pulp_smash.utils.TeardownCollector`."""
+
+    def setUp(self):
+        """Create a collector, and mock out calls to Pulp."""
+        self.collector = utils.TeardownCollector()
+        self.cfgs = []
+        for base_url in ('https://a.example.com/', 'https://b.example.com/'):
+            cfg = mock.Mock()
+            cfg.get_base_url.return_value = base_url
+            self.cfgs.append(cfg)
+        patcher = mock.patch.object(api, 'Client')
+        self.client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush(self):
+        """Assert orphans are purged once per deployment, after deletions."""
+        event = threading.Event()
+        deleted = []
+
+        def delete(href):
+            """Wait for ``event`` before deleting anything but orphans."""
+            if href != ORPHANS_PATH:
+                event.wait()
+            deleted.append(href)
+
+        self.client.return_value.delete.side_effect = delete
+        for cfg in self.cfgs + self.cfgs:
+            self.collector.delete(cfg, cfg.get_base_url())
+            self.collector.purge_orphans(cfg)
+        event.set()
+        self.collector.flush()
+        self.assertEqual(deleted[-2:], [ORPHANS_PATH, ORPHANS_PATH])
+        self.assertEqual(len(deleted), 6)
+        self.collector.flush()
+        self.assertEqual(len(deleted), 6)
+
+    def test_close(self):
+        """Assert failures are reported together by ``close``."""
+        self.client.return_value.delete.side_effect = (
+            requests.exceptions.HTTPError('oops'))
+        for href in ('foo', 'bar'):
+            self.collector.delete(self.cfgs[0], href)
+        self.collector.flush()
+        self.assertEqual(len(self.collector.failures), 2)
+        with self.assertWarns(RuntimeWarning) as context:
+            self.collector.close()
+        message = str(context.warning)
+        self.assertIn('Cannot delete 2 resources', message)
+        self.assertIn('foo: oops', message)
+        self.assertIn('bar: oops', message)
+        self.assertEqual(self.collector.failures, [])
+
+    def test_start_module(self):
+        """Assert orphans are purged when a test module starts."""
+        for module in ('foo', 'foo', 'bar'):
+            self.collector.purge_orphans(self.cfgs[0])
+            self.collector.start_module(module)
+        self.assertEqual(self.client.return_value.delete.call_count, 1)
+        self.collector.flush_per_module = False
+        self.collector.start_module('foo')
+        self.assertEqual(self.client.return_value.delete.call_count, 1)
+
+    def test_purge_orphans(self):
+        """Assert :func:`pulp_smash.utils.purge_orphans` purges at once."""
+        with mock.patch.object(utils, '_TEARDOWN_COLLECTOR', self.collector):
+            with mock.patch.object(utils, '_SHARED_REPO_REGISTRY') as registry:
+                utils.purge_orphans(self.cfgs[0])
+        registry.purge.assert_called_once_with(self.cfgs[0])
+        self.client.return_value.delete.assert_called_once_with(ORPHANS_PATH)
+
+
+class _RepoResponse(dict):
+    """A repository, which is also a response to a request for it."""
+
+    status_code = 200
+
+    def raise_for_status(self):
+        """Do nothing."""
+
+
+class SharedRepoRegistryTestCase(unittest.TestCase):
+    """Test :class:`pulp_smash.utils.SharedRepoRegistry`."""
+
+    def setUp(self):
+        """Create a registry, and mock out calls to Pulp."""
+        self.registry = utils.SharedRepoRegistry()
+        self.cfg = mock.Mock()
+        self.cfg.get_base_url.return_value = 'https://pulp.example.com/'
+        self.repo = _RepoResponse({
+            '_href': '/pulp/api/v2/repositories/foo/',
+            'distributors': [{'id': 'bar'}],
+        })
+        self.client = self._patch(api, 'Client')
+        self.publish_repo = self._patch(utils, 'publish_repo')
+        self.sync_repo = self._patch(utils, 'sync_repo')
+        self.client.return_value.post.return_value = self.repo
+        self.client.return_value.get.return_value = self.repo
+
+    def _patch(self, target, attr):
+        """Patch ``target.attr`` until the test ends. Return the mock."""
+        patcher = mock.patch.object(target, attr)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    @staticmethod
+    def gen_body(feed='http://example.com/feed/', distributor_config=None):
+        """Return a semi-random repository body."""
+        return {
+            'distributors': [{
+                'distributor_config': distributor_config or {},
+                'distributor_id': utils.uuid4(),
+                'distributor_type_id': 'yum_distributor',
+            }],
+            'id': utils.uuid4(),
+            'importer_config': {'feed': feed},
+            'importer_type_id': 'yum_importer',
+        }
+
+    def test_borrow(self):
+        """Assert a repository is created once for similar bodies."""
+        repos = [self.registry.borrow(self.cfg, self.gen_body())
+                 for _ in range(2)]
+        self.assertEqual(repos, [self.repo, self.repo])
+        self.assertEqual(self.client.return_value.post.call_count, 1)
+        self.assertEqual(self.sync_repo.call_count, 1)
+        self.assertEqual(self.publish_repo.call_count, 0)
+
+    def test_keys(self):
+        """Assert a repository is created for each feed, distributor, etc."""
+        self.registry.borrow(self.cfg, self.gen_body())
+        self.registry.borrow(self.cfg, self.gen_body('http://example.com/2/'))
+        self.registry.borrow(
+            self.cfg, self.gen_body(distributor_config={'http': True}))
+        self.registry.borrow(self.cfg, self.gen_body(), publish=True)
+        self.assertEqual(len(self.registry), 4)
+        self.assertEqual(self.client.return_value.post.call_count, 4)
+        self.assertEqual(self.publish_repo.call_count, 1)
+
+    def test_recreate(self):
+        """Assert a repository that has disappeared is created again."""
+        self.registry.borrow(self.cfg, self.gen_body())
+        self.repo.status_code = 404
+        self.registry.borrow(self.cfg, self.gen_body())
+        self.assertEqual(self.client.return_value.post.call_count, 2)
+
+    def test_failed_sync(self):
+        """Assert a repository that fails to sync is deleted."""
+        self.sync_repo.side_effect = exceptions.TaskReportError('oops', {}, [])
+        with self.assertRaises(exceptions.TaskReportError):
+            self.registry.borrow(self.cfg, self.gen_body())
+        self.client.return_value.delete.assert_called_once_with(
+            self.repo['_href'])
+        self.sync_repo.side_effect = None
+        self.registry.borrow(self.cfg, self.gen_body())
+        self.assertEqual(self.client.return_value.post.call_count, 2)
+
+    def test_release(self):
+        """Assert a repository is kept when its last borrower returns it."""
+        repos = [self.registry.borrow(self.cfg, self.gen_body())
+                 for _ in range(2)]
+        self.registry.close()
+        for repo in repos:
+            self.registry.release(repo)
+        self.assertEqual(self.client.return_value.delete.call_count, 0)
+        with self.assertRaises(ValueError):
+            self.registry.release(repos[1])
+        self.registry.release(self.registry.borrow(self.cfg, self.gen_body()))
+        self.assertEqual(self.sync_repo.call_count, 1)
+        self.registry.close()
+        self.client.return_value.delete.assert_called_once_with(
+            self.repo['_href'])
+        self.assertEqual(len(self.registry), 0)
+
+    def test_close_failures(self):
+        """Assert repositories are still deleted after one can't be."""
+        for feed in ('http://a.com/', 'http://b.com/'):
+            self.registry.release(
+                self.registry.borrow(self.cfg, self.gen_body(feed)))
+        self.client.return_value.delete.side_effect = RuntimeError(
+            'cannot schedule new futures after interpreter shutdown')
+        with self.assertWarns(RuntimeWarning):
+            self.registry.close()
+        self.assertEqual(self.client.return_value.delete.call_count, 2)
+        self.assertEqual(len(self.registry), 0)
+
+    def test_clear(self):
+        """Assert idle repositories are forgotten, but not deleted."""
+        self.registry.borrow(self.cfg, self.gen_body())
+        self.registry.release(
+            self.registry.borrow(self.cfg, self.gen_body('http://a.com/')))
+        self.registry.clear()
+        self.assertEqual(len(self.registry), 1)
+        self.assertEqual(self.client.return_value.delete.call_count, 0)
+
+    def test_purge(self):
+        """Assert every idle shared repository on the server is deleted."""
+        borrowed = self.registry.borrow(self.cfg, self.gen_body())
+        others = [
+            {'_href': '/pulp/api/v2/repositories/{}/'.format(id_), 'id': id_}
+            for id_ in ('pulp-smash-shared-baz', 'baz')
+        ]
+        self.client.return_value.get.return_value = others + [
+            {'_href': borrowed['_href'], 'id': 'pulp-smash-shared-foo'},
+        ]
+        self.registry.purge(self.cfg)
+        self.client.return_value.delete.assert_called_once_with(
+            others[0]['_href'])
+        self.registry.release(borrowed)
+
+    def test_sync_report(self):
+        """Assert the response to the sync request is kept."""
+        repo = self.registry.borrow(self.cfg, self.gen_body())
+        self.assertIs(
+            self.registry.get_sync_report(repo), self.sync_repo.return_value)
+        self.registry.borrow(self.cfg, self.gen_body(feed=None))
+        self.assertEqual(self.sync_repo.call_count, 1)
+
+    def test_release_unknown(self):
+        """Assert returning a repository that wasn't borrowed fails."""
+        with self.assertRaises(ValueError):
+            self.registry.release(self.repo)
+
+    def test_base_api_test_case(self):
+        """Assert ``BaseAPITestCase`` returns the repositories it borrows."""
+        class Child(utils.BaseAPITestCase):
+            """An empty child class."""
+
+        with mock.patch.object(config, 'get_config', return_value=self.cfg):
+            Child.setUpClass()
+        with mock.patch.object(
+                utils, '_SHARED_REPO_REGISTRY', self.registry):
+            repo = Child.borrow_repo(self.gen_body())
+            with mock.patch.object(utils, '_TEARDOWN_COLLECTOR'):
+                Child.tearDownClass()
+        with self.assertRaises(ValueError):
+            self.registry.release(repo)
+
+
+class ResourcePoolTestCase(unittest.TestCase):
+    """Test :class:`pulp_smash.utils.ResourcePool`."""
+
+    def setUp(self):
+        """Create a pool, and callables which record what they do."""
+        self.pool = utils.ResourcePool()
+        self.addCleanup(self.pool.wait)
+        self.cfg = mock.Mock()
+        self.cfg.get_base_url.return_value = 'https://pulp.example.com/'
+        self.lock = threading.Lock()
+        self.created = []
+        self.deleted = []
+
+    def create(self, cfg, kind='repo'):
+        """Create a resource."""
+        self.assertIs(cfg, self.cfg)
+        with self.lock:
+            resource = '{}-{}'.format(kind, len(self.created))
+            self.created.append(resource)
+        return resource
+
+    def delete(self, cfg, resource):
+        """Delete a resource."""
+        self.assertIs(cfg, self.cfg)
+        with self.lock:
+            self.deleted.append(resource)
+
+    def test_take(self):
+        """Assert primed spares are taken, and then created on the spot."""
+        self.pool.prime(self.cfg, self.create, self.delete, count=2)
+        self.pool.prime(self.cfg, self.create, self.delete, count=2)
+        self.pool.wait()
+        self.assertEqual(len(self.created), 2)
+        spares = set(self.created)
+        for _ in range(2):
+            self.assertIn(
+                self.pool.take(self.cfg, self.create, self.delete), spares)
+        self.assertEqual(len(self.pool), 0)
+        resource = self.pool.take(self.cfg, self.create, self.delete)
+        self.assertNotIn(resource, spares)
+        self.pool.wait()
+        self.assertEqual(len(self.created), 3)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_keys(self):
+        """Assert spares are kept for each kind of resource."""
+        self.pool.prime(self.cfg, self.create, self.delete)
+        self.pool.prime(self.cfg, self.create, self.delete, 'user', count=2)
+        self.pool.wait()
+        self.assertEqual(len(self.pool), 3)
+        self.assertEqual(
+            self.pool.take(self.cfg, self.create, self.delete), 'repo-0')
+        self.assertTrue(
+            self.pool.take(self.cfg, self.create, self.delete, 'user')
+            .startswith('user'))
+
+    def test_discard(self):
+        """Assert discarded resources are deleted in the background."""
+        resource = self.pool.take(self.cfg, self.create, self.delete)
+        self.pool.discard(self.cfg, self.delete, resource)
+        self.pool.wait()
+        self.assertEqual(self.deleted, [resource])
+
+    def test_clear(self):
+        """Assert spares, even those being created, are dropped and deleted."""
+        event = threading.Event()
+
+        def create(cfg):
+            """Wait for ``event``, then create a resource."""
+            event.wait()
+            return self.create(cfg)
+
+        self.pool.prime(self.cfg, create, self.delete, count=2)
+        self.pool.clear()
+        event.set()
+        self.pool.wait()
+        self.assertEqual(len(self.pool), 0)
+        self.assertEqual(sorted(self.deleted), sorted(self.created))
+        self.assertEqual(len(self.deleted), 2)
+
+    def test_close(self):
+        """Assert spares are deleted, and failures to delete are reported."""
+        self.pool.prime(self.cfg, self.create, self.delete)
+        self.pool.discard(self.cfg, mock.Mock(side_effect=Exception), 'foo')
+        with self.assertWarns(RuntimeWarning):
+            self.pool.close()
+        self.assertEqual(sorted(self.deleted), sorted(self.created))
+        self.assertEqual(len(self.pool), 0)
+
+    def test_shut_down(self):
+        """Assert work is done on the spot once thread pools refuse it."""
+        with mock.patch.object(utils, 'ThreadPoolExecutor') as executor:
+            executor.return_value.submit.side_effect = RuntimeError
+            self.pool.prime(self.cfg, self.create, self.delete, count=2)
+            self.assertEqual(len(self.pool), 2)
+            self.pool.discard(self.cfg, self.delete, 'foo')
+            self.assertEqual(self.deleted, ['foo'])
+            self.pool.close()
+        self.assertEqual(sorted(self.deleted), sorted(self.created + ['foo']))
+
+    def test_failed_create(self):
+        """Assert failures to create spares are ignored, but not to take."""
+        create = mock.Mock(side_effect=Exception('oops'))
+        self.pool.prime(self.cfg, create, self.delete)
+        self.pool.wait()
+        with self.assertRaises(Exception):
+            self.pool.take(self.cfg, create, self.delete)
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_base_api_test_case(self):
+        """Assert ``BaseAPITestCase`` deletes the repositories it takes."""
+        class Child(utils.BaseAPITestCase):
+            """An empty child class."""
+
+        with mock.patch.object(config, 'get_config', return_value=self.cfg):
+            Child.setUpClass()
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.post.return_value = {'_href': 'foo'}
+            with mock.patch.object(utils, '_RESOURCE_POOL', self.pool):
+                self.assertEqual(Child.take_repo(dict), {'_href': 'foo'})
+                with mock.patch.object(utils, '_TEARDOWN_COLLECTOR'):
+                    Child.tearDownClass()
+                self.pool.wait()
+        client.return_value.delete.assert_any_call('foo')
+
+
 class IsRootTestCase(unittest.TestCase):
     """Test ``pulp_smash.utils.is_root``."""
 
@@ -199,6 +579,182 @@ class UploadImportUnitTestCase(unittest.TestCase):
         self.assertIs(response, client.return_value.post.return_value)
 
 
+class BaseUploadTestCase(unittest.TestCase):
+    """A base class for tests that upload units."""
+
+    def setUp(self):
+        """Create a unit, and save it to a file."""
+        self.unit = os.urandom(1000)
+        handle, self.path = tempfile.mkstemp()
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(handle, 'wb') as unit_file:
+            unit_file.write(self.unit)
+
+    def upload(self, unit, put=None, **kwargs):
+        """Upload ``unit``, and return the ``(path, data)`` of each PUT.
+
+        If given, ``put`` is called in place of ``api.Client.put``.
+        """
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.post.return_value = {
+                '_href': 'http://example.com/uploads/bar/',
+                'upload_id': 'bar',
+            }
+            client.return_value.put.side_effect = put
+            utils.upload_import_unit(
+                mock.Mock(),
+                unit,
+                {},
+                {'_href': 'http://example.com'},
+                **kwargs
+            )
+        return [
+            (call[1][0], call[2]['data'])
+            for call in client.return_value.put.mock_calls
+        ]
+
+
+class UploadChunksTestCase(BaseUploadTestCase):
+    """Test how :func:`pulp_smash.utils.upload_import_unit` uploads units."""
+
+    def test_unit_types(self):
+        """Assert blobs, paths, file objects and iterables are uploaded."""
+        with open(self.path, 'rb') as unit_file:
+            units = {
+                'bytes': (self.unit, (0, 300, 600, 900)),
+                'path': (self.path, (0, 300, 600, 900)),
+                'path object': (pathlib.Path(self.path), (0, 300, 600, 900)),
+                'file': (unit_file, (0, 300, 600, 900)),
+                'unmappable file': (io.BytesIO(self.unit), (0, 300, 600, 900)),
+                'iterable': (
+                    (self.unit[:250], self.unit[250:]),
+                    (0, 250, 550, 850),
+                ),
+            }
+            for name, (unit, offsets) in units.items():
+                with self.subTest(unit=name):
+                    puts = self.upload(unit, chunk_size=300)
+                    self.assertEqual([path for path, _ in puts], [
+                        'http://example.com/uploads/bar/{}/'.format(offset)
+                        for offset in offsets
+                    ])
+                    self.assertEqual(
+                        b''.join(data for _, data in puts),
+                        self.unit,
+                    )
+
+    def test_empty_file(self):
+        """Assert an empty file results in no chunks being uploaded."""
+        with open(self.path, 'wb'):
+            pass
+        self.assertEqual(self.upload(self.path), [])
+
+    def test_flat_memory_usage(self):
+        """Assert a file is never read into memory all at once."""
+        with open(self.path, 'wb') as unit_file:
+            unit_file.truncate(20 * 1024 * 1024)
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        with mock.patch.object(api, 'Client') as client:
+            client.return_value.post.return_value = {
+                '_href': 'http://example.com/uploads/bar/',
+                'upload_id': 'bar',
+            }
+            # Don't let the mock remember each chunk.
+            client.return_value.put = lambda path, data: None
+            utils.upload_import_unit(
+                mock.Mock(), self.path, {}, {'_href': 'http://example.com'})
+        _, peak = tracemalloc.get_traced_memory()
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class ParallelUploadTestCase(BaseUploadTestCase):
+    """Test :func:`pulp_smash.utils.upload_import_unit` with many workers."""
+
+    def test_parallel(self):
+        """Assert chunks are uploaded at the same time, and stats kept."""
+        barrier = threading.Barrier(4)
+        stats = utils.UploadStats()
+        puts = self.upload(
+            self.unit,
+            lambda path, data: barrier.wait(timeout=5),
+            chunk_size=125,
+            max_workers=4,
+            stats=stats,
+        )
+        self.assertEqual(len(puts), 8)
+        self.assertEqual(
+            b''.join(data for _, data in sorted(
+                puts, key=lambda put: int(put[0].split('/')[-2]))),
+            self.unit,
+        )
+        self.assertEqual(stats.bytes, 1000)
+        self.assertEqual(stats.chunks, 8)
+        self.assertEqual(stats.retries, 0)
+        self.assertGreater(stats.throughput, 0)
+
+    def test_bounded(self):
+        """Assert only a few chunks are read ahead of the uploads."""
+        release = threading.Event()
+        yielded = []
+
+        def chunks():
+            """Yield many chunks, and record how many were yielded."""
+            for _ in range(100):
+                yielded.append(None)
+                yield b'x'
+
+        def put(path, data):  # pylint:disable=unused-argument
+            """Wait until the test is done counting."""
+            release.wait(timeout=5)
+
+        thread = threading.Thread(
+            target=self.upload,
+            args=(chunks(), put),
+            kwargs={'max_workers': 2},
+        )
+        thread.start()
+        try:
+            for _ in range(50):
+                if len(yielded) >= 4:
+                    break
+                release.wait(0.01)
+            release.wait(0.1)
+            self.assertLessEqual(len(yielded), 5)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(len(yielded), 100)
+
+    def test_retry(self):
+        """Assert a failed chunk is uploaded again."""
+        failures = [requests.exceptions.ConnectionError()]
+        stats = utils.UploadStats()
+
+        def put(path, data):  # pylint:disable=unused-argument
+            """Fail the first upload of the first chunk."""
+            if path.endswith('/0/') and failures:
+                raise failures.pop()
+
+        puts = self.upload(
+            self.unit, put, chunk_size=500, max_workers=2, retries=1,
+            stats=stats)
+        self.assertEqual(len(puts), 3)
+        self.assertEqual(stats.chunks, 2)
+        self.assertEqual(stats.retries, 1)
+
+    def test_failure(self):
+        """Assert an error is raised once a chunk runs out of retries."""
+        def put(path, data):  # pylint:disable=unused-argument
+            """Fail every upload of the first chunk."""
+            if path.endswith('/0/'):
+                raise requests.exceptions.HTTPError()
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.upload(
+                self.unit, put, chunk_size=100, max_workers=2, retries=2)
+
+
 class UploadImportErratumTestCase(unittest.TestCase):
     """Test :func:`pulp_smash.utils.upload_import_unit`."""
 
@@ -240,7 +796,166 @@ class PulpAdminLoginTestCase(unittest.TestCase):
             self.assertIs(response, client.return_value.run.return_value)
 
 
-class GetSha256ChecksumTestCase(unittest.TestCase):
+class ResetPulpTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.utils.reset_pulp`."""
+
+    def setUp(self):
+        """Patch out clients and service managers, and record commands."""
+        self.cfg = config.PulpSmashConfig(
+            pulp_version='2.13',
+            systems=[config.PulpSystem(
+                hostname='pulp.example.com',
+                roles={'api': {}, 'mongod': {}, 'shell': {}},
+            )],
+        )
+        self.commands = []
+        self.archive_exists = False
+
+        def run(cmd):
+            """Record ``cmd``, and pretend ``test -f`` is answered."""
+            self.commands.append(tuple(cmd))
+            returncode = 0
+            if 'test' in cmd and not self.archive_exists:
+                returncode = 1
+            return mock.Mock(returncode=returncode)
+
+        mocks = []
+        for patcher in (
+                mock.patch.object(cli, 'Client'),
+                mock.patch.object(cli, 'GlobalServiceManager'),
+                mock.patch.object(utils, 'is_root', return_value=True),
+                mock.patch.dict(os.environ),
+        ):
+            mocks.append(patcher.start())
+            self.addCleanup(patcher.stop)
+        mocks[0].return_value.run.side_effect = run
+        self.svc_mgr = mocks[1]
+        os.environ.pop('PULP_SMASH_RESET_MODE', None)
+        os.environ.pop('PULP_SMASH_SERVICE_WORKERS', None)
+
+    def ran(self, program):
+        """Tell whether a command running ``program`` was run."""
+        return any(program in command for command in self.commands)
+
+    def test_full(self):
+        """Assert a full reset runs pulp-manage-db."""
+        utils.reset_pulp(self.cfg)
+        self.assertTrue(self.ran('pulp-manage-db'))
+        self.assertFalse(self.ran('mongodump'))
+        svc_mgr = self.svc_mgr.return_value
+        self.assertEqual(svc_mgr.stop.call_count, 1)
+        self.assertEqual(svc_mgr.start.call_count, 1)
+
+    def test_flush_teardown_collector(self):
+        """Assert queued deletions and orphan purges finish before a reset."""
+        with mock.patch.object(utils, '_TEARDOWN_COLLECTOR') as collector:
+            utils.reset_pulp(self.cfg)
+        collector.flush.assert_called_once_with()
+
+    def test_clear_shared_repos(self):
+        """Assert idle shared repositories are forgotten by a reset."""
+        with mock.patch.object(utils, '_SHARED_REPO_REGISTRY') as registry:
+            utils.reset_pulp(self.cfg)
+        registry.clear.assert_called_once_with()
+
+    def test_service_workers(self):
+        """Assert services are managed on every system at once by default."""
+        self.cfg.systems.append(config.PulpSystem(
+            hostname='worker.example.com',
+            roles={'pulp workers': {}, 'shell': {}},
+        ))
+        utils.reset_pulp(self.cfg)
+        os.environ['PULP_SMASH_SERVICE_WORKERS'] = '1'
+        utils.reset_pulp(self.cfg)
+        self.assertEqual(self.svc_mgr.call_args_list, [
+            mock.call(self.cfg, max_workers=2),
+            mock.call(self.cfg, max_workers=1),
+        ])
+
+    def test_snapshot_baseline(self):
+        """Assert the first snapshot-mode reset makes a baseline."""
+        os.environ['PULP_SMASH_RESET_MODE'] = 'snapshot'
+        utils.reset_pulp(self.cfg)
+        self.assertTrue(self.ran('pulp-manage-db'))
+        self.assertFalse(self.ran('mongorestore'))
+        self.assertIn((
+            'mongodump',
+            '--db', 'pulp_database',
+            '--gzip',
+            '--archive=/var/lib/pulp-smash/pulp_database-2.13.archive.gz',
+        ), self.commands)
+
+    def test_snapshot_restore(self):
+        """Assert later snapshot-mode resets restore the baseline."""
+        self.archive_exists = True
+        utils.reset_pulp(self.cfg, 'snapshot')
+        self.assertFalse(self.ran('pulp-manage-db'))
+        self.assertFalse(self.ran('mongodump'))
+        self.assertTrue(self.ran('mongorestore'))
+        self.assertIn((
+            'rm', '-rf', '/var/lib/pulp/content', '/var/lib/pulp/published'
+        ), self.commands)
+        self.assertEqual(
+            self.svc_mgr.return_value.start.call_count, 1)
+
+    def test_invalid_mode(self):
+        """Assert an unknown mode is rejected before Pulp is stopped."""
+        with self.assertRaises(ValueError):
+            utils.reset_pulp(self.cfg, 'quick')
+        self.assertEqual(
+            self.svc_mgr.return_value.stop.call_count, 0)
+
+    def test_discard(self):
+        """Assert the baseline archive can be deleted."""
+        utils.discard_pulp_snapshot(self.cfg)
+        self.assertEqual(self.commands, [(
+            'rm', '-f', '/var/lib/pulp-smash/pulp_database-2.13.archive.gz'
+        )])
+
+
+def _response(body, status_code=200, headers=None):
+    """Return a mock streamed ``requests.Response`` with the given body."""
+    response = mock.MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.side_effect = lambda chunk_size: (
+        body[i:i + chunk_size] for i in range(0, len(body), chunk_size)
+    )
+    response.__enter__.return_value = response
+    return response
+
+
+def _patch_session_get(test_case):
+    """Patch out ``requests.Session``, and return the mock of its ``get``."""
+    patcher = mock.patch.object(utils.requests, 'Session')
+    session = patcher.start().return_value
+    test_case.addCleanup(patcher.stop)
+    session.__enter__.return_value = session
+    return session.get
+
+
+class BaseChecksumCacheTestCase(unittest.TestCase):
+    """A base class for tests that use the checksum cache."""
+
+    def setUp(self):
+        """Empty the checksum caches, and patch out HTTP requests."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, 'checksums.json')
+        for patcher in (
+                mock.patch.object(
+                    utils,
+                    '_get_checksum_cache_path',
+                    return_value=self.path,
+                ),
+                mock.patch.object(utils, '_CHECKSUM_CACHE', {}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.get = _patch_session_get(self)
+
+
+class GetSha256ChecksumTestCase(BaseChecksumCacheTestCase):
     """Test :func:`pulp_smash.utils.get_sha256_checksum`."""
 
     def test_all(self):
@@ -259,15 +974,189 @@ class GetSha256ChecksumTestCase(unittest.TestCase):
             ('HTTP://example.com', b'abc'),
         )
         checksums = []
-        with mock.patch.object(utils, 'http_get') as http_get:
-            for url, blob in urls_blobs:
-                http_get.return_value = blob
-                checksums.append(utils.get_sha256_checksum(url))
-        self.assertEqual(http_get.call_count, 2)
+        for url, blob in urls_blobs:
+            self.get.return_value = _response(blob)
+            checksums.append(utils.get_sha256_checksum(url))
+        self.assertEqual(self.get.call_count, 2)
         self.assertNotEqual(checksums[0], checksums[1])
         self.assertEqual(checksums[0], checksums[2])
 
 
+class HttpDownloadTestCase(unittest.TestCase):
+    """Test :func:`pulp_smash.utils.http_download`."""
+
+    def setUp(self):
+        """Serve a file bigger than one chunk."""
+        self.blob = os.urandom(2 * 1024 * 1024 + 5)
+        self.get = _patch_session_get(self)
+        self.get.return_value = _response(self.blob)
+
+    def test_checksums(self):
+        """Assert the size and checksums of the file are returned."""
+        result = utils.http_download(
+            'http://example.com/foo', ('md5', 'sha256'), timeout=5)
+        self.assertEqual(result.size, len(self.blob))
+        self.assertEqual(result.checksums, {
+            'md5': hashlib.md5(self.blob).hexdigest(),
+            'sha256': hashlib.sha256(self.blob).hexdigest(),
+        })
+        self.assertEqual((result.head, result.path), (b'', None))
+        self.assertEqual(
+            self.get.call_args,
+            mock.call('http://example.com/foo', stream=True, timeout=5),
+        )
+
+    def test_default_timeout(self):
+        """Assert a timeout is passed if the caller doesn't give one."""
+        utils.http_download('http://example.com/foo')
+        self.assertEqual(
+            self.get.call_args[1]['timeout'],
+            utils._DOWNLOAD_TIMEOUT,  # pylint:disable=protected-access
+        )
+
+    def test_spool(self):
+        """Assert the file can be spooled to disk and memory-mapped."""
+        with utils.http_download('http://example.com/foo', spool=True) as res:
+            path = res.path
+            with res.mmap() as contents:
+                self.assertEqual(contents[:], self.blob)
+        self.assertFalse(os.path.exists(path))
+
+    def test_head(self):
+        """Assert the first few bytes can be kept."""
+        result = utils.http_download('http://example.com/foo', head=4)
+        self.assertEqual(result.head, self.blob[:4])
+
+    def test_range(self):
+        """Assert a Range header is sent, and partial content used as is."""
+        self.get.return_value = _response(self.blob[10:20], 206)
+        result = utils.http_download(
+            'http://example.com/foo',
+            head=100,
+            byte_range=(10, 19),
+            headers={'Accept': '*/*'},
+        )
+        self.assertEqual(result.head, self.blob[10:20])
+        self.assertEqual(self.get.call_args[1]['headers'], {
+            'Accept': '*/*',
+            'Range': 'bytes=10-19',
+        })
+
+    def test_range_ignored(self):
+        """Assert the range is cut out of a full response."""
+        first = 1024 * 1024 - 3
+        for byte_range, expected in (
+                ((first, first + 9), self.blob[first:first + 10]),
+                ((first, None), self.blob[first:]),
+        ):
+            with self.subTest(byte_range=byte_range):
+                self.get.return_value = _response(self.blob)
+                result = utils.http_download(
+                    'http://example.com/foo',
+                    ('sha256',),
+                    spool=True,
+                    byte_range=byte_range,
+                )
+                with result, result.open() as handle:
+                    self.assertEqual(handle.read(), expected)
+                self.assertEqual(result.size, len(expected))
+                self.assertEqual(
+                    result.checksums['sha256'],
+                    hashlib.sha256(expected).hexdigest(),
+                )
+
+    def test_error(self):
+        """Assert download errors are raised, and no spooled file is left."""
+        self.get.return_value.iter_content.side_effect = (
+            requests.exceptions.ChunkedEncodingError
+        )
+        with mock.patch.object(utils.os, 'remove') as remove:
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                utils.http_download('http://example.com/foo', spool=True)
+        self.assertEqual(remove.call_count, 1)
+        os.remove(remove.call_args[0][0])
+
+
+class GetChecksumsTestCase(BaseChecksumCacheTestCase):
+    """Test :func:`pulp_smash.utils.get_checksums`."""
+
+    def setUp(self):
+        """Serve a file with an ETag."""
+        super().setUp()
+        self.blob = os.urandom(3 * 1024 * 1024 + 7)
+        self.get.return_value = _response(self.blob, headers={'ETag': '"1"'})
+
+    def _forget(self):
+        """Make the next call behave like a new process."""
+        utils._CHECKSUM_CACHE.clear()  # pylint:disable=protected-access
+
+    def test_many_algorithms(self):
+        """Assert several checksums are calculated in one download."""
+        checksums = utils.get_checksums(
+            'http://example.com/foo', ('md5', 'sha1', 'sha256'))
+        self.assertEqual(checksums, {
+            algorithm: hashlib.new(algorithm, self.blob).hexdigest()
+            for algorithm in ('md5', 'sha1', 'sha256')
+        })
+        self.assertEqual(self.get.call_count, 1)
+        self.assertTrue(self.get.call_args[1]['stream'])
+
+    def test_not_modified(self):
+        """Assert a new process validates cached checksums with the ETag."""
+        checksums = utils.get_checksums('http://example.com/foo')
+        self._forget()
+        self.get.return_value = _response(b'', 304)
+        self.assertEqual(utils.get_checksums('http://example.com/foo'),
+                         checksums)
+        self.assertEqual(
+            self.get.call_args[1]['headers'],
+            {'If-None-Match': '"1"'},
+        )
+
+    def test_modified(self):
+        """Assert checksums are calculated again if the file changed."""
+        utils.get_checksums('http://example.com/foo')
+        self._forget()
+        self.get.return_value = _response(b'new', headers={'ETag': '"2"'})
+        self.assertEqual(
+            utils.get_checksums('http://example.com/foo')['sha256'],
+            hashlib.sha256(b'new').hexdigest(),
+        )
+
+    def test_new_algorithm(self):
+        """Assert asking for an uncached algorithm downloads the file."""
+        utils.get_checksums('http://example.com/foo')
+        self._forget()
+        checksums = utils.get_checksums('http://example.com/foo', ('md5',))
+        self.assertEqual(checksums['md5'], hashlib.md5(self.blob).hexdigest())
+        self.assertEqual(self.get.call_args[1]['headers'], {})
+        with open(self.path) as handle:
+            cached = json.load(handle)['http://example.com/foo']['checksums']
+        self.assertEqual(set(cached), {'md5', 'sha256'})
+
+    def test_no_validators(self):
+        """Assert files without an ETag or Last-Modified aren't saved."""
+        self.get.return_value = _response(self.blob)
+        utils.get_checksums('http://example.com/foo')
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unreachable(self):
+        """Assert stale checksums are used if the server can't be reached."""
+        checksums = utils.get_checksums('http://example.com/foo')
+        for error in (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ReadTimeout,
+        ):
+            with self.subTest(error=error):
+                self._forget()
+                self.get.side_effect = error
+                with self.assertWarns(RuntimeWarning):
+                    self.assertEqual(
+                        utils.get_checksums('http://example.com/foo'),
+                        checksums,
+                    )
+
+
 class SearchUnitsTestCase(unittest.TestCase):
     """Test :func:`pulp_smash.utils.search_units`."""
 